@@ -0,0 +1,59 @@
+"""
+Benchmark du calcul d'âge : apply ligne par ligne vs calcul vectorisé
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.utils import calculate_age, calculate_ages
+
+
+def generate_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Génère un DataFrame fusionné synthétique (snapshot_date, id, datenaissance)"""
+    rng = np.random.default_rng(seed)
+    birth_days = rng.integers(-25000, 20000, size=rows)
+    snapshot_days = rng.integers(15000, 20000, size=rows)
+    return pd.DataFrame({
+        'snapshot_date': pd.Series(np.datetime64('1970-01-01') + snapshot_days.astype('timedelta64[D]')).dt.date,
+        'id': np.arange(1, rows + 1),
+        'datenaissance': pd.Series(np.datetime64('1970-01-01') + birth_days.astype('timedelta64[D]')).dt.date,
+    })
+
+
+def bench_apply(df: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    df.apply(lambda row: calculate_age(row['datenaissance'], row['snapshot_date']), axis=1)
+    return time.perf_counter() - start
+
+
+def bench_vectorized(df: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    calculate_ages(df['datenaissance'], df['snapshot_date'])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du calcul d'âge")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df = generate_frame(rows)
+        apply_time = bench_apply(df)
+        vectorized_time = bench_vectorized(df)
+        print(
+            f"{rows:>10} lignes | apply: {apply_time:8.3f}s | vectorisé: {vectorized_time:8.3f}s "
+            f"| gain: x{apply_time / vectorized_time:,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark de latence du mode asynchrone sur la base configurée : extraction séquentielle
+(SQLAlchemy, source puis target) vs extraction concurrente (asyncpg, asyncio.gather), puis
+chargement en une transaction vs partitions chargées en parallèle.
+
+Le chargement se fait en upsert dans target_results_for_ge (idempotent : relançable sans nettoyage).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.async_etl import AsyncDataExtractor, AsyncDataLoader, create_pool
+from etl.extract import DataExtractor
+from etl.load import DataLoader
+from etl.transform import DataTransformer
+
+
+def timed(func, repeat: int) -> float:
+    """Médiane des durées de `func()` sur `repeat` exécutions"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+async def timed_async(func, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def report(label: str, sync_s: float, async_s: float):
+    print(f"{label:<12} | synchrone: {sync_s:8.3f}s | asynchrone: {async_s:8.3f}s | gain: {1 - async_s / sync_s:6.0%}")
+
+
+async def bench(repeat: int, partitions: int):
+    extractor = DataExtractor()
+    transformer = DataTransformer(extractor)
+
+    sync_extract = timed(lambda: (extractor.extract_source_data(), extractor.extract_target_structure()), repeat)
+    transformed = transformer.transform_data()
+    sync_load = timed(lambda: DataLoader(upsert=True).load_data(transformed), repeat)
+
+    pool = await create_pool(max_size=max(2, partitions))
+    try:
+        async_extractor = AsyncDataExtractor(pool)
+        async_loader = AsyncDataLoader(pool, upsert=True)
+        chunks = [chunk for _, chunk in transformed.groupby(transformed['id'].to_numpy() % partitions, sort=False)]
+        async_extract = await timed_async(async_extractor.extract_all, repeat)
+        async_load = await timed_async(lambda: async_loader.load_partitions(chunks), repeat)
+    finally:
+        await pool.close()
+
+    print(f"{len(transformed)} lignes transformées, {partitions} partitions, médiane sur {repeat} exécutions")
+    report('extraction', sync_extract, async_extract)
+    report('chargement', sync_load, async_load)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latence du mode asynchrone (asyncpg)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--partitions', type=int, default=4, help='Partitions chargées en parallèle')
+    args = parser.parse_args()
+    asyncio.run(bench(args.repeat, args.partitions))
+
+
+if __name__ == "__main__":
+    main()
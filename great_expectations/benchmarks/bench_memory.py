@@ -0,0 +1,112 @@
+"""
+Benchmark mémoire de la fusion target/source : DataFrames tels que renvoyés par le driver
+sans schéma (dates en objets Python, id int64, âges object) vs schéma explicite de
+l'extraction (id int32, dates datetime64, âges Int16) et, si pyarrow est installé, types Arrow.
+
+Mesure la taille mémoire (deep) des DataFrames extraits et du DataFrame fusionné
+produit par DataTransformer.transform_frames, ainsi que le pic d'allocation de la transformation.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.extract import ARROW_COLUMN_DTYPES
+from etl.transform import DataTransformer
+
+
+def compact_frames(rows: int, snapshots: int, seed: int = 42):
+    """(source, target) synthétiques au schéma explicite de l'extraction"""
+    rng = np.random.default_rng(seed)
+    ids = max(1, rows // snapshots)
+    epoch = np.datetime64('1970-01-01', 'ns')
+    source = pd.DataFrame({
+        'id': np.arange(1, ids + 1, dtype='int32'),
+        'datenaissance': epoch + rng.integers(-18000, 20000, size=ids).astype('timedelta64[D]'),
+    })
+    snapshot_dates = np.datetime64('2025-01-01', 'ns') + (30 * np.arange(snapshots)).astype('timedelta64[D]')
+    target = pd.DataFrame({
+        'snapshot_date': np.repeat(snapshot_dates, ids),
+        'id': np.tile(source['id'].to_numpy(), snapshots),
+        'datenaissance': pd.NaT,
+        'age': pd.array([pd.NA] * (ids * snapshots), dtype='Int16'),
+    })
+    return source, target
+
+
+def driver_frames(source: pd.DataFrame, target: pd.DataFrame):
+    """Mêmes données sous la forme renvoyée par read_sql_query sans schéma"""
+    return (
+        pd.DataFrame({
+            'id': source['id'].astype('int64'),
+            'datenaissance': source['datenaissance'].dt.date,
+        }),
+        pd.DataFrame({
+            'snapshot_date': target['snapshot_date'].dt.date,
+            'id': target['id'].astype('int64'),
+            'datenaissance': pd.Series([None] * len(target), dtype=object),
+            'age': pd.Series([None] * len(target), dtype=object),
+        }),
+    )
+
+
+def arrow_frames(source: pd.DataFrame, target: pd.DataFrame):
+    """Mêmes données en types Arrow (ETL_ARROW_DTYPES=1)"""
+    return (
+        source.astype({col: ARROW_COLUMN_DTYPES[col] for col in source.columns}),
+        target.astype({col: ARROW_COLUMN_DTYPES[col] for col in target.columns}),
+    )
+
+
+def frame_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def measure(label: str, source: pd.DataFrame, target: pd.DataFrame) -> float:
+    """Affiche les tailles mémoire et le pic de la transformation, retourne la taille fusionnée (Mo)"""
+    transformer = DataTransformer()
+    tracemalloc.start()
+    start = time.perf_counter()
+    merged = transformer.transform_frames(source, target)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    merged_mb = frame_mb(merged)
+    print(f"{label:<10} | source: {frame_mb(source):9.1f} Mo | target: {frame_mb(target):9.1f} Mo "
+          f"| fusionné: {merged_mb:9.1f} Mo | pic transform: {peak / 2**20:9.1f} Mo | {elapsed:6.2f}s")
+    return merged_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mémoire des types extraits")
+    parser.add_argument('--rows', type=int, default=10_000_000, help='Nombre de lignes de target')
+    parser.add_argument('--snapshots', type=int, default=2)
+    args = parser.parse_args()
+
+    source, target = compact_frames(args.rows, args.snapshots)
+    print(f"{len(target)} lignes target, {len(source)} lignes source")
+    compact_mb = measure('schéma', source, target)
+
+    try:
+        import pyarrow  # noqa: F401
+        measure('arrow', *arrow_frames(source, target))
+    except ImportError:
+        print("arrow      | ignoré (pyarrow non installé)")
+
+    driver_source, driver_target = driver_frames(source, target)
+    del source, target
+    driver_mb = measure('driver', driver_source, driver_target)
+    print(f"Réduction du DataFrame fusionné: {1 - compact_mb / driver_mb:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmark de montée en charge du pipeline ETL.
+
+Pour chaque taille demandée, génère un jeu de données synthétique puis mesure chaque
+étape isolément (extract, transform, validate, load, GE checkpoint) et le pipeline
+de bout en bout : durée, lignes/s et pic mémoire. Les résultats sont écrits dans un
+fichier JSON comparable d'un commit à l'autre (--compare).
+
+Le pic mémoire Python est mesuré avec tracemalloc, qui ralentit les étapes riches en
+allocations : comparer les durées entre runs effectués avec les mêmes options.
+
+ATTENTION : les tables source, target et target_results_for_ge sont vidées. Utiliser
+une base dédiée, ou --embedded pour démarrer une instance PostgreSQL jetable (pgserver).
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import text
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_data import DatasetSpec, generate_dataset
+from config.settings import settings
+from etl.utils import DatabaseConnection, get_engine, logger, reset_engine
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def measure(stage: str, rows_of, func, *args):
+    """Exécute `func` et retourne (résultat, mesures) ; rows_of(résultat) donne le nombre de lignes"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = rows_of(result)
+    metrics = {
+        'stage': stage,
+        'rows': rows,
+        'seconds': round(elapsed, 4),
+        'rows_per_second': round(rows / elapsed) if elapsed > 0 else None,
+        'peak_python_mb': round(peak / 2**20, 1),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    logger.info(f"⏱️ {stage}: {rows} lignes en {elapsed:.3f}s ({metrics['rows_per_second']} lignes/s)")
+    return result, metrics
+
+
+def truncate_results():
+    with DatabaseConnection() as conn:
+        conn.execute(text(f"TRUNCATE {settings.etl.target_results_for_ge}"))
+        conn.commit()
+
+
+def run_stages(spec: DatasetSpec, with_ge: bool, pipeline_options: dict) -> list:
+    """Mesure chaque étape isolément puis le pipeline complet sur le jeu de données courant"""
+    from etl.extract import DataExtractor
+    from etl.transform import DataTransformer
+    from etl.load import DataLoader
+    from main import ETLPipeline
+
+    extractor = DataExtractor()
+    transformer = DataTransformer(extractor)
+    results = []
+
+    source_df, metrics = measure('extract_source', len, extractor.extract_source_data)
+    results.append(metrics)
+    target_df, metrics = measure('extract_target', len, extractor.extract_target_structure)
+    results.append(metrics)
+    transformed_df, metrics = measure('transform', len, transformer.transform_data, source_df, target_df)
+    results.append(metrics)
+    _, metrics = measure('validate', lambda _: len(transformed_df), transformer.validate_transformed_data, transformed_df)
+    results.append(metrics)
+
+    truncate_results()
+    _, metrics = measure('load', lambda _: len(transformed_df), DataLoader().load_data, transformed_df)
+    results.append(metrics)
+    del source_df, target_df
+
+    if with_ge:
+        from ge_runner.run_validation import GreatExpectationsRunner
+        _, metrics = measure('ge_checkpoint', lambda _: len(transformed_df),
+                             GreatExpectationsRunner().run_programmatic_checkpoint, spec.first_snapshot)
+        results.append(metrics)
+    del transformed_df
+
+    truncate_results()
+    pipeline = ETLPipeline(**pipeline_options)
+    _, metrics = measure('end_to_end', lambda _: spec.ids * spec.snapshots, pipeline.run_etl)
+    results.append(metrics)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, reference_path: str):
+    """Affiche l'écart de durée par étape avec un fichier de résultats de référence"""
+    with open(reference_path) as f:
+        reference = json.load(f)
+    ref_times = {(run['rows'], r['stage']): r['seconds'] for run in reference['runs'] for r in run['stages']}
+
+    print(f"\nComparaison avec {reference['commit']} :")
+    for run in current['runs']:
+        for r in run['stages']:
+            ref = ref_times.get((run['rows'], r['stage']))
+            if ref:
+                print(f"{r['stage']:<15} {run['rows']:>12} lignes | {ref:8.3f}s -> {r['seconds']:8.3f}s "
+                      f"({(r['seconds'] - ref) / ref:+.0%})")
+
+
+def start_embedded_postgres():
+    """Démarre une instance PostgreSQL jetable (dépendance optionnelle pgserver)"""
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit("--embedded nécessite le paquet pgserver (pip install pgserver)")
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="etl-bench-"), cleanup_mode='delete')
+    settings.db.url = server.get_uri()
+    reset_engine()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de montée en charge du pipeline ETL")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='Nombres de lignes de target_table à tester')
+    parser.add_argument('--snapshots', type=int, default=1)
+    parser.add_argument('--null-ratio', type=float, default=0.0)
+    parser.add_argument('--orphan-ratio', type=float, default=0.0)
+    parser.add_argument('--mode', choices=['pandas', 'sql'], default='pandas')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--with-ge', action='store_true', help='Inclure le checkpoint Great Expectations')
+    parser.add_argument('--embedded', action='store_true', help='Utiliser une instance PostgreSQL jetable')
+    parser.add_argument('--output', help='Fichier JSON de résultats (défaut: benchmarks/results/<commit>-<date>.json)')
+    parser.add_argument('--compare', help='Fichier JSON de référence à comparer')
+    args = parser.parse_args()
+
+    server = start_embedded_postgres() if args.embedded else None
+    if server and args.with_ge:
+        logger.warning("Le checkpoint GE utilise la datasource de great_expectations.yml : ignoré en mode --embedded")
+        args.with_ge = False
+
+    pipeline_options = {'mode': args.mode, 'workers': args.workers, 'streaming': args.streaming}
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'options': vars(args),
+        'runs': [],
+    }
+
+    for rows in args.sizes:
+        spec = DatasetSpec(rows=rows, snapshots=args.snapshots,
+                           null_birthdate_ratio=args.null_ratio, orphan_ratio=args.orphan_ratio)
+        generation_seconds = generate_dataset(spec)
+        report['runs'].append({
+            'rows': rows,
+            'generation_seconds': round(generation_seconds, 2),
+            'stages': run_stages(spec, args.with_ge, pipeline_options),
+        })
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Résultats écrits dans {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+    if server:
+        get_engine().dispose()
+        server.cleanup()
+
+
+if __name__ == "__main__":
+    main()
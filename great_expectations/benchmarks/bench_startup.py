@@ -0,0 +1,41 @@
+"""
+Benchmark du démarrage à froid : import du pipeline vs pandas + SQLAlchemy seuls
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'pandas + sqlalchemy': "import pandas, sqlalchemy",
+    'pipeline --etl-only': "import main; main.ETLPipeline()",
+    'great_expectations': "import great_expectations",
+}
+
+
+def measure(code: str, repeat: int) -> float:
+    """Temps médian d'un interpréteur neuf exécutant `code`"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=PROJECT_DIR, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage à froid")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, code in SCENARIOS.items():
+        print(f"{name:<22} | {measure(code, args.repeat):6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
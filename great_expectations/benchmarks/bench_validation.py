@@ -0,0 +1,78 @@
+"""
+Benchmark de la validation de target_results_for_ge avec target_results_suite : moteur
+Great Expectations (une requête par métrique) vs validation groupée (toutes les métriques
+en une requête d'agrégat, ou une passe sur le DataFrame en mémoire).
+
+Affiche, pour chaque chemin, la durée médiane et le nombre de requêtes SQL envoyées.
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+from sqlalchemy import event
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from great_expectations.core.batch import RuntimeBatchRequest
+
+from config.settings import settings
+from etl.utils import get_engine
+from ge_runner.run_validation import GreatExpectationsRunner
+
+
+def timed(func, repeat: int):
+    """(médiane des durées, requêtes SQL par exécution) de `func()`"""
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    event.listen(get_engine(), "before_cursor_execute", record)
+    try:
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - start)
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", record)
+    return statistics.median(durations), len(queries) // repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la validation GE (checkpoint vs groupée)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    runner = GreatExpectationsRunner()
+    table = settings.etl.target_results_for_ge
+    batch_request = RuntimeBatchRequest(
+        datasource_name="postgres_datasource",
+        data_connector_name="default_runtime_data_connector",
+        data_asset_name=table,
+        runtime_parameters={"query": f"SELECT * FROM {table}"},
+        batch_identifiers={"default_identifier_name": "bench_validation"},
+    )
+    validator = runner.context.get_validator(batch_request=batch_request, expectation_suite_name="target_results_suite")
+    frame = pd.read_sql_query(f"SELECT snapshot_date, id, datenaissance, age FROM {table}", get_engine(),
+                              parse_dates=['snapshot_date', 'datenaissance'])
+
+    print(f"{len(frame)} lignes dans {table}, médiane sur {args.repeat} exécutions")
+    for label, func in [
+        ('great_expectations', lambda: validator.validate()),
+        ('groupée (SQL)', lambda: runner.run_batched_validation()),
+        ('groupée (mémoire)', lambda: runner.run_batched_validation(data=frame)),
+    ]:
+        seconds, queries = timed(func, args.repeat)
+        print(f"{label:<20} | {seconds:8.3f}s | {queries:4d} requêtes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Générateur de données synthétiques pour source_table / target_table.
+
+Les lignes sont générées côté serveur (generate_series), ce qui permet de monter
+jusqu'à la centaine de millions de lignes sans faire transiter les données par Python.
+ATTENTION : les tables source, target et target_results_for_ge sont vidées.
+"""
+
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import settings
+from etl.load import DataLoader
+from etl.utils import DatabaseConnection, logger
+
+
+@dataclass
+class DatasetSpec:
+    rows: int                          # nombre de lignes de target_table
+    snapshots: int = 1                 # nombre de snapshot_date distinctes
+    null_birthdate_ratio: float = 0.0  # part des lignes source sans date de naissance
+    orphan_ratio: float = 0.0          # part des id target absents de source_table
+    first_snapshot: str = "2025-01-01"
+    snapshot_interval_days: int = 30
+    seed: float = 0.42
+
+    @property
+    def ids(self) -> int:
+        return max(1, self.rows // self.snapshots)
+
+
+def generate_dataset(spec: DatasetSpec) -> float:
+    """(Re)génère les tables source et target selon `spec`, retourne la durée en secondes"""
+    source_table = settings.etl.source_table
+    target_table = settings.etl.target_table
+    start = time.perf_counter()
+
+    DataLoader().create_tables_if_not_exist()
+    with DatabaseConnection() as conn:
+        conn.execute(text(f"TRUNCATE {source_table}, {target_table}, {settings.etl.target_results_for_ge}"))
+        if spec.null_birthdate_ratio > 0:
+            # Le schéma impose NOT NULL ; on le lève pour simuler des sources incomplètes
+            conn.execute(text(f"ALTER TABLE {source_table} ALTER COLUMN datenaissance DROP NOT NULL"))
+        conn.execute(text("SELECT setseed(:seed)"), {'seed': spec.seed})
+
+        conn.execute(text(f"""
+        INSERT INTO {source_table} (id, datenaissance)
+        SELECT g,
+               CASE WHEN random() < :null_ratio THEN NULL
+                    ELSE DATE '1920-01-01' + (random() * 36500)::int END
+        FROM generate_series(1, :ids) AS g
+        WHERE random() >= :orphan_ratio
+        """), {'ids': spec.ids, 'null_ratio': spec.null_birthdate_ratio, 'orphan_ratio': spec.orphan_ratio})
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{source_table}', 'id'), :ids)"
+        ), {'ids': spec.ids})
+
+        conn.execute(text(f"""
+        INSERT INTO {target_table} (snapshot_date, id)
+        SELECT CAST(:first_snapshot AS DATE) + s * :interval, g
+        FROM generate_series(0, :snapshots - 1) AS s, generate_series(1, :ids) AS g
+        """), {
+            'first_snapshot': spec.first_snapshot,
+            'interval': spec.snapshot_interval_days,
+            'snapshots': spec.snapshots,
+            'ids': spec.ids,
+        })
+        conn.execute(text(f"ANALYZE {source_table}"))
+        conn.execute(text(f"ANALYZE {target_table}"))
+        conn.commit()
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Jeu de données généré: {spec.ids * spec.snapshots} lignes target en {elapsed:.1f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des données synthétiques source/target")
+    parser.add_argument('--rows', type=int, required=True, help='Nombre de lignes de target_table')
+    parser.add_argument('--snapshots', type=int, default=1)
+    parser.add_argument('--null-ratio', type=float, default=0.0)
+    parser.add_argument('--orphan-ratio', type=float, default=0.0)
+    args = parser.parse_args()
+
+    generate_dataset(DatasetSpec(
+        rows=args.rows,
+        snapshots=args.snapshots,
+        null_birthdate_ratio=args.null_ratio,
+        orphan_ratio=args.orphan_ratio,
+    ))
+
+
+if __name__ == "__main__":
+    main()
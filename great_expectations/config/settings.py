@@ -1,7 +1,22 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
+@dataclass
+class PoolConfig:
+    """Pool de connexions partagé par l'extraction, le chargement, les tests et Great Expectations"""
+    size: int = 5
+    max_overflow: int = 10
+    # Vérifie la connexion au checkout (redémarrage de PostgreSQL, coupure réseau)
+    pre_ping: bool = True
+    # Connexions recyclées après ce délai (secondes), -1 pour les garder indéfiniment
+    recycle_seconds: int = 1800
+    # Timeout des requêtes côté serveur (millisecondes), 0 = aucun
+    statement_timeout_ms: int = 0
+    application_name: str = "etl_great_expectations"
+    # Lignes lues par aller-retour sur les connexions de lecture en curseur côté serveur
+    max_row_buffer: int = 1000
+
 @dataclass
 class DatabaseConfig:
     host: str
@@ -9,9 +24,14 @@ class DatabaseConfig:
     database: str
     username: str
     password: str
+    # URL SQLAlchemy complète, prioritaire sur les champs ci-dessus si renseignée
+    url: Optional[str] = None
+    pool: PoolConfig = field(default_factory=PoolConfig)
     
     @property
     def connection_string(self) -> str:
+        if self.url:
+            return self.url
         return f"postgresql://{self.username}:{self.password}@{self.host}:{self.port}/{self.database}"
 
 @dataclass
@@ -21,6 +41,33 @@ class ETLConfig:
     target_results_for_ge: str = "target_results_for_ge"
     batch_size: int = 1000
     snapshot_date: Optional[str] = None
+    # Répertoire des métriques (.prom pour le textfile collector Prometheus + résumés JSON)
+    metrics_dir: str = "metrics"
+    # Colonnes extraites en types Arrow (nécessite pyarrow) plutôt qu'en types numpy compacts
+    arrow_dtypes: bool = False
+    # Mode hors mémoire : budget par partition et répertoire des fichiers de débordement (tmp système si None)
+    memory_budget_mb: int = 1024
+    spill_dir: Optional[str] = None
+    # Extraction incrémentale : la borne haute reste à ce délai (secondes) derrière l'horloge du serveur.
+    # created_at vaut le début de la transaction d'insertion : le délai doit dépasser la plus longue
+    # transaction d'écriture, sinon ses lignes, visibles après coup sous la marque, sont perdues
+    incremental_lag_seconds: int = 300
+
+@dataclass
+class ValidationConfig:
+    # Pourcentage de lignes lues par les contrôles statistiques (100 = toutes, aucun échantillonnage)
+    sample_percent: float = 100.0
+    # "hash" (id haché avec la graine : mêmes lignes d'un run à l'autre) ou "tablesample" (SYSTEM ... REPEATABLE)
+    sample_method: str = "hash"
+    sample_seed: int = 42
+    # Niveau de confiance des intervalles reportés pour les contrôles échantillonnés
+    confidence: float = 0.95
+    # Rétention du validations store : au-delà, les résultats sont résumés par jour (0 = sans limite)
+    retention_days: int = 30
+    retention_runs: int = 200
+    # Service de validation résident (ge_runner/worker.py) : adresse d'écoute, locale uniquement
+    worker_host: str = "127.0.0.1"
+    worker_port: int = 8765
 
 class Settings:
     def __init__(self):
@@ -29,9 +76,35 @@ class Settings:
             port=int(os.getenv("DB_PORT", "5432")),
             database=os.getenv("DB_NAME", "postgres"),
             username=os.getenv("DB_USER", "postgres"),
-            password=os.getenv("DB_PASSWORD", "root")
+            password=os.getenv("DB_PASSWORD", "root"),
+            url=os.getenv("DATABASE_URL"),
+            pool=PoolConfig(
+                size=int(os.getenv("DB_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+                pre_ping=os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes"),
+                recycle_seconds=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+                statement_timeout_ms=int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0")),
+                application_name=os.getenv("DB_APPLICATION_NAME", "etl_great_expectations"),
+                max_row_buffer=int(os.getenv("DB_MAX_ROW_BUFFER", "1000"))
+            )
+        )
+        self.etl = ETLConfig(
+            metrics_dir=os.getenv("ETL_METRICS_DIR", "metrics"),
+            arrow_dtypes=os.getenv("ETL_ARROW_DTYPES", "").lower() in ("1", "true", "yes"),
+            memory_budget_mb=int(os.getenv("ETL_MEMORY_BUDGET_MB", "1024")),
+            spill_dir=os.getenv("ETL_SPILL_DIR"),
+            incremental_lag_seconds=int(os.getenv("ETL_INCREMENTAL_LAG_SECONDS", "300"))
+        )
+        self.validation = ValidationConfig(
+            sample_percent=float(os.getenv("VALIDATION_SAMPLE_PERCENT", "100")),
+            sample_method=os.getenv("VALIDATION_SAMPLE_METHOD", "hash"),
+            sample_seed=int(os.getenv("VALIDATION_SAMPLE_SEED", "42")),
+            confidence=float(os.getenv("VALIDATION_CONFIDENCE", "0.95")),
+            retention_days=int(os.getenv("VALIDATION_RETENTION_DAYS", "30")),
+            retention_runs=int(os.getenv("VALIDATION_RETENTION_RUNS", "200")),
+            worker_host=os.getenv("VALIDATION_WORKER_HOST", "127.0.0.1"),
+            worker_port=int(os.getenv("VALIDATION_WORKER_PORT", "8765"))
         )
-        self.etl = ETLConfig()
         
     @classmethod
     def from_env(cls):
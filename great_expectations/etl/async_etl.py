@@ -0,0 +1,134 @@
+"""
+Variante asynchrone de l'extraction et du chargement (asyncio + asyncpg), à côté de l'API
+synchrone : les deux tables sont lues en parallèle et les partitions chargées en parallèle
+depuis une seule boucle d'événements, via un pool de connexions.
+"""
+
+import asyncio
+import io
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy.engine import make_url
+
+try:
+    import asyncpg
+except ImportError:
+    raise ImportError("Le mode asynchrone nécessite le paquet asyncpg (pip install asyncpg)")
+
+from etl.extract import COLUMN_DTYPES, TARGET_COLUMNS
+from etl.load import RESULT_COLUMNS, to_csv_buffer
+from etl.metrics import track
+from etl.utils import logger
+from config.settings import settings
+
+
+async def create_pool(min_size: int = 2, max_size: Optional[int] = None) -> asyncpg.Pool:
+    """
+    Pool asyncpg sur la base configurée (l'URL SQLAlchemy est ramenée à une DSN libpq),
+    avec les réglages de settings.db.pool : taille maximale, application_name et timeout.
+    """
+    config = settings.db.pool
+    url = make_url(settings.db.connection_string).set(drivername='postgresql')
+    server_settings = {'application_name': config.application_name}
+    if config.statement_timeout_ms:
+        server_settings['statement_timeout'] = str(config.statement_timeout_ms)
+    max_size = max_size or config.size + config.max_overflow
+    return await asyncpg.create_pool(url.render_as_string(hide_password=False), min_size=min(min_size, max_size),
+                                     max_size=max_size, server_settings=server_settings)
+
+
+def records_to_frame(records, columns) -> pd.DataFrame:
+    """Convertit des lignes asyncpg en DataFrame au schéma explicite de l'extraction"""
+    df = pd.DataFrame.from_records(records, columns=list(columns))
+    for col in columns:
+        if COLUMN_DTYPES[col].startswith('datetime64'):
+            df[col] = pd.to_datetime(df[col])
+        else:
+            df[col] = df[col].astype(COLUMN_DTYPES[col])
+    return df
+
+
+class AsyncDataExtractor:
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self.source_table = settings.etl.source_table
+
+    async def extract_source_data(self, id_range: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
+        """Extrait les données de la table source (optionnellement limitées à une plage d'id)"""
+        query = f"""
+        SELECT id, datenaissance
+        FROM {self.source_table}
+        WHERE datenaissance IS NOT NULL
+        {"AND id BETWEEN $1 AND $2" if id_range else ""}
+        ORDER BY id
+        """
+        with track('extract_source') as stage:
+            async with self.pool.acquire() as conn:
+                records = await conn.fetch(query, *(id_range or ()))
+            df = records_to_frame(records, ('id', 'datenaissance'))
+            stage.frame(df, count_bytes=True)
+        logger.info(f"Extraction asynchrone réussie: {len(df)} lignes extraites de {self.source_table}")
+        return df
+
+    async def extract_target_structure(self, id_range: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
+        """Extrait la structure de la table target"""
+        query = f"""
+        SELECT snapshot_date, id, datenaissance, age
+        FROM {settings.etl.target_table}
+        {"WHERE id BETWEEN $1 AND $2" if id_range else ""}
+        """
+        with track('extract_target') as stage:
+            async with self.pool.acquire() as conn:
+                records = await conn.fetch(query, *(id_range or ()))
+            df = records_to_frame(records, TARGET_COLUMNS)
+            stage.frame(df, count_bytes=True)
+        return df
+
+    async def extract_all(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Lit source et target en parallèle, sur deux connexions du pool"""
+        return await asyncio.gather(self.extract_source_data(), self.extract_target_structure())
+
+
+class AsyncDataLoader:
+    def __init__(self, pool: asyncpg.Pool, upsert: bool = False):
+        self.pool = pool
+        self.target_results_table = settings.etl.target_results_for_ge
+        self.upsert = upsert
+
+    async def load_data(self, data: pd.DataFrame) -> int:
+        """Charge un DataFrame via COPY dans sa propre transaction, retourne le nombre de lignes"""
+        if data.empty:
+            return 0
+        # La sérialisation CSV est du calcul pandas : hors de la boucle d'événements
+        buffer = await asyncio.get_running_loop().run_in_executor(None, to_csv_buffer, data)
+        source = io.BytesIO(buffer.getvalue().encode())
+
+        with track('load') as stage:
+            stage.rows = len(data)
+            async with self.pool.acquire() as conn, conn.transaction():
+                if not self.upsert:
+                    await conn.copy_to_table(self.target_results_table, source=source,
+                                             columns=RESULT_COLUMNS, format='csv')
+                    return len(data)
+
+                staging_table = f"{self.target_results_table}_staging"
+                await conn.execute(f"""
+                CREATE TEMP TABLE {staging_table}
+                (LIKE {self.target_results_table} INCLUDING DEFAULTS) ON COMMIT DROP
+                """)
+                await conn.copy_to_table(staging_table, source=source, columns=RESULT_COLUMNS, format='csv')
+                await conn.execute(f"""
+                INSERT INTO {self.target_results_table} (snapshot_date, id, datenaissance, age)
+                SELECT snapshot_date, id, datenaissance, age FROM {staging_table}
+                ON CONFLICT (snapshot_date, id) DO UPDATE
+                SET datenaissance = EXCLUDED.datenaissance, age = EXCLUDED.age
+                """)
+                return len(data)
+
+    async def load_partitions(self, partitions: List[pd.DataFrame]) -> int:
+        """Charge les partitions en parallèle (une connexion et une transaction chacune)"""
+        loaded = await asyncio.gather(*(self.load_data(partition) for partition in partitions))
+        logger.info(f"Chargement asynchrone réussi: {sum(loaded)} lignes insérées dans {self.target_results_table} "
+                    f"({len(partitions)} partitions)")
+        return sum(loaded)
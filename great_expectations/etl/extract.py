@@ -1,25 +1,56 @@
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
 from etl.utils import DatabaseConnection, logger
+from etl.metrics import track
 from config.settings import settings
 
+TARGET_COLUMNS = ('snapshot_date', 'id', 'datenaissance', 'age')
+
+# Schéma explicite des colonnes extraites : entiers compacts, dates typées dès la lecture
+COLUMN_DTYPES = {'id': 'int32', 'age': 'Int16', 'snapshot_date': 'datetime64[ns]', 'datenaissance': 'datetime64[ns]'}
+ARROW_COLUMN_DTYPES = {'id': 'int32[pyarrow]', 'age': 'int16[pyarrow]',
+                       'snapshot_date': 'date32[pyarrow]', 'datenaissance': 'date32[pyarrow]'}
+
 class DataExtractor:
     def __init__(self):
         self.source_table = settings.etl.source_table
+        self.batch_size = settings.etl.batch_size
+        # Types Arrow (dates sur 4 octets) : dépendance optionnelle
+        self.arrow_dtypes = settings.etl.arrow_dtypes
+        if self.arrow_dtypes:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("ETL_ARROW_DTYPES nécessite le paquet pyarrow (pip install pyarrow)")
+
+    def _read_sql(self, query, conn, params: Optional[dict] = None, columns: Tuple[str, ...] = (), **kwargs):
+        """pd.read_sql_query avec le schéma explicite des `columns` extraites"""
+        if self.arrow_dtypes:
+            return pd.read_sql_query(query, conn, params=params, dtype_backend='pyarrow',
+                                     dtype={col: ARROW_COLUMN_DTYPES[col] for col in columns}, **kwargs)
+        dates = [col for col in columns if COLUMN_DTYPES[col].startswith('datetime64')]
+        return pd.read_sql_query(query, conn, params=params, parse_dates=dates,
+                                 dtype={col: COLUMN_DTYPES[col] for col in columns if col not in dates}, **kwargs)
         
-    def extract_source_data(self) -> pd.DataFrame:
-        """Extrait les données de la table source"""
+    def extract_source_data(self, id_range: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
+        """Extrait les données de la table source (optionnellement limitées à une plage d'id)"""
         query = f"""
         SELECT id, datenaissance 
         FROM {self.source_table}
         WHERE datenaissance IS NOT NULL
+        {"AND id BETWEEN :id_min AND :id_max" if id_range else ""}
         ORDER BY id
         """
+        params = {'id_min': int(id_range[0]), 'id_max': int(id_range[1])} if id_range else None
         
         try:
-            with DatabaseConnection() as conn:
-                df = pd.read_sql_query(query, conn)
-                logger.info(f"Extraction réussie: {len(df)} lignes extraites de {self.source_table}")
+            with DatabaseConnection() as conn, track('extract_source') as stage:
+                df = self._read_sql(text(query), conn, params, columns=('id', 'datenaissance'))
+                stage.frame(df, count_bytes=True)
+                log = logger.debug if id_range else logger.info
+                log(f"Extraction réussie: {len(df)} lignes extraites de {self.source_table}")
                 return df
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction: {e}")
@@ -31,17 +62,179 @@ class DataExtractor:
             return datetime.strptime(settings.etl.snapshot_date, '%Y-%m-%d').date()
         return datetime.now().date()
     
-    def extract_target_structure(self) -> pd.DataFrame:
+    def get_snapshot_dates(self, start: date, end: date) -> List[date]:
+        """Dates de snapshot d'un backfill : tous les jours de start à end inclus"""
+        if end < start:
+            raise ValueError(f"Plage de dates invalide: {start} > {end}")
+        return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    
+    def extract_target_structure(self, id_range: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
         """Extrait la structure de la table target pour validation"""
         query = f"""
         SELECT snapshot_date, id, datenaissance, age 
         FROM {settings.etl.target_table}
+        {"WHERE id BETWEEN :id_min AND :id_max" if id_range else ""}
         """
+        params = {'id_min': int(id_range[0]), 'id_max': int(id_range[1])} if id_range else None
         
         try:
-            with DatabaseConnection() as conn:
-                df = pd.read_sql_query(query, conn)
+            with DatabaseConnection() as conn, track('extract_target') as stage:
+                df = self._read_sql(text(query), conn, params, columns=TARGET_COLUMNS)
+                stage.frame(df, count_bytes=True)
                 return df
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction de la structure target: {e}")
             raise
+
+    def extract_target_ids(self) -> pd.DataFrame:
+        """Id distincts de la table target, triés : les personnes calculées à chaque date d'un backfill"""
+        query = f"SELECT DISTINCT id FROM {settings.etl.target_table} ORDER BY id"
+        
+        try:
+            with DatabaseConnection() as conn, track('extract_target') as stage:
+                df = self._read_sql(text(query), conn, columns=('id',))
+                stage.frame(df, count_bytes=True)
+                return df
+        except Exception as e:
+            logger.error(f"Erreur lors de l'extraction des id target: {e}")
+            raise
+
+    def get_high_water_marks(self, lag_seconds: Optional[int] = None) -> Dict[str, Optional[datetime]]:
+        """
+        Bornes hautes du delta : plus grand created_at des tables source et target, au plus
+        l'horloge du serveur moins `lag_seconds` (settings.etl.incremental_lag_seconds par défaut).
+        """
+        lag = settings.etl.incremental_lag_seconds if lag_seconds is None else lag_seconds
+        with DatabaseConnection() as conn:
+            return {
+                table: conn.execute(text(
+                    f"SELECT LEAST(MAX(created_at), LOCALTIMESTAMP - make_interval(secs => :lag)) FROM {table}"
+                ), {'lag': lag}).scalar()
+                for table in (self.source_table, settings.etl.target_table)
+            }
+
+    def extract_incremental(self, since: Dict[str, Optional[datetime]], lag_seconds: Optional[int] = None
+                            ) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Optional[datetime]]]:
+        """
+        Extrait uniquement le delta depuis les marques `since` ({table: created_at}) :
+        - target : lignes ajoutées depuis la marque, et lignes dont l'id source a été ajouté ;
+        - source : lignes nécessaires au calcul de ces lignes target.
+        Retourne (source, target, nouvelles marques). Les bornes hautes sont figées avant la
+        lecture et restent `lag_seconds` derrière l'horloge : created_at est l'heure de début
+        de la transaction d'insertion, une ligne encore non validée peut donc apparaître plus
+        tard sous MAX(created_at). Les lignes plus récentes que la borne sont prises au run
+        suivant ; une transaction d'écriture plus longue que le délai peut encore être manquée.
+        """
+        upper = self.get_high_water_marks(lag_seconds)
+        target_table = settings.etl.target_table
+        params = {
+            'source_since': since.get(self.source_table) or datetime.min,
+            'source_upper': upper[self.source_table] or datetime.min,
+            'target_since': since.get(target_table) or datetime.min,
+            'target_upper': upper[target_table] or datetime.min,
+        }
+        new_source_ids = f"""
+        SELECT id FROM {self.source_table}
+        WHERE created_at > :source_since AND created_at <= :source_upper
+        """
+        new_target_ids = f"""
+        SELECT id FROM {target_table}
+        WHERE created_at > :target_since AND created_at <= :target_upper
+        """
+        target_query = f"""
+        SELECT snapshot_date, id, datenaissance, age
+        FROM {target_table}
+        WHERE (created_at > :target_since AND created_at <= :target_upper)
+           OR id IN ({new_source_ids})
+        """
+        source_query = f"""
+        SELECT id, datenaissance
+        FROM {self.source_table}
+        WHERE datenaissance IS NOT NULL
+          AND (id IN ({new_source_ids}) OR id IN ({new_target_ids}))
+        ORDER BY id
+        """
+        
+        try:
+            with DatabaseConnection() as conn:
+                with track('extract_source') as stage:
+                    source_df = self._read_sql(text(source_query), conn, params, columns=('id', 'datenaissance'))
+                    stage.frame(source_df, count_bytes=True)
+                with track('extract_target') as stage:
+                    target_df = self._read_sql(text(target_query), conn, params, columns=TARGET_COLUMNS)
+                    stage.frame(target_df, count_bytes=True)
+            logger.info(f"Extraction incrémentale: {len(source_df)} lignes source, "
+                        f"{len(target_df)} lignes target à recalculer")
+            return source_df, target_df, upper
+        except Exception as e:
+            logger.error(f"Erreur lors de l'extraction incrémentale: {e}")
+            raise
+
+    def get_id_partitions(self, partitions: int) -> List[Tuple[int, int]]:
+        """Découpe la plage d'id de la table target en `partitions` intervalles contigus"""
+        with DatabaseConnection() as conn:
+            id_min, id_max = conn.execute(
+                text(f"SELECT MIN(id), MAX(id) FROM {settings.etl.target_table}")
+            ).one()
+        if id_min is None:
+            return []
+        
+        step = -(-(id_max - id_min + 1) // partitions)  # division entière arrondie au supérieur
+        return [(low, min(low + step - 1, id_max)) for low in range(id_min, id_max + 1, step)]
+
+    def iter_target_structure(self, batch_size: Optional[int] = None, ordered: bool = True) -> Iterator[pd.DataFrame]:
+        """Lit la table target par lots via un curseur côté serveur, triée par id si `ordered`"""
+        query = f"""
+        SELECT snapshot_date, id, datenaissance, age 
+        FROM {settings.etl.target_table}
+        {"ORDER BY id, snapshot_date" if ordered else ""}
+        """
+        
+        try:
+            yield from self._iter_query(query, TARGET_COLUMNS, 'extract_target', batch_size)
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de l'extraction par lots de la structure target: {e}")
+            raise
+
+    def iter_source_data(self, batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Lit la table source par lots via un curseur côté serveur (sans tri)"""
+        query = f"""
+        SELECT id, datenaissance 
+        FROM {self.source_table}
+        WHERE datenaissance IS NOT NULL
+        """
+        
+        try:
+            yield from self._iter_query(query, ('id', 'datenaissance'), 'extract_source', batch_size)
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de l'extraction par lots de la source: {e}")
+            raise
+
+    def _iter_query(self, query: str, columns: Tuple[str, ...], stage_name: str,
+                    batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Produit le résultat de `query` par lots de batch_size lignes (curseur côté serveur)"""
+        batch_size = batch_size or self.batch_size
+        with DatabaseConnection(stream_results=True) as conn:
+            total = 0
+            chunks = self._read_sql(text(query), conn, columns=columns, chunksize=batch_size)
+            while True:
+                with track(stage_name) as stage:
+                    chunk = next(chunks, None)
+                    if chunk is not None:
+                        stage.frame(chunk, count_bytes=True)
+                if chunk is None:
+                    break
+                total += len(chunk)
+                yield chunk
+            logger.info(f"Extraction par lots réussie: {total} lignes lues ({stage_name})")
+
+    def iter_chunks(self, batch_size: Optional[int] = None) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Produit des couples (source, target) de taille bornée : chaque lot de la table
+        target est accompagné des lignes source de sa plage d'id.
+        """
+        for target_chunk in self.iter_target_structure(batch_size):
+            id_range = (target_chunk['id'].min(), target_chunk['id'].max())
+            yield self.extract_source_data(id_range=id_range), target_chunk
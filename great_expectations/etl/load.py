@@ -1,51 +1,184 @@
+import io
+import time
 import pandas as pd
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
 from etl.utils import DatabaseConnection, logger
+from etl.metrics import track
+from etl.watermark import WatermarkStore
 from config.settings import settings
-from etl.transform import DataTransformer
 
 from sqlalchemy import text
 
+RESULT_COLUMNS = ['snapshot_date', 'id', 'datenaissance', 'age']
+
+
+def to_csv_buffer(data: pd.DataFrame) -> io.StringIO:
+    """Sérialise les colonnes de résultat en CSV (format attendu par COPY ... FROM STDIN)"""
+    buffer = io.StringIO()
+    # Int64 : les âges restent des entiers même en présence de valeurs nulles
+    data[RESULT_COLUMNS].astype({'id': 'Int64', 'age': 'Int64'}).to_csv(
+        buffer, index=False, header=False, date_format='%Y-%m-%d'
+    )
+    buffer.seek(0)
+    return buffer
+
+
 class DataLoader:
-    def __init__(self):
-        self.target_results_for_ge = DataTransformer().transform_data()
+    def __init__(self, use_copy: bool = True, upsert: bool = False):
         self.target_table = settings.etl.target_table
+        self.target_results_table = settings.etl.target_results_for_ge
+        self.staging_table = f"{self.target_results_table}_staging"
+        # COPY FROM STDIN par défaut, INSERT classique en repli (moteurs non PostgreSQL)
+        self.use_copy = use_copy
+        # upsert=True : staging + INSERT ... ON CONFLICT, un rechargement est idempotent
+        self.upsert = upsert
         
-    def load_data(self) -> bool:
-        """Charge les données dans la table target"""
+    def load_data(self, data: pd.DataFrame, watermarks: Optional[Dict[str, datetime]] = None) -> bool:
+        """
+        Charge les données transformées dans la table target_results_for_ge.
+        Les marques hautes `watermarks` (extraction incrémentale) sont enregistrées
+        dans la même transaction : elles n'avancent que si le chargement est commité.
+        """
         try:
             with DatabaseConnection() as conn:
-                insert_query = """
-                INSERT INTO target_results_for_ge 
-                (snapshot_date, id, datenaissance, age)
-                VALUES (:snapshot_date, :id, :datenaissance, :age)
-                """
-                
-                data_dicts = [
-                    {
-                        'snapshot_date': row['snapshot_date'],
-                        'id': row['id'],
-                        'datenaissance': row['datenaissance'],
-                        'age': row['age']
-                    }
-                    for _, row in self.target_results_for_ge.iterrows()
-                ]
-                
-                conn.execute(text(insert_query), data_dicts)
+                start = time.perf_counter()
+                inserted = self._insert(conn, data)
+                if watermarks:
+                    WatermarkStore().save(conn, watermarks)
                 conn.commit()  # selon implémentation
                 
-                logger.info(f"Chargement réussi: {len(data_dicts)} lignes insérées dans {self.target_table}")
+                logger.info(f"Chargement réussi: {inserted} lignes insérées dans {self.target_results_table}")
+                self._log_throughput(inserted, time.perf_counter() - start)
                 return True
                 
         except Exception as e:
             logger.error(f"Erreur lors du chargement: {e}")
             raise
 
+    def load_chunks(self, chunks: Iterable[pd.DataFrame]) -> bool:
+        """Charge un flux de lots transformés, une transaction pour l'ensemble"""
+        try:
+            with DatabaseConnection() as conn:
+                start = time.perf_counter()
+                inserted = 0
+                for chunk in chunks:
+                    inserted += self._insert(conn, chunk)
+                conn.commit()
+                
+                logger.info(f"Chargement par lots réussi: {inserted} lignes insérées dans {self.target_results_table}")
+                self._log_throughput(inserted, time.perf_counter() - start)
+                return True
+                
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement par lots: {e}")
+            raise
+
+    def completed_snapshot_dates(self, start: date, end: date) -> List[date]:
+        """
+        Dates de snapshot déjà présentes dans target_results_for_ge entre start et end.
+        Chaque date d'un backfill est chargée dans sa propre transaction : une date
+        présente est une date terminée.
+        """
+        with DatabaseConnection() as conn:
+            return conn.execute(text(f"""
+            SELECT DISTINCT snapshot_date FROM {self.target_results_table}
+            WHERE snapshot_date BETWEEN :start AND :end
+            ORDER BY snapshot_date
+            """), {'start': start, 'end': end}).scalars().all()
+
+    def _insert(self, conn, data: pd.DataFrame) -> int:
+        """Insère un DataFrame dans target_results_for_ge et retourne le nombre de lignes"""
+        if data.empty:
+            return 0
+        with track('load') as stage:
+            stage.rows = len(data)
+            if self.upsert:
+                return self._upsert_rows(conn, data)
+            if self.use_copy and conn.dialect.name == "postgresql":
+                return self._copy_rows(conn, data)
+            return self._insert_rows(conn, data)
+
+    def _upsert_rows(self, conn, data: pd.DataFrame) -> int:
+        """
+        COPY dans une table de staging temporaire (non journalisée, propre à la session)
+        puis fusion dans la table cible sur sa clé primaire (snapshot_date, id).
+        Le tout reste dans la transaction de l'appelant. Une clé présente plusieurs fois
+        dans le lot n'est fusionnée qu'une fois (dernière occurrence) : ON CONFLICT refuse
+        de modifier deux fois la même ligne dans une commande.
+        """
+        duplicated = data.duplicated(['snapshot_date', 'id'], keep='last')
+        if duplicated.any():
+            logger.warning(f"{int(duplicated.sum())} doublons sur (snapshot_date, id) ignorés dans le lot")
+            data = data[~duplicated]
+        if not conn.in_transaction():
+            conn.begin()
+        conn.execute(text(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {self.staging_table}
+        (LIKE {self.target_results_table} INCLUDING DEFAULTS) ON COMMIT DROP
+        """))
+        self._copy_rows(conn, data, self.staging_table)
+        conn.execute(text(f"""
+        INSERT INTO {self.target_results_table} (snapshot_date, id, datenaissance, age)
+        SELECT snapshot_date, id, datenaissance, age FROM {self.staging_table}
+        ON CONFLICT (snapshot_date, id) DO UPDATE
+        SET datenaissance = EXCLUDED.datenaissance, age = EXCLUDED.age
+        """))
+        conn.execute(text(f"TRUNCATE {self.staging_table}"))
+        return len(data)
+
+    def _copy_rows(self, conn, data: pd.DataFrame, table: Optional[str] = None) -> int:
+        """Chargement en masse via COPY FROM STDIN (CSV) depuis un buffer mémoire"""
+        table = table or self.target_results_table
+        buffer = to_csv_buffer(data)
+
+        # Le curseur DBAPI brut ne démarre pas la transaction SQLAlchemy : on l'ouvre
+        if not conn.in_transaction():
+            conn.begin()
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(RESULT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+        return len(data)
+
+    def _insert_rows(self, conn, data: pd.DataFrame) -> int:
+        """Insertion ligne à ligne (executemany), pour les moteurs autres que PostgreSQL"""
+        insert_query = f"""
+        INSERT INTO {self.target_results_table} 
+        (snapshot_date, id, datenaissance, age)
+        VALUES (:snapshot_date, :id, :datenaissance, :age)
+        """
+        
+        data_dicts = [
+            {
+                'snapshot_date': row['snapshot_date'],
+                'id': row['id'],
+                'datenaissance': row['datenaissance'],
+                'age': row['age']
+            }
+            for _, row in data.iterrows()
+        ]
+        
+        conn.execute(text(insert_query), data_dicts)
+        return len(data_dicts)
+
+    def _log_throughput(self, rows: int, elapsed: float):
+        """Log le débit de chargement en lignes par seconde"""
+        rate = rows / elapsed if elapsed > 0 else float('inf')
+        method = "UPSERT" if self.upsert else "COPY" if self.use_copy else "INSERT"
+        logger.info(f"Débit de chargement ({method}): {rate:,.0f} lignes/s ({rows} lignes en {elapsed:.3f}s)")
+
     def create_tables_if_not_exist(self):
         """Crée les tables si elles n'existent pas"""
         create_source_table = f"""
         CREATE TABLE IF NOT EXISTS {settings.etl.source_table} (
             id SERIAL PRIMARY KEY,
-            datenaissance DATE NOT NULL
+            datenaissance DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
         """
         
@@ -55,14 +188,34 @@ class DataLoader:
             id INTEGER NOT NULL,
             datenaissance DATE,
             age INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             PRIMARY KEY (snapshot_date, id)
         );
         """
         
+        create_results_table = f"""
+        CREATE TABLE IF NOT EXISTS {self.target_results_table} (
+            snapshot_date DATE NOT NULL,
+            id INTEGER NOT NULL,
+            datenaissance DATE,
+            age INTEGER,
+            PRIMARY KEY (snapshot_date, id)
+        );
+        """
+        
+        # Index sur created_at : l'extraction incrémentale ne lit que le delta
+        create_created_at_indexes = f"""
+        CREATE INDEX IF NOT EXISTS idx_{settings.etl.source_table}_created_at ON {settings.etl.source_table}(created_at);
+        CREATE INDEX IF NOT EXISTS idx_{self.target_table}_created_at ON {self.target_table}(created_at);
+        """
+        
         try:
             with DatabaseConnection() as conn:
-                conn.execute(create_source_table)
-                conn.execute(create_target_table)
+                conn.execute(text(create_source_table))
+                conn.execute(text(create_target_table))
+                conn.execute(text(create_results_table))
+                conn.execute(text(create_created_at_indexes))
+                conn.commit()
                 logger.info("Tables créées avec succès")
         except Exception as e:
             logger.error(f"Erreur lors de la création des tables: {e}")
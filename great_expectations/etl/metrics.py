@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+from etl.utils import logger, pool_stats, reset_pool_stats
+
+try:
+    import resource
+except ImportError:  # Windows : pas de getrusage, le pic de RSS n'est pas mesuré
+    resource = None
+
+
+@dataclass
+class StageMetrics:
+    stage: str
+    calls: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    peak_rss_bytes: int = 0
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        return self.rows / self.seconds if self.seconds > 0 else None
+
+
+class StageTracker:
+    """Objet renvoyé par `track` : l'étape y déclare ses lignes et octets traités"""
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+
+    def frame(self, df: pd.DataFrame, count_bytes: bool = False):
+        """Enregistre la taille d'un DataFrame (octets en mémoire si count_bytes)"""
+        self.rows += len(df)
+        if count_bytes:
+            self.bytes += int(df.memory_usage(deep=True).sum())
+
+
+class MetricsRecorder:
+    """Agrège les mesures par étape pour un run du pipeline (les lots s'additionnent)"""
+    def __init__(self, pipeline: str = "great_expectations"):
+        self.pipeline = pipeline
+        self.reset()
+
+    def reset(self):
+        self.stages: Dict[str, StageMetrics] = {}
+        self.started_at = datetime.now()
+        reset_pool_stats()
+
+    @contextmanager
+    def track(self, stage: str):
+        tracker = StageTracker()
+        start = time.perf_counter()
+        try:
+            yield tracker
+        finally:
+            metrics = self.stages.setdefault(stage, StageMetrics(stage))
+            metrics.calls += 1
+            metrics.seconds += time.perf_counter() - start
+            metrics.rows += tracker.rows
+            metrics.bytes += tracker.bytes
+            metrics.peak_rss_bytes = max(metrics.peak_rss_bytes, _peak_rss_bytes())
+
+    def summary(self, success: bool) -> dict:
+        return {
+            'pipeline': self.pipeline,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'success': success,
+            'stages': [dict(asdict(m), rows_per_second=m.rows_per_second) for m in self.stages.values()],
+            'pool': pool_stats(),
+        }
+
+    def to_prometheus(self, success: bool) -> str:
+        """Format texte Prometheus (textfile collector de node_exporter)"""
+        labels = f'pipeline="{self.pipeline}"'
+        series = [
+            ('etl_stage_duration_seconds', "Durée cumulée de l'étape", lambda m: m.seconds),
+            ('etl_stage_rows', "Lignes traitées par l'étape", lambda m: m.rows),
+            ('etl_stage_rows_per_second', "Débit de l'étape en lignes par seconde", lambda m: m.rows_per_second),
+            ('etl_stage_bytes', "Octets extraits (taille mémoire des DataFrames)", lambda m: m.bytes),
+            ('etl_stage_peak_rss_bytes', "Pic de mémoire résidente à la fin de l'étape", lambda m: m.peak_rss_bytes),
+        ]
+        lines = []
+        for name, help_text, value_of in series:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for m in self.stages.values():
+                value = value_of(m)
+                if value is not None:
+                    lines.append(f'{name}{{{labels},stage="{m.stage}"}} {value}')
+        pool = pool_stats()
+        if pool is not None:
+            for key, help_text in [
+                ('size', "Connexions conservées par le pool"),
+                ('checked_out', "Connexions empruntées à l'export"),
+                ('overflow', "Connexions ouvertes au-delà de la taille du pool"),
+                ('checkouts', "Emprunts de connexion pendant le run"),
+                ('connections_opened', "Connexions physiques ouvertes pendant le run"),
+                ('checkout_wait_seconds', "Attente cumulée pour obtenir une connexion"),
+                ('max_checkout_wait_seconds', "Plus longue attente pour obtenir une connexion"),
+            ]:
+                name = f"etl_db_pool_{key}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{{{labels}}} {pool[key]}"]
+        lines += [
+            "# HELP etl_run_success 1 si le dernier run a réussi",
+            "# TYPE etl_run_success gauge",
+            f"etl_run_success{{{labels}}} {int(success)}",
+            "# HELP etl_run_timestamp_seconds Début du dernier run (epoch)",
+            "# TYPE etl_run_timestamp_seconds gauge",
+            f"etl_run_timestamp_seconds{{{labels}}} {self.started_at.timestamp():.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: str, success: bool):
+        """Écrit le fichier .prom (remplacé atomiquement) et le résumé JSON du run"""
+        os.makedirs(directory, exist_ok=True)
+        prom_path = os.path.join(directory, f"etl_{self.pipeline}.prom")
+        _write_atomic(prom_path, self.to_prometheus(success))
+
+        json_path = os.path.join(directory, f"run_{self.pipeline}_{self.started_at:%Y%m%d-%H%M%S}.json")
+        _write_atomic(json_path, json.dumps(self.summary(success), indent=2))
+        logger.info(f"Métriques exportées: {prom_path}, {json_path}")
+
+
+def _peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    # ru_maxrss est en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _write_atomic(path: str, content: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# Enregistreur partagé par les étapes du pipeline
+metrics = MetricsRecorder()
+track = metrics.track
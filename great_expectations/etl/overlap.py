@@ -0,0 +1,91 @@
+import queue
+import threading
+from typing import Iterable, Iterator, List
+
+from etl.utils import logger
+
+# Marqueur de fin de flux
+_DONE = object()
+
+
+class _Failure:
+    """Exception levée par une étape, transmise à l'étape suivante via la file"""
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StageCancelled(Exception):
+    """Une autre étape du pipeline a échoué : cette étape s'est arrêtée"""
+
+
+class OverlappedExecutor:
+    """
+    Exécute des étapes (itérables) dans des threads reliés par des files bornées : la lecture,
+    le calcul et l'écriture se recouvrent, et une étape rapide attend (backpressure) dès que
+    la file vers l'étape suivante est pleine.
+
+    Une erreur dans une étape est propagée à l'étape suivante jusqu'au consommateur final ;
+    à la sortie du bloc `with`, toutes les étapes encore actives sont annulées et attendues.
+    """
+    def __init__(self, queue_size: int = 2, poll_interval: float = 0.1):
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.cancelled = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cancelled.set()
+        for thread in self.threads:
+            thread.join()
+
+    def background(self, iterable: Iterable, name: str) -> Iterator:
+        """Consomme `iterable` dans un thread dédié et retourne un itérateur sur ses éléments"""
+        items = queue.Queue(maxsize=self.queue_size)
+        thread = threading.Thread(target=self._produce, args=(iterable, items, name), name=f"etl-{name}", daemon=True)
+        self.threads.append(thread)
+        thread.start()
+        return self._consume(items, name)
+
+    def _produce(self, iterable: Iterable, items: queue.Queue, name: str):
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not self._put(items, item):
+                    return
+            self._put(items, _DONE)
+        except StageCancelled:
+            pass
+        except BaseException as e:
+            logger.error(f"Erreur dans l'étape {name}: {e}")
+            self._put(items, _Failure(e))
+        finally:
+            # Libère les ressources du générateur (curseur, connexion) même en cas d'annulation
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    def _put(self, items: queue.Queue, item) -> bool:
+        while not self.cancelled.is_set():
+            try:
+                items.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _consume(self, items: queue.Queue, name: str) -> Iterator:
+        while True:
+            try:
+                item = items.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if self.cancelled.is_set():
+                    raise StageCancelled(name)
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
@@ -0,0 +1,101 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, List, Optional, Tuple
+
+from etl.utils import logger, reset_engine
+from etl.extract import DataExtractor
+from etl.transform import DataTransformer
+from etl.load import DataLoader
+
+
+@dataclass
+class PartitionResult:
+    id_range: Tuple[int, int]
+    rows: int = 0
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class SnapshotResult:
+    snapshot_date: date
+    rows: int = 0
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def _init_worker():
+    """Chaque processus repart d'un pool de connexions vierge"""
+    reset_engine()
+
+
+def _run_in_pool(func: Callable, items: list, workers: int, upsert: bool) -> list:
+    """Applique `func(item, upsert)` à chaque élément sur un pool de `workers` processus"""
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(func, item, upsert) for item in items]
+        return [future.result() for future in futures]
+
+
+def run_partition(id_range: Tuple[int, int], upsert: bool = False) -> PartitionResult:
+    """Extrait, transforme et charge une plage d'id sur sa propre connexion"""
+    try:
+        extractor = DataExtractor()
+        transformer = DataTransformer(extractor)
+        
+        source_df = extractor.extract_source_data(id_range=id_range)
+        target_df = extractor.extract_target_structure(id_range=id_range)
+        transformed_df = transformer.transform_data(source_df, target_df)
+        
+        if not transformer.validate_transformed_data(transformed_df):
+            raise ValueError("Validation des données transformées échouée")
+        DataLoader(upsert=upsert).load_data(transformed_df)
+        return PartitionResult(id_range, rows=len(transformed_df))
+        
+    except Exception as e:
+        logger.error(f"Erreur sur la partition d'id {id_range}: {e}")
+        return PartitionResult(id_range, error=str(e))
+
+
+def run_partitions(id_ranges: List[Tuple[int, int]], workers: int, upsert: bool = False) -> List[PartitionResult]:
+    """Exécute les partitions sur un pool de `workers` processus"""
+    return _run_in_pool(run_partition, id_ranges, workers, upsert)
+
+
+def run_snapshot_group(snapshot_dates: List[date], upsert: bool = False) -> List[SnapshotResult]:
+    """
+    Backfill d'un groupe de dates dans un processus : source et id target extraits une
+    fois, une transaction par date (une date chargée reste chargée si la suivante échoue)
+    """
+    results = []
+    try:
+        extractor = DataExtractor()
+        transformer = DataTransformer(extractor)
+        loader = DataLoader(upsert=upsert)
+        snapshots = transformer.transform_snapshots(extractor.extract_source_data(), extractor.extract_target_ids(),
+                                                    snapshot_dates)
+        for snapshot_date, snapshot_data in snapshots:
+            if not transformer.validate_transformed_data(snapshot_data):
+                raise ValueError(f"Validation du snapshot {snapshot_date} échouée")
+            loader.load_data(snapshot_data)
+            results.append(SnapshotResult(snapshot_date, rows=len(snapshot_data)))
+        
+    except Exception as e:
+        logger.error(f"Erreur sur le groupe de dates {snapshot_dates[0]}..{snapshot_dates[-1]}: {e}")
+        loaded = {result.snapshot_date for result in results}
+        results += [SnapshotResult(snapshot_date, error=str(e)) for snapshot_date in snapshot_dates
+                    if snapshot_date not in loaded]
+    return results
+
+
+def run_snapshot_dates(snapshot_dates: List[date], workers: int, upsert: bool = False) -> List[SnapshotResult]:
+    """Répartit les dates d'un backfill en `workers` groupes traités par le pool de processus"""
+    groups = [snapshot_dates[index::workers] for index in range(workers) if snapshot_dates[index::workers]]
+    results = [result for group in _run_in_pool(run_snapshot_group, groups, workers, upsert) for result in group]
+    return sorted(results, key=lambda result: result.snapshot_date)
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from etl.utils import logger
+
+# Taille mémoire estimée d'une ligne avec le schéma compact de l'extraction, fusion comprise
+TARGET_ROW_BYTES = 32
+SOURCE_ROW_BYTES = 12
+# Marge pour les copies intermédiaires (concaténation, tri, jointure, calcul des âges)
+WORKING_SET_FACTOR = 4
+
+
+def plan_partitions(target_rows: int, source_rows: int, memory_budget_mb: int) -> int:
+    """Nombre de partitions pour qu'une partition (target + source) tienne dans le budget mémoire"""
+    working_set = (target_rows * TARGET_ROW_BYTES + source_rows * SOURCE_ROW_BYTES) * WORKING_SET_FACTOR
+    return max(1, -(-working_set // (memory_budget_mb * 2**20)))  # division arrondie au supérieur
+
+
+def batch_rows(memory_budget_mb: int) -> int:
+    """Taille des lots lus depuis la base pour rester dans le budget pendant le partitionnement"""
+    return max(1_000, memory_budget_mb * 2**20 // (TARGET_ROW_BYTES * WORKING_SET_FACTOR))
+
+
+class PartitionSpill:
+    """
+    Partitionnement par hachage sur `id` vers des fichiers temporaires : chaque lot écrit
+    est découpé en `partitions` morceaux (id % partitions) ; une partition relue contient
+    donc tous les id d'une même classe, côté target comme côté source.
+
+    Format colonnaire Arrow IPC (Feather) si pyarrow est installé, pickle sinon.
+    Le répertoire temporaire est supprimé à la sortie du bloc `with`, succès ou échec.
+    """
+    def __init__(self, partitions: int, directory: Optional[str] = None):
+        self.partitions = partitions
+        self.directory = directory
+        self.path = None
+        self.pieces = {}
+        try:
+            import pyarrow  # noqa: F401
+            self.format = 'feather'
+        except ImportError:
+            self.format = 'pickle'
+
+    def __enter__(self):
+        self.path = tempfile.mkdtemp(prefix='etl-spill-', dir=self.directory)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        shutil.rmtree(self.path, ignore_errors=True)
+        logger.debug(f"Fichiers de débordement supprimés: {self.path}")
+
+    def write(self, name: str, chunks: Iterable[pd.DataFrame]) -> int:
+        """Répartit les lots de `name` (ex. 'target') entre les partitions, retourne le nombre de lignes"""
+        rows = 0
+        for chunk in chunks:
+            rows += len(chunk)
+            for partition, piece in chunk.groupby(chunk['id'].to_numpy() % self.partitions, sort=False):
+                index = self.pieces.get((name, partition), 0)
+                self._dump(piece.reset_index(drop=True), self._piece_path(name, partition, index))
+                self.pieces[(name, partition)] = index + 1
+        return rows
+
+    def read(self, name: str, partition: int, columns) -> pd.DataFrame:
+        """Relit tous les morceaux d'une partition (DataFrame vide avec `columns` si aucun)"""
+        pieces = [self._load(self._piece_path(name, partition, index))
+                  for index in range(self.pieces.get((name, partition), 0))]
+        if not pieces:
+            return pd.DataFrame(columns=list(columns))
+        return pd.concat(pieces, ignore_index=True)
+
+    def _piece_path(self, name: str, partition: int, index: int) -> str:
+        return os.path.join(self.path, f"{name}-{partition:05d}-{index:06d}.{self.format}")
+
+    def _dump(self, df: pd.DataFrame, path: str):
+        if self.format == 'feather':
+            df.to_feather(path)
+        else:
+            df.to_pickle(path)
+
+    def _load(self, path: str) -> pd.DataFrame:
+        if self.format == 'feather':
+            return pd.read_feather(path)
+        return pd.read_pickle(path)
@@ -1,62 +1,243 @@
 import pandas as pd
 from datetime import datetime, date
-from etl.utils import calculate_age, logger
-from etl.extract import DataExtractor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import text
+from etl.utils import (DatabaseConnection, age_sql, ages_from_parts, birthday_window_sql, calculate_ages,
+                       get_table_row_count, logger, sorted_left_join, split_dates)
+from etl.extract import TARGET_COLUMNS, DataExtractor
+from etl.spill import PartitionSpill, batch_rows, plan_partitions
+from etl.validation import ValidationReport, validate_frame, validate_table
+from etl.metrics import track
+from config.settings import settings
 
 class DataTransformer:
-    def __init__(self):
-        self.extractor = DataExtractor()
+    def __init__(self, extractor: Optional[DataExtractor] = None):
+        self.extractor = extractor or DataExtractor()
+        # Rapport de la dernière validation (comptes et exemples de lignes fautives)
+        self.validation_report: Optional[ValidationReport] = None
+        # Snapshots écrits par le dernier transform_in_database, triés
+        self.loaded_snapshots: List[date] = []
         
-    def transform_data(self) -> pd.DataFrame:
-        """Transforme les données source pour la table target"""
+    def transform_data(self, source_df: Optional[pd.DataFrame] = None,
+                       target_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Transforme les données source pour la table target (extrait les tables non fournies)"""
         try:
             # Créer le DataFrame target et source
-            target_df = self.extractor.extract_target_structure()
-            source_df = self.extractor.extract_source_data()
+            if target_df is None:
+                target_df = self.extractor.extract_target_structure()
+            if source_df is None:
+                source_df = self.extractor.extract_source_data()
             
-            merged_df = target_df[['snapshot_date', 'id', 'age']].merge(
-            source_df[['id', 'datenaissance']],
-            on='id',
-            how='left',
-            suffixes=('', '_source')
-            )
-            merged_df['age'] = merged_df.apply(
-            lambda row: calculate_age(row['datenaissance'], row['snapshot_date']),
-            axis=1
-        )  # Utilisation de Int64 pour gérer les NaN
-            logger.info(f"Transformation réussie: {len(merged_df)} lignes transformées")
-            return merged_df[['snapshot_date', 'id', 'datenaissance', 'age']]
+            result_df = self.transform_frames(source_df, target_df)
+            logger.info(f"Transformation réussie: {len(result_df)} lignes transformées")
+            return result_df
             
         except Exception as e:
             logger.error(f"Erreur lors de la transformation: {e}")
             raise
+
+    def transform_frames(self, source_df: pd.DataFrame, target_df: pd.DataFrame) -> pd.DataFrame:
+        """Fusionne target et source sur id (jointure triée si possible) puis calcule les âges"""
+        with track('merge') as stage:
+            # La source est lue ORDER BY id : jointure par recherche dichotomique, sans table de hachage
+            merged_df = sorted_left_join(target_df[['snapshot_date', 'id', 'age']], source_df[['id', 'datenaissance']], 'id')
+            if merged_df is None:
+                merged_df = target_df[['snapshot_date', 'id', 'age']].merge(
+                source_df[['id', 'datenaissance']],
+                on='id',
+                how='left',
+                suffixes=('', '_source')
+                )
+            stage.rows = len(merged_df)
+        with track('age_computation') as stage:
+            merged_df['age'] = calculate_ages(merged_df['datenaissance'], merged_df['snapshot_date']).astype('int16')
+            stage.rows = len(merged_df)
+        return merged_df[['snapshot_date', 'id', 'datenaissance', 'age']]
+
+    def transform_chunks(self, batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Transforme les données lot par lot (mémoire bornée par batch_size)"""
+        try:
+            total = 0
+            for source_chunk, target_chunk in self.extractor.iter_chunks(batch_size):
+                result_chunk = self.transform_frames(source_chunk, target_chunk)
+                total += len(result_chunk)
+                yield result_chunk
+            logger.info(f"Transformation par lots réussie: {total} lignes transformées")
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la transformation par lots: {e}")
+            raise
     
-    def validate_transformed_data(self, df: pd.DataFrame) -> bool:
-        """Valide les données transformées"""
-        validations = []
+    def transform_out_of_core(self, memory_budget_mb: int, spill_dir: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        Transformation hors mémoire : target et source sont partitionnées par hachage sur id
+        dans des fichiers temporaires, puis chaque partition est jointe et transformée seule.
+        Le nombre de partitions et la taille des lots lus sont dérivés du budget mémoire.
+        """
+        partitions = plan_partitions(get_table_row_count(settings.etl.target_table),
+                                     get_table_row_count(settings.etl.source_table), memory_budget_mb)
+        batch_size = batch_rows(memory_budget_mb)
+        logger.info(f"Transformation hors mémoire: {partitions} partition(s), budget {memory_budget_mb} Mo")
         
-        # Vérifier les colonnes requises
-        required_columns = ['snapshot_date', 'id', 'datenaissance', 'age']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            logger.error(f"Colonnes manquantes: {missing_columns}")
-            return False
-        
-        # Vérifier les valeurs nulles
-        null_counts = df.isnull().sum()
-        if null_counts.any():
-            logger.warning(f"Valeurs nulles détectées: {null_counts[null_counts > 0].to_dict()}")
-        
-        # Vérifier les âges négatifs
-        negative_ages = df[df['age'] < 0]
-        if not negative_ages.empty:
-            logger.error(f"Âges négatifs détectés: {len(negative_ages)} lignes")
-            return False
+        try:
+            with PartitionSpill(partitions, spill_dir) as spill:
+                spill.write('target', self.extractor.iter_target_structure(batch_size, ordered=False))
+                spill.write('source', self.extractor.iter_source_data(batch_size))
+                
+                total = 0
+                for partition in range(partitions):
+                    target_part = spill.read('target', partition, TARGET_COLUMNS)
+                    if target_part.empty:
+                        continue
+                    # Partition source triée : la jointure triée s'applique
+                    source_part = spill.read('source', partition, ('id', 'datenaissance')).sort_values('id', ignore_index=True)
+                    result_part = self.transform_frames(source_part, target_part)
+                    total += len(result_part)
+                    yield result_part
+                logger.info(f"Transformation hors mémoire réussie: {total} lignes transformées")
+                
+        except Exception as e:
+            logger.error(f"Erreur lors de la transformation hors mémoire: {e}")
+            raise
+
+    def transform_snapshots(self, source_df: pd.DataFrame, target_ids: pd.DataFrame,
+                            snapshot_dates: Iterable[date]) -> Iterator[Tuple[date, pd.DataFrame]]:
+        """
+        Backfill : calcule pour chaque date de snapshot les âges des id de la table target
+        (`target_ids`, voir extract_target_ids), une date à la fois. Comme une exécution
+        normale, un id sans ligne source reste présent (date de naissance nulle, âge 0) et
+        un id source absent de la target n'est pas calculé. La jointure est faite et les
+        dates de naissance décomposées une seule fois pour toutes les dates.
+        """
+        people = sorted_left_join(target_ids[['id']], source_df[['id', 'datenaissance']], 'id')
+        if people is None:
+            people = target_ids[['id']].merge(source_df[['id', 'datenaissance']], on='id', how='left')
+        birth_years, birth_md, birth_nat = split_dates(people['datenaissance'])
+        for snapshot_date in snapshot_dates:
+            with track('age_computation') as stage:
+                snapshot_years, snapshot_md, _ = split_dates([snapshot_date])
+                ages = ages_from_parts(birth_years, birth_md, birth_nat, snapshot_years, snapshot_md)
+                result_df = people.assign(snapshot_date=pd.Timestamp(snapshot_date), age=ages.astype('int16'))
+                stage.rows = len(result_df)
+            yield snapshot_date, result_df[['snapshot_date', 'id', 'datenaissance', 'age']]
+
+    def build_pushdown_query(self) -> str:
+        """Requête SELECT qui réalise la jointure et le calcul d'âge dans PostgreSQL"""
+        return f"""
+        SELECT t.snapshot_date, t.id, s.datenaissance,
+        {age_sql('s.datenaissance', 't.snapshot_date')} AS age
+        FROM {settings.etl.target_table} t
+        LEFT JOIN {settings.etl.source_table} s
+            ON s.id = t.id AND s.datenaissance IS NOT NULL
+        """
+
+    def transform_in_database(self, upsert: bool = False) -> int:
+        """
+        Mode push-down : INSERT ... SELECT exécuté côté serveur, aucune donnée
+        ne transite par Python. Retourne le nombre de lignes insérées ; les snapshots
+        écrits (RETURNING, agrégé côté serveur) sont gardés dans loaded_snapshots.
+        """
+        on_conflict = """
+        ON CONFLICT (snapshot_date, id) DO UPDATE
+        SET datenaissance = EXCLUDED.datenaissance, age = EXCLUDED.age
+        """ if upsert else ""
+        query = f"""
+        WITH inserted AS (
+            INSERT INTO {settings.etl.target_results_for_ge} (snapshot_date, id, datenaissance, age)
+            {self.build_pushdown_query()}
+            {on_conflict}
+            RETURNING snapshot_date
+        )
+        SELECT snapshot_date, COUNT(*) AS rows FROM inserted GROUP BY snapshot_date ORDER BY snapshot_date
+        """
+        try:
+            with DatabaseConnection() as conn, track('transform_sql') as stage:
+                per_snapshot = conn.execute(text(query)).all()
+                conn.commit()
+                self.loaded_snapshots = [row.snapshot_date for row in per_snapshot]
+                stage.rows = sum(row.rows for row in per_snapshot)
+                logger.info(f"Transformation SQL réussie: {stage.rows} lignes insérées dans {settings.etl.target_results_for_ge}")
+                return stage.rows
+        except Exception as e:
+            logger.error(f"Erreur lors de la transformation SQL: {e}")
+            raise
+    
+    def refresh_snapshot(self, previous_snapshot: date, snapshot_date: date, upsert: bool = False) -> int:
+        """
+        Construit le snapshot `snapshot_date` à partir des résultats de `previous_snapshot`
+        dans target_results_for_ge : seuls les âges des personnes dont l'anniversaire tombe
+        entre les deux dates sont recalculés, les autres lignes sont reportées telles quelles.
+        Les id de target_table absents du snapshot précédent sont calculés par jointure
+        avec la source. Retourne le nombre de lignes écrites.
+        """
+        results_table = settings.etl.target_results_for_ge
+        window = birthday_window_sql('p.datenaissance', previous_snapshot, snapshot_date)
+        # Écart d'un an ou plus : tous les âges changent, on recalcule tout
+        age = f"""CASE WHEN {window}
+            THEN {age_sql('p.datenaissance', 'CAST(:snapshot_date AS DATE)')}
+            ELSE p.age END""" if window else age_sql('p.datenaissance', 'CAST(:snapshot_date AS DATE)')
+        on_conflict = """
+        ON CONFLICT (snapshot_date, id) DO UPDATE
+        SET datenaissance = EXCLUDED.datenaissance, age = EXCLUDED.age
+        """ if upsert else ""
         
-        # Vérifier les âges supérieurs à 150 ans
-        old_ages = df[df['age'] > 150]
-        if not old_ages.empty:
-            logger.warning(f"Âges supérieurs à 150 ans: {len(old_ages)} lignes")
+        carry_forward = f"""
+        INSERT INTO {results_table} (snapshot_date, id, datenaissance, age)
+        SELECT CAST(:snapshot_date AS DATE), p.id, p.datenaissance, {age}
+        FROM {results_table} p
+        WHERE p.snapshot_date = :previous_snapshot
+        {on_conflict}
+        """
+        new_ids = f"""
+        INSERT INTO {results_table} (snapshot_date, id, datenaissance, age)
+        {self.build_pushdown_query()}
+        WHERE t.snapshot_date = :snapshot_date
+          AND NOT EXISTS (
+            SELECT 1 FROM {results_table} p
+            WHERE p.snapshot_date = :previous_snapshot AND p.id = t.id
+          )
+        {on_conflict}
+        """
+        params = {'previous_snapshot': previous_snapshot, 'snapshot_date': snapshot_date}
         
-        logger.info("Validation des données transformées réussie")
-        return True
+        try:
+            with DatabaseConnection() as conn, track('refresh_snapshot') as stage:
+                carried = conn.execute(text(carry_forward), params).rowcount
+                added = conn.execute(text(new_ids), params).rowcount
+                conn.commit()
+                stage.rows = carried + added
+                logger.info(f"Snapshot {snapshot_date}: {carried} lignes reportées, {added} nouvelles lignes calculées")
+                return carried + added
+        except Exception as e:
+            logger.error(f"Erreur lors du rafraîchissement du snapshot: {e}")
+            raise
+
+    def validate_transformed_data(self, df: pd.DataFrame) -> bool:
+        """Valide les données transformées en une passe vectorisée (rapport dans validation_report)"""
+        with track('validate') as stage:
+            stage.rows = len(df)
+            self.validation_report = validate_frame(df)
+            self.validation_report.log()
+            if self.validation_report.success:
+                logger.info("Validation des données transformées réussie")
+            return self.validation_report.success
+
+    def validate_loaded_data(self, snapshot_date: Optional[date] = None,
+                             snapshot_dates: Optional[Sequence[date]] = None) -> bool:
+        """
+        Valide les résultats déjà chargés (d'un snapshot, de plusieurs avec `snapshot_dates`,
+        ou tous) en une requête d'agrégat
+        """
+        if snapshot_dates:
+            where, params = "snapshot_date = ANY(:snapshot_dates)", {'snapshot_dates': list(snapshot_dates)}
+        elif snapshot_date:
+            where, params = "snapshot_date = :snapshot_date", {'snapshot_date': snapshot_date}
+        else:
+            where, params = None, None
+        with DatabaseConnection() as conn, track('validate') as stage:
+            self.validation_report = validate_table(conn, settings.etl.target_results_for_ge, where=where, params=params)
+            stage.rows = self.validation_report.rows
+        self.validation_report.log()
+        if self.validation_report.success:
+            logger.info(f"Validation des données chargées réussie ({self.validation_report.rows} lignes)")
+        return self.validation_report.success
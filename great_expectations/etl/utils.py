@@ -1,30 +1,130 @@
 import logging
+import threading
+import time
 from datetime import datetime, date
 from typing import Optional, List
 
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 
-from config.settings import settings
+from config.settings import PoolConfig, settings
 
 # Logger configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Engine global (tu peux aussi en créer un dans __main__)
-engine: Engine = create_engine(settings.db.connection_string)
+# Même classe que pytest/etl/db.py : les deux projets restent installables et exécutables
+# séparément (chacun son paquet `etl` et ses requirements), une correction se reporte dans les deux.
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool qui mesure l'attente au checkout et compte les connexions physiques ouvertes"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.checkouts = 0
+        self.connections_opened = 0
+        self.checkout_wait_seconds = 0.0
+        self.max_checkout_wait_seconds = 0.0
+
+    def connect(self):
+        # Inclut l'attente d'une connexion libre et, si besoin, l'ouverture d'une nouvelle connexion
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.checkout_wait_seconds += waited
+                self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, waited)
+
+    def _create_connection(self):
+        with self._stats_lock:
+            self.connections_opened += 1
+        return super()._create_connection()
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size(),
+            'checked_out': self.checkedout(),
+            'overflow': max(0, self.overflow()),
+            'checkouts': self.checkouts,
+            'connections_opened': self.connections_opened,
+            'checkout_wait_seconds': self.checkout_wait_seconds,
+            'max_checkout_wait_seconds': self.max_checkout_wait_seconds,
+        }
+
+
+def create_pooled_engine(url: Optional[str] = None, pool: Optional[PoolConfig] = None) -> Engine:
+    """Engine SQLAlchemy configuré par settings.db.pool (taille, recyclage, timeout)"""
+    pool = pool or settings.db.pool
+    connect_args = {'application_name': pool.application_name}
+    if pool.statement_timeout_ms:
+        connect_args['options'] = f"-c statement_timeout={pool.statement_timeout_ms}"
+    return create_engine(
+        url or settings.db.connection_string,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool.size,
+        max_overflow=pool.max_overflow,
+        pool_pre_ping=pool.pre_ping,
+        pool_recycle=pool.recycle_seconds,
+        connect_args=connect_args,
+        # stream_results n'est jamais activé ici : psycopg2 enroberait aussi les écritures et la DDL
+        # dans DECLARE ... CURSOR. Seules les lectures l'activent (DatabaseConnection(stream_results=True))
+        execution_options={'max_row_buffer': pool.max_row_buffer},
+    )
+
+
+# Engine global, créé au premier usage (pas de connexion ni de driver chargé à l'import)
+_engine: Optional[Engine] = None
+
+
+def get_engine() -> Engine:
+    """Retourne l'engine partagé, en le créant au premier appel"""
+    global _engine
+    if _engine is None:
+        _engine = create_pooled_engine()
+    return _engine
+
+
+def reset_engine():
+    """Abandonne l'engine hérité (ex. après un fork) sans fermer les connexions du parent"""
+    global _engine
+    if _engine is not None:
+        _engine.dispose(close=False)
+    _engine = None
+
+
+def pool_stats() -> Optional[dict]:
+    """Compteurs du pool partagé (None tant qu'aucune connexion n'a été demandée)"""
+    if _engine is None or not isinstance(_engine.pool, InstrumentedQueuePool):
+        return None
+    return _engine.pool.stats()
+
+
+def reset_pool_stats():
+    if _engine is not None and isinstance(_engine.pool, InstrumentedQueuePool):
+        _engine.pool.reset_stats()
 
 # ==========================
 # 📦 Connexion DB (context manager)
 # ==========================
 class DatabaseConnection:
-    def __init__(self):
-        self.engine = engine
+    def __init__(self, stream_results: bool = False):
+        self.engine = get_engine()
         self.connection = None
+        # stream_results=True : curseur côté serveur, les lignes sont lues par lots (lectures seulement)
+        self.stream_results = stream_results
 
     def __enter__(self):
         self.connection = self.engine.connect()
+        if self.stream_results:
+            self.connection = self.connection.execution_options(stream_results=self.stream_results)
         return self.connection
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -46,6 +146,107 @@ def calculate_age(birth_date: date, snapshot_date: date) -> int:
     return max(0, age)
 
 
+def to_datetime64(values) -> np.ndarray:
+    """Convertit une colonne de dates (Series, array, liste) en datetime64[D]"""
+    dtype = getattr(values, "dtype", None)
+    # Dates déjà typées à l'extraction : pas de re-parsing
+    if isinstance(dtype, pd.ArrowDtype) and dtype.kind == "M":
+        # date32 Arrow : conversion native, sans passer par des objets Python
+        timestamps = pd.Series(values).astype("timestamp[ns][pyarrow]")
+        return timestamps.to_numpy(dtype="datetime64[ns]", na_value=np.datetime64("NaT")).astype("datetime64[D]")
+    if dtype is not None and dtype.kind == "M":
+        return np.asarray(values, dtype="datetime64[D]")
+    return np.asarray(pd.to_datetime(values, errors="coerce"), dtype="datetime64[D]")
+
+
+def split_dates(values) -> tuple:
+    """Décompose des dates en (années, mois * 100 + jour, masque des dates nulles)"""
+    dates = to_datetime64(values)
+    months = dates.astype("datetime64[M]")
+    years = dates.astype("datetime64[Y]").astype(np.int64)
+    # (mois, jour) encodé en un entier comparable : mois * 100 + jour
+    month_days = (months.astype(np.int64) % 12 + 1) * 100 + (dates - months).astype(np.int64) + 1
+    return years, month_days, np.isnat(dates)
+
+
+def calculate_ages(birth_dates, snapshot_dates) -> np.ndarray:
+    """Version vectorisée de calculate_age (anniversaire calendaire, date nulle -> 0)"""
+    birth_years, birth_md, birth_nat = split_dates(birth_dates)
+    snapshot_years, snapshot_md, snapshot_nat = split_dates(snapshot_dates)
+    return ages_from_parts(birth_years, birth_md, birth_nat, snapshot_years, snapshot_md, snapshot_nat)
+
+
+def ages_from_parts(birth_years, birth_md, birth_nat, snapshot_years, snapshot_md, snapshot_nat=False) -> np.ndarray:
+    """
+    Cœur de calculate_ages sur des dates déjà décomposées (split_dates) : permet de
+    décomposer les naissances une seule fois pour plusieurs dates de snapshot.
+    """
+    ages = snapshot_years - birth_years - (snapshot_md < birth_md)
+    # Naissance postérieure au snapshot <=> âge calculé négatif
+    ages[birth_nat | snapshot_nat | (ages < 0)] = 0
+    return ages
+
+
+def sorted_left_join(left: pd.DataFrame, right: pd.DataFrame, on: str) -> Optional[pd.DataFrame]:
+    """
+    Jointure gauche sur `on` quand les clés de `right` sont uniques et triées (ex. source
+    lue ORDER BY id) : recherche dichotomique (searchsorted) au lieu d'une table de hachage,
+    l'ordre et les lignes sans correspondance (valeurs nulles) sont ceux de merge(how='left').
+    Retourne None si `right` ne remplit pas ces conditions : l'appelant utilise alors merge.
+    """
+    keys = right[on].to_numpy()
+    if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+        return None  # clés non triées ou dupliquées
+    if set(left.columns) & (set(right.columns) - {on}):
+        return None  # colonnes en conflit : merge applique les suffixes
+
+    left_keys = left[on].to_numpy()
+    positions = np.minimum(np.searchsorted(keys, left_keys), max(len(keys) - 1, 0))
+    found = keys[positions] == left_keys if len(keys) else np.zeros(len(left_keys), dtype=bool)
+    # -1 : pas de correspondance, take remplit avec la valeur nulle du type (comme merge)
+    indexer = np.where(found, positions, -1)
+
+    result = left.reset_index(drop=True)
+    for col in right.columns.drop(on):
+        result[col] = pd.api.extensions.take(right[col].values, indexer, allow_fill=True)
+    return result
+
+
+def age_sql(birth_col: str, snapshot_col: str) -> str:
+    """Expression SQL (PostgreSQL) équivalente à calculate_age"""
+    return f"""CASE
+            WHEN {birth_col} IS NULL OR {snapshot_col} IS NULL OR {birth_col} > {snapshot_col} THEN 0
+            ELSE GREATEST(0,
+                EXTRACT(YEAR FROM {snapshot_col})::int - EXTRACT(YEAR FROM {birth_col})::int
+                - CASE
+                    WHEN (EXTRACT(MONTH FROM {snapshot_col}), EXTRACT(DAY FROM {snapshot_col}))
+                       < (EXTRACT(MONTH FROM {birth_col}), EXTRACT(DAY FROM {birth_col}))
+                    THEN 1 ELSE 0
+                  END)
+        END"""
+
+
+def birthday_window_sql(birth_col: str, previous: date, new: date) -> Optional[str]:
+    """
+    Prédicat SQL vrai si l'anniversaire de `birth_col` tombe dans ]previous, new], c'est-à-dire
+    si calculate_age change entre les deux dates. Comme calculate_age, on compare des
+    (mois, jour) : un 29 février est franchi le 1er mars les années non bissextiles.
+    Retourne None si l'écart atteint un an (tous les âges changent).
+    """
+    if new <= previous:
+        raise ValueError(f"La nouvelle date {new} doit être postérieure à {previous}")
+    previous_md = previous.month * 100 + previous.day
+    new_md = new.month * 100 + new.day
+    if (new.year, new_md) >= (previous.year + 1, previous_md):
+        return None
+
+    birth_md = f"(EXTRACT(MONTH FROM {birth_col})::int * 100 + EXTRACT(DAY FROM {birth_col})::int)"
+    if new.year == previous.year:
+        return f"({birth_md} > {previous_md} AND {birth_md} <= {new_md})"
+    # Fenêtre à cheval sur le 31 décembre
+    return f"({birth_md} > {previous_md} OR {birth_md} <= {new_md})"
+
+
 def validate_date(date_str: str) -> bool:
     """Valide le format de date YYYY-MM-DD"""
     try:
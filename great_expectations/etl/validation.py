@@ -0,0 +1,182 @@
+"""
+Moteur de validation des résultats : les règles (colonnes requises, valeurs nulles, bornes
+d'âge, unicité de (snapshot_date, id)) sont compilées une fois, puis évaluées soit en une
+passe vectorisée sur un DataFrame, soit en une seule requête d'agrégat quand les données
+sont déjà chargées. Seuls les quelques exemples de lignes fautives sont copiés.
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from etl.utils import logger
+
+REQUIRED_COLUMNS = ('snapshot_date', 'id', 'datenaissance', 'age')
+KEY_COLUMNS = ('snapshot_date', 'id')
+
+ERROR = 'error'
+WARNING = 'warning'
+
+
+@dataclass(frozen=True)
+class RowRule:
+    """Règle évaluée ligne à ligne : masque vectorisé côté pandas, prédicat côté SQL"""
+    name: str
+    description: str
+    severity: str
+    # Prédicat SQL vrai pour une ligne en faute
+    sql: str
+    # Masque booléen (numpy) des lignes en faute
+    check: Callable[[pd.DataFrame], np.ndarray]
+
+
+@dataclass
+class ValidationRules:
+    required_columns: Tuple[str, ...] = REQUIRED_COLUMNS
+    key_columns: Tuple[str, ...] = KEY_COLUMNS
+    min_age: int = 0
+    max_age: int = 150
+    # Un âge au-delà de max_age est suspect mais pas bloquant, un âge négatif est une erreur
+    max_age_severity: str = WARNING
+    sample_size: int = 5
+
+    def row_rules(self) -> List[RowRule]:
+        return [
+            RowRule('age_below_min', 'Âges négatifs détectés' if self.min_age == 0 else f'Âges inférieurs à {self.min_age} ans',
+                    ERROR, f"age < {self.min_age}", lambda df: _mask(df['age'] < self.min_age)),
+            RowRule('age_above_max', f'Âges supérieurs à {self.max_age} ans', self.max_age_severity,
+                    f"age > {self.max_age}", lambda df: _mask(df['age'] > self.max_age)),
+        ]
+
+
+@dataclass
+class RuleResult:
+    rule: str
+    description: str
+    severity: str
+    failed: int
+    samples: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class ValidationReport:
+    rows: int
+    missing_columns: List[str] = field(default_factory=list)
+    null_counts: Dict[str, int] = field(default_factory=dict)
+    results: List[RuleResult] = field(default_factory=list)
+
+    @property
+    def errors(self) -> List[RuleResult]:
+        return [r for r in self.results if r.failed and r.severity == ERROR]
+
+    @property
+    def warnings(self) -> List[RuleResult]:
+        return [r for r in self.results if r.failed and r.severity == WARNING]
+
+    @property
+    def success(self) -> bool:
+        return not self.missing_columns and not self.errors
+
+    def to_dict(self) -> dict:
+        return dict(asdict(self), success=self.success)
+
+    def log(self):
+        """Journalise le rapport (erreurs en ERROR, avertissements en WARNING)"""
+        if self.missing_columns:
+            logger.error(f"Colonnes manquantes: {self.missing_columns}")
+            return
+        nulls = {col: count for col, count in self.null_counts.items() if count}
+        if nulls:
+            logger.warning(f"Valeurs nulles détectées: {nulls}")
+        for result in self.errors:
+            logger.error(f"{result.description}: {result.failed} lignes (exemples: {result.samples})")
+        for result in self.warnings:
+            logger.warning(f"{result.description}: {result.failed} lignes (exemples: {result.samples})")
+
+
+def _mask(values: pd.Series) -> np.ndarray:
+    # Comparaison sur un entier nullable : NA n'est pas une faute
+    return values.to_numpy(dtype=bool, na_value=False)
+
+
+def _samples(df: pd.DataFrame, mask: np.ndarray, size: int) -> List[dict]:
+    return df.iloc[np.flatnonzero(mask)[:size]].to_dict('records')
+
+
+def validate_frame(df: pd.DataFrame, rules: Optional[ValidationRules] = None) -> ValidationReport:
+    """
+    Évalue les règles sur un DataFrame en mémoire, sans en copier les données : les masques
+    (valeurs nulles, règles ligne à ligne, doublons de clé) sont calculés une fois, puis
+    comptés ensemble en une seule réduction sur la matrice (lignes x contrôles).
+    """
+    rules = rules or ValidationRules()
+    report = ValidationReport(rows=len(df))
+    report.missing_columns = [col for col in rules.required_columns if col not in df.columns]
+    if report.missing_columns:
+        return report
+
+    row_rules = rules.row_rules()
+    nulls = df[list(rules.required_columns)].isna().to_numpy()
+    masks = np.column_stack([rule.check(df) for rule in row_rules]
+                            + [df.duplicated(list(rules.key_columns)).to_numpy()])
+    counts = np.count_nonzero(np.hstack([nulls, masks]), axis=0).tolist()
+    null_counts, rule_counts = counts[:nulls.shape[1]], counts[nulls.shape[1]:]
+
+    report.null_counts = dict(zip(rules.required_columns, null_counts))
+    checks = [(rule.name, rule.description, rule.severity) for rule in row_rules]
+    checks.append(('duplicate_keys', f"Doublons sur {rules.key_columns}", ERROR))
+    for index, ((name, description, severity), failed) in enumerate(zip(checks, rule_counts)):
+        report.results.append(RuleResult(name, description, severity, failed,
+                                         _samples(df, masks[:, index], rules.sample_size) if failed else []))
+    return report
+
+
+def validate_table(conn, table: str, rules: Optional[ValidationRules] = None,
+                   where: Optional[str] = None, params: Optional[dict] = None) -> ValidationReport:
+    """
+    Évalue les règles sur une table déjà chargée en une seule requête d'agrégat
+    (`where` restreint le périmètre, ex. un snapshot). Les exemples de lignes fautives
+    ne sont lus qu'en cas d'échec, avec LIMIT.
+    """
+    rules = rules or ValidationRules()
+    params = params or {}
+    columns = {column['name'] for column in inspect(conn).get_columns(table)}
+    report = ValidationReport(rows=0)
+    report.missing_columns = [col for col in rules.required_columns if col not in columns]
+    if report.missing_columns:
+        return report
+
+    row_rules = rules.row_rules()
+    keys = ', '.join(rules.key_columns)
+    filter_clause = f"WHERE {where}" if where else ""
+    aggregates = ["COUNT(*) AS rows"]
+    aggregates += [f"COUNT(*) - COUNT({col}) AS null_{col}" for col in rules.required_columns]
+    aggregates += [f"COUNT(*) FILTER (WHERE {rule.sql}) AS {rule.name}" for rule in row_rules]
+    aggregates.append(f"COUNT(*) - COUNT(DISTINCT ({keys})) AS duplicate_keys")
+    counts = conn.execute(text(f"SELECT {', '.join(aggregates)} FROM {table} {filter_clause}"), params).mappings().one()
+
+    report.rows = counts['rows']
+    report.null_counts = {col: counts[f"null_{col}"] for col in rules.required_columns}
+    selected = ', '.join(rules.required_columns)
+    for rule in row_rules:
+        failed = counts[rule.name]
+        samples = []
+        if failed:
+            samples = [dict(row) for row in conn.execute(text(
+                f"SELECT {selected} FROM {table} WHERE ({rule.sql}) {f'AND ({where})' if where else ''} "
+                f"LIMIT {rules.sample_size}"
+            ), params).mappings()]
+        report.results.append(RuleResult(rule.name, rule.description, rule.severity, failed, samples))
+
+    failed = counts['duplicate_keys']
+    samples = []
+    if failed:
+        samples = [dict(row) for row in conn.execute(text(
+            f"SELECT {keys}, COUNT(*) AS occurrences FROM {table} {filter_clause} "
+            f"GROUP BY {keys} HAVING COUNT(*) > 1 LIMIT {rules.sample_size}"
+        ), params).mappings()]
+    report.results.append(RuleResult('duplicate_keys', f"Doublons sur {rules.key_columns}", ERROR, failed, samples))
+    return report
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from etl.utils import DatabaseConnection, logger
+from config.settings import settings
+
+
+class WatermarkStore:
+    """
+    Marques hautes (high-water marks) de l'extraction incrémentale, une par table
+    lue et par table alimentée (`consumer`), persistées dans une petite table d'état
+    partagée entre pipelines.
+
+    La marque est la plus grande valeur de `created_at` déjà traitée. Elle n'avance
+    que dans la transaction du chargement (`save`) : si le run échoue avant le
+    commit, le run suivant reprend le même delta.
+    """
+    def __init__(self, consumer: Optional[str] = None, table: str = "etl_watermarks"):
+        self.consumer = consumer or settings.etl.target_results_for_ge
+        self.table = table
+
+    def ensure_table(self):
+        with DatabaseConnection() as conn:
+            conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                consumer TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                high_water TIMESTAMP NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (consumer, table_name)
+            )
+            """))
+            conn.commit()
+
+    def get(self, table_name: str) -> Optional[datetime]:
+        """Marque haute de `table_name`, None si la table n'a jamais été traitée"""
+        with DatabaseConnection() as conn:
+            return conn.execute(
+                text(f"SELECT high_water FROM {self.table} WHERE consumer = :consumer AND table_name = :table_name"),
+                {'consumer': self.consumer, 'table_name': table_name}
+            ).scalar()
+
+    def save(self, conn, marks: Dict[str, Optional[datetime]]):
+        """Enregistre les nouvelles marques dans la transaction de l'appelant (sans commit)"""
+        for table_name, high_water in marks.items():
+            if high_water is None:
+                continue
+            conn.execute(text(f"""
+            INSERT INTO {self.table} (consumer, table_name, high_water, updated_at)
+            VALUES (:consumer, :table_name, :high_water, CURRENT_TIMESTAMP)
+            ON CONFLICT (consumer, table_name) DO UPDATE
+            SET high_water = GREATEST({self.table}.high_water, EXCLUDED.high_water),
+                updated_at = EXCLUDED.updated_at
+            """), {'consumer': self.consumer, 'table_name': table_name, 'high_water': high_water})
+            logger.debug(f"Marque haute de {table_name}: {high_water}")
+
+    def reset(self, table_name: Optional[str] = None):
+        """Oublie la marque d'une table (ou de toutes) : le prochain run repart de zéro"""
+        with DatabaseConnection() as conn:
+            conn.execute(text(f"""
+            DELETE FROM {self.table}
+            WHERE consumer = :consumer AND (CAST(:table_name AS TEXT) IS NULL OR table_name = :table_name)
+            """), {'consumer': self.consumer, 'table_name': table_name})
+            conn.commit()
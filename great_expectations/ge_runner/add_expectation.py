@@ -1,17 +1,26 @@
 import great_expectations as gx
 import os
 import sys
+from datetime import date
 
 # Ajouter le répertoire parent au path pour les imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import settings
 
-def add_new_expectation():
+def add_new_expectation(snapshot_date: str = None):
     """
     Ajoute une nouvelle expectation à la suite existante 'target_results_suite'.
+    Le Validator ne lit qu'un snapshot : `snapshot_date`, ou le dernier chargé.
     """
     try:
+        # La date vient de la ligne de commande : seule une date ISO (YYYY-MM-DD) atteint le SQL
+        if snapshot_date is not None:
+            try:
+                snapshot_date = date.fromisoformat(snapshot_date).isoformat()
+            except (TypeError, ValueError):
+                raise ValueError(f"Date de snapshot invalide: {snapshot_date!r} (attendu: YYYY-MM-DD)") from None
+
         # Obtenir le chemin absolu du répertoire great_expectations
         context_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "great_expectations"))
         project_config_path = os.path.join(context_root_dir, "great_expectations.yml")
@@ -22,15 +31,18 @@ def add_new_expectation():
 
         # 2. Obtenir un Validator pour la table target_table
         # Nous utilisons un BatchRequest pour spécifier la table et la requête
+        # Le dernier snapshot est résolu par un MAX sur la colonne de tête de la clé primaire
+        # (lecture d'index), puis seul ce snapshot est lu
+        snapshot_filter = f"'{snapshot_date}'" if snapshot_date else f"(SELECT MAX(snapshot_date) FROM {settings.etl.target_table})"
         batch_request = {
             "datasource_name": "postgres_datasource",
             "data_connector_name": "default_runtime_data_connector",
             "data_asset_name": settings.etl.target_table,
             "runtime_parameters": {
-                "query": f"SELECT * FROM {settings.etl.target_table} WHERE snapshot_date = (SELECT MAX(snapshot_date) FROM {settings.etl.target_table})"
+                "query": f"SELECT * FROM {settings.etl.target_table} WHERE snapshot_date = {snapshot_filter}"
             },
             "batch_identifiers": {
-                "default_identifier_name": f"{settings.etl.target_table}_latest"
+                "default_identifier_name": f"{settings.etl.target_table}_{snapshot_date.replace('-', '') if snapshot_date else 'latest'}"
             }
         }
         
@@ -67,4 +79,4 @@ def add_new_expectation():
         sys.exit(1)
 
 if __name__ == "__main__":
-    add_new_expectation()
+    add_new_expectation(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,335 @@
+"""
+Évaluation groupée d'une suite d'expectations : toutes les métriques dont la suite a
+besoin (nombre de lignes, valeurs nulles, bornes, doublons composés...) sont calculées
+en une seule requête d'agrégat par table, ou en une passe sur un DataFrame en mémoire,
+puis les expectations sont évaluées à partir de ces métriques.
+
+Les résultats reprennent la forme de ceux de Great Expectations (success, statistics,
+results[].result.unexpected_count...), pour les types d'expectations de la suite
+target_results_suite. Un type d'expectation non pris en charge lève ValueError à la
+compilation ; dateutil_parseable sur une colonne SQL non typée date lève TypeError.
+
+Sur une table, les contrôles statistiques (valeurs nulles, bornes, dates) peuvent être
+évalués sur un échantillon déterministe (`Sampling`) avec un intervalle de confiance ;
+le nombre de lignes et l'unicité restent exacts.
+"""
+
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from dateutil import parser as date_parser
+from sqlalchemy import inspect, text
+from sqlalchemy.types import Date, DateTime
+
+# Types SQL de la suite -> test sur le dtype pandas équivalent
+PANDAS_TYPE_CHECKS = {
+    'INTEGER': pd.api.types.is_integer_dtype,
+    'BIGINT': pd.api.types.is_integer_dtype,
+    'SMALLINT': pd.api.types.is_integer_dtype,
+    'DATE': pd.api.types.is_datetime64_any_dtype,
+    'TIMESTAMP': pd.api.types.is_datetime64_any_dtype,
+    'TEXT': pd.api.types.is_object_dtype,
+}
+
+# Métriques calculées sur l'échantillon ; les autres (nombre de lignes, unicité) restent exactes
+SAMPLED_METRICS = ('null_count', 'out_of_range')
+
+
+@dataclass(frozen=True)
+class Sampling:
+    """Échantillon déterministe d'une table : même graine, mêmes lignes"""
+    percent: float
+    # "hash" : prédicat sur un hachage de la clé (répartition uniforme, toute la portée est lue)
+    # "tablesample" : TABLESAMPLE SYSTEM, blocs entiers (lecture réduite, lignes groupées par bloc)
+    method: str = 'hash'
+    seed: int = 42
+    confidence: float = 0.95
+    key: str = 'id'
+
+    def source(self, table: str) -> str:
+        if self.method == 'tablesample':
+            return f"{table} TABLESAMPLE SYSTEM ({float(self.percent)}) REPEATABLE ({int(self.seed)})"
+        return table
+
+    def where(self, where: Optional[str]) -> Optional[str]:
+        if self.method == 'tablesample':
+            return where
+        if self.method != 'hash':
+            raise ValueError(f"Méthode d'échantillonnage inconnue: {self.method}")
+        # hashtext renvoie un int4 signé : décalé dans [0, 2^32) puis réduit à 10 000 seaux
+        predicate = (f"mod(hashtext({self.key}::text || '/{int(self.seed)}')::bigint + 2147483648, 10000) "
+                     f"< {round(self.percent * 100)}")
+        return f"({where}) AND {predicate}" if where else predicate
+
+    def to_dict(self) -> dict:
+        return {'method': self.method, 'percent': self.percent, 'seed': self.seed, 'confidence': self.confidence}
+
+
+def _expectations_of(suite) -> List[Tuple[str, dict]]:
+    """(type, kwargs) des expectations d'une ExpectationSuite ou de son JSON"""
+    if isinstance(suite, dict):
+        return [(e['expectation_type'], dict(e['kwargs'])) for e in suite['expectations']]
+    return [(e.expectation_type, dict(e.kwargs)) for e in suite.expectations]
+
+
+class BatchedSuiteValidator:
+    """Compile une suite en une liste de métriques, calculées ensemble, puis évalue la suite"""
+
+    def __init__(self, suite):
+        self.expectations = _expectations_of(suite)
+        self.metrics = self._required_metrics()
+
+    def _required_metrics(self) -> List[tuple]:
+        metrics = [('row_count',)]
+        for expectation_type, kwargs in self.expectations:
+            column = kwargs.get('column')
+            if expectation_type == 'expect_table_row_count_to_be_between':
+                continue
+            if expectation_type == 'expect_column_values_to_not_be_null':
+                metrics.append(('null_count', column))
+            elif expectation_type == 'expect_column_values_to_be_between':
+                metrics += [('null_count', column), ('out_of_range', column, kwargs.get('min_value'), kwargs.get('max_value'))]
+            elif expectation_type == 'expect_column_values_to_be_of_type':
+                metrics.append(('column_type', column))
+            elif expectation_type == 'expect_compound_columns_to_be_unique':
+                metrics += [('all_missing', tuple(kwargs['column_list'])), ('duplicated', tuple(kwargs['column_list']))]
+            elif expectation_type == 'expect_column_values_to_be_dateutil_parseable':
+                metrics += [('null_count', column), ('column_type', column), ('unparseable', column)]
+            else:
+                raise ValueError(f"Expectation non prise en charge en mode groupé: {expectation_type}")
+        # Ordre conservé, doublons supprimés (une métrique partagée n'est calculée qu'une fois)
+        return list(dict.fromkeys(metrics))
+
+    # ------------------------------------------------------------------
+    # Calcul des métriques
+    # ------------------------------------------------------------------
+    def compute_table(self, conn, table: str, where: Optional[str] = None,
+                      params: Optional[dict] = None, sampling: Optional[Sampling] = None) -> Dict[tuple, object]:
+        """
+        Une requête d'agrégat (un seul parcours de la table) ; types lus dans le catalogue.
+        Avec `sampling`, les métriques statistiques sont calculées par une seconde requête
+        sur l'échantillon, les métriques exactes restant calculées sur toute la portée.
+        """
+        types = {c['name']: c['type'] for c in inspect(conn).get_columns(table)}
+        values = {}
+        exact, sampled = [], []
+        for metric in self.metrics:
+            kind = metric[0]
+            if kind == 'column_type':
+                values[metric] = types[metric[1]]
+            elif kind == 'unparseable':
+                if not isinstance(types[metric[1]], (Date, DateTime)):
+                    raise TypeError(f"dateutil_parseable en SQL nécessite une colonne typée date: "
+                                    f"{metric[1]} est de type {types[metric[1]]}")
+                # Colonne DATE / TIMESTAMP : toute valeur non nulle est une date valide
+                values[metric] = 0
+            elif sampling is not None and kind in SAMPLED_METRICS:
+                sampled.append(metric)
+            else:
+                exact.append(metric)
+
+        values.update(self._aggregate(conn, table, exact, where, params))
+        if sampling is not None:
+            sampled.append(('sample_row_count',))
+            values.update(self._aggregate(conn, sampling.source(table), sampled, sampling.where(where), params))
+        return values
+
+    @staticmethod
+    def _aggregate(conn, source: str, metrics: List[tuple], where: Optional[str],
+                   params: Optional[dict]) -> Dict[tuple, object]:
+        aggregates = []
+        # Une seule fenêtre par liste de colonnes composées (taille du groupe de chaque ligne)
+        windows = {}
+        for metric in metrics:
+            kind = metric[0]
+            alias = f"m{len(aggregates)}"
+            if kind in ('row_count', 'sample_row_count'):
+                aggregates.append((metric, f"COUNT(*) AS {alias}"))
+            elif kind == 'null_count':
+                aggregates.append((metric, f"COUNT(*) - COUNT({metric[1]}) AS {alias}"))
+            elif kind == 'out_of_range':
+                _, column, low, high = metric
+                bounds = []
+                if low is not None:
+                    bounds.append(f"{column} < {low}")
+                if high is not None:
+                    bounds.append(f"{column} > {high}")
+                aggregates.append((metric, f"COUNT(*) FILTER (WHERE {' OR '.join(bounds) or 'FALSE'}) AS {alias}"))
+            elif kind == 'all_missing':
+                condition = ' AND '.join(f"{column} IS NULL" for column in metric[1])
+                aggregates.append((metric, f"COUNT(*) FILTER (WHERE {condition}) AS {alias}"))
+            elif kind == 'duplicated':
+                window = windows.setdefault(metric[1], f"w{len(windows)}")
+                not_all_missing = ' OR '.join(f"{column} IS NOT NULL" for column in metric[1])
+                aggregates.append((metric, f"COUNT(*) FILTER (WHERE {window} > 1 AND ({not_all_missing})) AS {alias}"))
+
+        window_columns = ''.join(f", COUNT(*) OVER (PARTITION BY {', '.join(columns)}) AS {name}"
+                                 for columns, name in windows.items())
+        filter_clause = f"WHERE {where}" if where else ""
+        source = f"(SELECT *{window_columns} FROM {source} {filter_clause}) AS batch" if windows else f"{source} {filter_clause}"
+        row = conn.execute(text(f"SELECT {', '.join(sql for _, sql in aggregates)} FROM {source}"), params or {}).one()
+        return {metric: value for (metric, _), value in zip(aggregates, row)}
+
+    def compute_frame(self, df: pd.DataFrame) -> Dict[tuple, object]:
+        """Une passe sur le DataFrame (masques vectorisés, aucune copie des données)"""
+        values = {}
+        for metric in self.metrics:
+            kind = metric[0]
+            if kind == 'row_count':
+                values[metric] = len(df)
+            elif kind == 'null_count':
+                values[metric] = int(df[metric[1]].isna().sum())
+            elif kind == 'out_of_range':
+                _, column, low, high = metric
+                series = df[column]
+                mask = np.zeros(len(df), dtype=bool)
+                if low is not None:
+                    mask |= (series < low).to_numpy(dtype=bool, na_value=False)
+                if high is not None:
+                    mask |= (series > high).to_numpy(dtype=bool, na_value=False)
+                values[metric] = int(mask.sum())
+            elif kind == 'column_type':
+                values[metric] = df[metric[1]].dtype
+            elif kind == 'all_missing':
+                values[metric] = int(df[list(metric[1])].isna().all(axis=1).sum())
+            elif kind == 'duplicated':
+                columns = list(metric[1])
+                mask = df.duplicated(columns, keep=False).to_numpy() & df[columns].notna().any(axis=1).to_numpy()
+                values[metric] = int(mask.sum())
+            elif kind == 'unparseable':
+                values[metric] = _count_unparseable(df[metric[1]])
+        return values
+
+    # ------------------------------------------------------------------
+    # Évaluation
+    # ------------------------------------------------------------------
+    def evaluate(self, metrics: Dict[tuple, object], sampling: Optional[Sampling] = None) -> dict:
+        """
+        Évalue chaque expectation à partir des métriques, résultat au format Great Expectations.
+        Les expectations évaluées sur l'échantillon portent un bloc `sampling` (taille de
+        l'échantillon et intervalle de confiance du pourcentage de valeurs inattendues).
+        """
+        results = []
+        for expectation_type, kwargs in self.expectations:
+            success, result = self._evaluate_one(expectation_type, kwargs, metrics)
+            sampled = 'unexpected_count' in result and expectation_type != 'expect_compound_columns_to_be_unique'
+            if sampling is not None and sampled:
+                result['sampling'] = _sampling_summary(result['unexpected_count'], metrics, sampling)
+            results.append({
+                'expectation_config': {'expectation_type': expectation_type, 'kwargs': kwargs},
+                'success': success,
+                'result': result,
+            })
+        successful = sum(r['success'] for r in results)
+        evaluation = {
+            'success': successful == len(results),
+            'statistics': {
+                'evaluated_expectations': len(results),
+                'successful_expectations': successful,
+                'unsuccessful_expectations': len(results) - successful,
+                'success_percent': 100.0 * successful / len(results) if results else None,
+            },
+            'results': results,
+        }
+        if sampling is not None:
+            evaluation['sampling'] = dict(sampling.to_dict(), sample_row_count=metrics.get(('sample_row_count',)),
+                                          row_count=metrics[('row_count',)])
+        return evaluation
+
+    def _evaluate_one(self, expectation_type: str, kwargs: dict, metrics: Dict[tuple, object]):
+        rows = metrics[('row_count',)]
+        column = kwargs.get('column')
+        mostly = kwargs.get('mostly', 1)
+
+        if expectation_type == 'expect_table_row_count_to_be_between':
+            low, high = kwargs.get('min_value'), kwargs.get('max_value')
+            success = (low is None or rows >= low) and (high is None or rows <= high)
+            return success, {'observed_value': rows}
+
+        if expectation_type == 'expect_column_values_to_be_of_type':
+            observed = metrics[('column_type', column)]
+            expected = kwargs['type_'].upper()
+            if isinstance(observed, (np.dtype, pd.api.extensions.ExtensionDtype)):
+                check = PANDAS_TYPE_CHECKS.get(expected)
+                return bool(check and check(observed)), {'observed_value': str(observed)}
+            observed_name = type(observed).__name__.upper()
+            return observed_name == expected, {'observed_value': observed_name}
+
+        if expectation_type == 'expect_compound_columns_to_be_unique':
+            columns = tuple(kwargs['column_list'])
+            nonmissing = rows - metrics[('all_missing', columns)]
+            return _map_result(rows, nonmissing, metrics[('duplicated', columns)], mostly)
+
+        # Contrôles ligne à ligne sur l'échantillon s'il y en a un
+        rows = metrics.get(('sample_row_count',), rows)
+        if expectation_type == 'expect_column_values_to_not_be_null':
+            unexpected = metrics[('null_count', column)]
+            return _map_result(rows, rows, unexpected, mostly, with_missing=False)
+
+        missing = metrics[('null_count', column)]
+        if expectation_type == 'expect_column_values_to_be_between':
+            unexpected = metrics[('out_of_range', column, kwargs.get('min_value'), kwargs.get('max_value'))]
+        else:  # expect_column_values_to_be_dateutil_parseable
+            unexpected = metrics[('unparseable', column)]
+        return _map_result(rows, rows - missing, unexpected, mostly)
+
+
+def _map_result(rows: int, nonmissing: int, unexpected: int, mostly: float, with_missing: bool = True):
+    """Succès et statistiques d'une expectation ligne à ligne (mêmes champs que Great Expectations)"""
+    success = nonmissing == 0 or (nonmissing - unexpected) / nonmissing >= mostly
+    result = {
+        'element_count': rows,
+        'unexpected_count': unexpected,
+        'unexpected_percent': 100.0 * unexpected / nonmissing if nonmissing else None,
+    }
+    if with_missing:
+        missing = rows - nonmissing
+        result.update({
+            'missing_count': missing,
+            'missing_percent': 100.0 * missing / rows if rows else None,
+            'unexpected_percent_total': 100.0 * unexpected / rows if rows else None,
+            'unexpected_percent_nonmissing': 100.0 * unexpected / nonmissing if nonmissing else None,
+        })
+    return success, result
+
+
+def _sampling_summary(unexpected: int, metrics: Dict[tuple, object], sampling: Sampling) -> dict:
+    """Taille de l'échantillon et intervalle de Wilson du pourcentage de valeurs inattendues"""
+    size = metrics[('sample_row_count',)]
+    population = metrics[('row_count',)]
+    low, high = wilson_interval(unexpected, size, sampling.confidence)
+    return {
+        'sample_size': size,
+        'population': population,
+        'estimated_unexpected_count': round(unexpected * population / size) if size else None,
+        'unexpected_percent_interval': [100.0 * low, 100.0 * high],
+        'confidence': sampling.confidence,
+    }
+
+
+def wilson_interval(failed: int, size: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Intervalle de Wilson d'une proportion (reste informatif pour 0 faute sur l'échantillon)"""
+    if not size:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    p = failed / size
+    denominator = 1 + z * z / size
+    center = (p + z * z / (2 * size)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / size + z * z / (4 * size * size)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def _count_unparseable(series: pd.Series) -> int:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 0
+    unparseable = 0
+    # Chaque valeur distincte n'est analysée qu'une fois
+    for value, count in series.dropna().value_counts().items():
+        try:
+            date_parser.parse(str(value))
+        except (ValueError, OverflowError):
+            unparseable += count
+    return unparseable
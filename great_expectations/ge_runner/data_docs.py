@@ -0,0 +1,158 @@
+"""
+Data docs incrémentales et rétention du validations store.
+
+`build_data_docs()` re-rend tous les résultats du store à chaque appel, et le store
+grossit d'un fichier JSON par run. Ici :
+- seuls les résultats plus récents que la dernière construction (et les suites modifiées)
+  sont rendus ; l'état est gardé dans le répertoire du site, le supprimer force une
+  reconstruction complète ;
+- les résultats au-delà de la fenêtre de rétention (jours et nombre de runs) sont résumés
+  dans un index compact par jour, puis retirés du store. L'index du site retire leurs pages.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from great_expectations.data_context.types.resource_identifiers import ExpectationSuiteIdentifier
+
+from etl.utils import logger
+
+STATE_FILE = '.incremental_build.json'
+SUMMARY_DIR = 'validation_summaries'
+
+
+class DataDocsMaintainer:
+    def __init__(self, context, suite_name: str = "target_results_suite", site_name: str = "local_site",
+                 retention_days: Optional[int] = None, retention_runs: Optional[int] = None):
+        self.context = context
+        self.suite_name = suite_name
+        self.site_name = site_name
+        # 0 / None : pas de limite sur cet axe
+        self.retention_days = retention_days
+        self.retention_runs = retention_runs
+
+    @property
+    def site_directory(self) -> str:
+        site = self.context.get_config().data_docs_sites[self.site_name]
+        return os.path.join(self.context.root_directory, site['store_backend']['base_directory'])
+
+    @property
+    def summary_path(self) -> str:
+        return os.path.join(self.context.root_directory, SUMMARY_DIR, f"{self.suite_name}.json")
+
+    def _validation_keys(self) -> list:
+        keys = [key for key in self.context.validations_store.list_keys()
+                if key.expectation_suite_identifier.expectation_suite_name == self.suite_name]
+        return sorted(keys, key=lambda key: key.run_id.run_time, reverse=True)
+
+    # ------------------------------------------------------------------
+    # Rétention
+    # ------------------------------------------------------------------
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Résume dans l'index par jour puis retire du store les résultats plus vieux que
+        retention_days ou au-delà des retention_runs plus récents. Retourne leur nombre.
+        """
+        keys = self._validation_keys()
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=self.retention_days) if self.retention_days else None
+        expired = [key for rank, key in enumerate(keys)
+                   if (self.retention_runs and rank >= self.retention_runs)
+                   or (cutoff is not None and _aware(key.run_id.run_time) < cutoff)]
+        if not expired:
+            return 0
+
+        summary = self._read_json(self.summary_path, {'suite': self.suite_name, 'days': {}})
+        for key in expired:
+            result = self.context.validations_store.get(key)
+            _fold(summary['days'], key, result)
+        # Index écrit avant la suppression : un arrêt entre les deux ne perd aucun résultat
+        self._write_json(self.summary_path, summary)
+        for key in expired:
+            self.context.validations_store.store_backend.remove_key(key.to_tuple())
+
+        logger.info(f"🗜️ {len(expired)} résultat(s) de validation résumé(s) dans {self.summary_path}")
+        return len(expired)
+
+    # ------------------------------------------------------------------
+    # Data docs
+    # ------------------------------------------------------------------
+    def build(self, full: bool = False, rebuild_index: bool = False) -> int:
+        """
+        Rend les résultats plus récents que la dernière construction et les suites
+        modifiées, puis l'index. `full=True` reconstruit tout le site. Retourne le nombre
+        de pages rendues (0 : site inchangé, sauf rebuild_index).
+        """
+        state_path = os.path.join(self.site_directory, STATE_FILE)
+        state = {} if full else self._read_json(state_path, {})
+        keys = self._validation_keys()
+        suite_key = ExpectationSuiteIdentifier(self.suite_name)
+        suite_digest = _digest(self.context.expectations_store.get(suite_key))
+
+        if not state:
+            self.context.build_data_docs(site_names=[self.site_name])
+            rendered = len(keys) + 1
+        else:
+            last_run_time = datetime.fromisoformat(state['last_run_time']) if state.get('last_run_time') else None
+            resources: List = [key for key in keys
+                               if last_run_time is None or _aware(key.run_id.run_time) > last_run_time]
+            if state.get('suite_digest') != suite_digest:
+                resources.append(suite_key)
+            if resources:
+                self.context.build_data_docs(site_names=[self.site_name], resource_identifiers=resources)
+            elif rebuild_index:
+                # Pages des résultats retirés par la rétention : l'index les supprime du site
+                self.context.build_data_docs(site_names=[self.site_name], resource_identifiers=[suite_key])
+            rendered = len(resources)
+
+        self._write_json(state_path, {
+            'last_run_time': _aware(keys[0].run_id.run_time).isoformat() if keys else state.get('last_run_time'),
+            'suite_digest': suite_digest,
+        })
+        return rendered
+
+    @staticmethod
+    def _read_json(path: str, default: dict) -> dict:
+        if not os.path.exists(path):
+            return default
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_json(path: str, content: dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(content, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def _aware(run_time: datetime) -> datetime:
+    return run_time if run_time.tzinfo else run_time.replace(tzinfo=timezone.utc)
+
+
+def _digest(suite) -> str:
+    content = suite.to_json_dict() if hasattr(suite, 'to_json_dict') else suite
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _fold(days: dict, key, result):
+    """Ajoute un résultat au résumé de son jour (runs, succès, expectations en échec)"""
+    run_time = _aware(key.run_id.run_time)
+    day = days.setdefault(run_time.date().isoformat(), {
+        'runs': 0, 'successful_runs': 0, 'evaluated_expectations': 0, 'successful_expectations': 0,
+        'failures': {}, 'first_run': run_time.isoformat(), 'last_run': run_time.isoformat(),
+    })
+    statistics = result.statistics
+    day['runs'] += 1
+    day['successful_runs'] += int(bool(result.success))
+    day['evaluated_expectations'] += statistics['evaluated_expectations']
+    day['successful_expectations'] += statistics['successful_expectations']
+    for item in result.results:
+        if not item.success:
+            expectation_type = item.expectation_config.expectation_type
+            day['failures'][expectation_type] = day['failures'].get(expectation_type, 0) + 1
+    day['first_run'] = min(day['first_run'], run_time.isoformat())
+    day['last_run'] = max(day['last_run'], run_time.isoformat())
@@ -1,32 +1,117 @@
 import great_expectations as gx
 from great_expectations.checkpoint import Checkpoint
 from great_expectations.core.batch import RuntimeBatchRequest
+from great_expectations.core import ExpectationConfiguration, ExpectationSuite
+import copy
 import logging
+import time
 from datetime import datetime
+from typing import Optional
 import sys
 import os
 
+import pandas as pd
+from sqlalchemy import text
+
 # Ajouter le répertoire parent au path pour les imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import settings
+from etl.metrics import track
+from etl.utils import DatabaseConnection, get_engine
+from ge_runner.batched_validation import BatchedSuiteValidator, Sampling
+from ge_runner.data_docs import DataDocsMaintainer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Types SQL de la suite -> types acceptés pour la même colonne dans un DataFrame (moteur pandas)
+FRAME_TYPE_LISTS = {
+    'INTEGER': ['int8', 'int16', 'int32', 'int64', 'int'],
+    'BIGINT': ['int64', 'int'],
+    'DATE': ['datetime64[ns]', 'datetime64', 'Timestamp'],
+}
+# Suffixe de la suite réduite évaluée sur un DataFrame : ses résultats sont stockés et affichés à part
+IN_MEMORY_SUFFIX = ".in_memory"
+
+
+def frame_suite(suite: ExpectationSuite, df: pd.DataFrame) -> ExpectationSuite:
+    """
+    Copie de la suite adaptée au moteur pandas : les types SQL (INTEGER...) deviennent les
+    dtypes équivalents, et une colonne déjà typée datetime64 est parseable par construction
+    (dateutil ne s'applique qu'aux chaînes). C'est une suite réduite : elle porte le nom
+    `<suite>.in_memory` et la liste des expectations remplacées dans ses meta, pour que ses
+    résultats ne passent pas pour ceux de la suite stockée (qui n'est pas modifiée).
+    """
+    adapted = copy.deepcopy(suite)
+    adapted.expectation_suite_name = f"{suite.expectation_suite_name}{IN_MEMORY_SUFFIX}"
+    replaced = []
+    expectations = []
+    for config in adapted.expectations:
+        kwargs = dict(config.kwargs)
+        column = kwargs.get('column')
+        original = config
+        if config.expectation_type == 'expect_column_values_to_be_of_type' and kwargs['type_'].upper() in FRAME_TYPE_LISTS:
+            config = ExpectationConfiguration('expect_column_values_to_be_in_type_list',
+                                              {'column': column, 'type_list': FRAME_TYPE_LISTS[kwargs['type_'].upper()]},
+                                              meta=config.meta)
+        elif (config.expectation_type == 'expect_column_values_to_be_dateutil_parseable'
+              and column in df.columns and pd.api.types.is_datetime64_any_dtype(df[column])):
+            config = ExpectationConfiguration('expect_column_values_to_be_in_type_list',
+                                              {'column': column, 'type_list': FRAME_TYPE_LISTS['DATE']}, meta=config.meta)
+        if config is not original:
+            replaced.append(f"{original.expectation_type}({column})")
+        expectations.append(config)
+    adapted.expectations = expectations
+    adapted.meta['in_memory'] = {'base_suite': suite.expectation_suite_name, 'replaced_expectations': replaced}
+    return adapted
+
+
 class GreatExpectationsRunner:
     def __init__(self):
-        context_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "great_expectations"))
-        # Utiliser context_root_dir pour l'initialisation du contexte
-        self.context = gx.get_context(context_root_dir=context_root_dir)
+        self.context_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "great_expectations"))
+        self._context = None
+        # Suites lues et compilées une fois : {nom: (mtime du JSON, suite, validateur groupé)}
+        self._suites = {}
+
+    @property
+    def context(self):
+        """DataContext chargé au premier usage seulement"""
+        if self._context is None:
+            # Utiliser context_root_dir pour l'initialisation du contexte
+            self._context = gx.get_context(context_root_dir=self.context_root_dir)
+            # Le datasource réutilise le pool partagé de l'ETL plutôt que son propre engine
+            datasource = self._context.datasources.get("postgres_datasource")
+            if datasource is not None:
+                datasource.execution_engine.engine = get_engine()
+        return self._context
+
+    def _suite_entry(self, suite_name: str):
+        """Suite et sa version compilée, relues seulement si le JSON a changé sur disque"""
+        path = os.path.join(self.context_root_dir, "expectations", *suite_name.split(".")) + ".json"
+        mtime = os.stat(path).st_mtime_ns
+        entry = self._suites.get(suite_name)
+        if entry is None or entry[0] != mtime:
+            if entry is not None:
+                logger.info(f"🔄 Suite {suite_name} modifiée sur disque, rechargée")
+            suite = self.context.get_expectation_suite(suite_name)
+            entry = self._suites[suite_name] = (mtime, suite, BatchedSuiteValidator(suite))
+        return entry
+
+    def get_suite(self, suite_name: str = "target_results_suite") -> ExpectationSuite:
+        return self._suite_entry(suite_name)[1]
+
+    def compiled_suite(self, suite_name: str = "target_results_suite") -> BatchedSuiteValidator:
+        return self._suite_entry(suite_name)[2]
         
     def run_checkpoint(self, checkpoint_name: str = "target_results_checkpoint"):
         """Exécute un checkpoint Great Expectations défini dans un fichier YAML."""
         try:
             logger.info(f"Démarrage de la validation avec le checkpoint YAML: {checkpoint_name}")
             
-            checkpoint = self.context.get_checkpoint(checkpoint_name)
-            result = checkpoint.run()
+            with track('ge_checkpoint'):
+                checkpoint = self.context.get_checkpoint(checkpoint_name)
+                result = checkpoint.run()
             
             # Accès direct aux attributs de l'objet result
             if result.success:
@@ -42,25 +127,45 @@ class GreatExpectationsRunner:
             logger.error(f"Erreur lors de l'exécution du checkpoint YAML: {e}")
             return False
 
-    def run_programmatic_checkpoint(self, snapshot_date: str):
+    def run_programmatic_checkpoint(self, snapshot_date: str, batch_data: Optional[pd.DataFrame] = None,
+                                    batch_name: Optional[str] = None, update_docs: bool = True):
         """
         Crée et exécute un checkpoint Great Expectations programmatiquement.
+
+        Avec `batch_data`, le DataFrame déjà en mémoire (par ex. celui qui vient d'être
+        chargé, ou un lot) est validé directement, sans relire PostgreSQL, par la suite
+        réduite de frame_suite (résultats stockés sous `target_results_suite.in_memory`).
         """
         try:
             logger.info(f"Démarrage de la validation avec un checkpoint programmé pour la date: {snapshot_date}")
+            batch_name = batch_name or f"{settings.etl.target_results_for_ge}_{snapshot_date.replace('-', '')}"
 
-            # 1. Définir le BatchRequest programmatiquement
-            batch_request = RuntimeBatchRequest(
-                datasource_name="postgres_datasource",
-                data_connector_name="default_runtime_data_connector",
-                data_asset_name=settings.etl.target_results_for_ge,
-                runtime_parameters={
-                    "query": f"SELECT * FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = '{snapshot_date}'"
-                },
-                batch_identifiers={
-                    "default_identifier_name": f"{settings.etl.target_results_for_ge}_{snapshot_date.replace('-', '')}"
-                }
-            )
+            # 1. Définir le BatchRequest (ou le validator en mémoire) programmatiquement
+            batch_request = validator = None
+            if batch_data is None:
+                batch_request = RuntimeBatchRequest(
+                    datasource_name="postgres_datasource",
+                    data_connector_name="default_runtime_data_connector",
+                    data_asset_name=settings.etl.target_results_for_ge,
+                    runtime_parameters={
+                        "query": f"SELECT * FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = '{snapshot_date}'"
+                    },
+                    batch_identifiers={"default_identifier_name": batch_name}
+                )
+            else:
+                suite = frame_suite(self.get_suite("target_results_suite"), batch_data)
+                logger.warning(f"⚠️ Validation en mémoire avec la suite réduite {suite.expectation_suite_name}, "
+                               f"expectations remplacées: {', '.join(suite.meta['in_memory']['replaced_expectations'])}")
+                validator = self.context.get_validator(
+                    batch_request=RuntimeBatchRequest(
+                        datasource_name="pandas_runtime_datasource",
+                        data_connector_name="default_runtime_data_connector",
+                        data_asset_name=settings.etl.target_results_for_ge,
+                        runtime_parameters={"batch_data": batch_data},
+                        batch_identifiers={"default_identifier_name": batch_name}
+                    ),
+                    expectation_suite=suite
+                )
 
             # 2. Définir la liste des actions programmatiquement
             action_list = [
@@ -72,24 +177,29 @@ class GreatExpectationsRunner:
                     "name": "store_evaluation_params",
                     "action": {"class_name": "StoreEvaluationParametersAction"},
                 },
-                {
+            ]
+            if update_docs:
+                action_list.append({
                     "name": "update_data_docs",
                     "action": {"class_name": "UpdateDataDocsAction", "site_names": ["local_site"]},
-                },
-            ]
+                })
 
             # 3. Créer le Checkpoint programmatiquement
             programmatic_checkpoint = Checkpoint(
                 name=f"programmatic_target_validation_{snapshot_date.replace('-', '')}",
                 data_context=self.context,
                 batch_request=batch_request,
-                expectation_suite_name="target_results_suite", # Utilise la suite d'expectations existante
+                # Suite stockée, ou sa version réduite pour un DataFrame (résultats séparés)
+                expectation_suite_name="target_results_suite" if validator is None else suite.expectation_suite_name,
                 action_list=action_list,
                 run_name_template=f"%Y%m%d-%H%M%S-programmatic-validation-{snapshot_date.replace('-', '')}"
             )
 
             # 4. Exécuter le checkpoint programmatiquement
-            result = programmatic_checkpoint.run()
+            with track('ge_checkpoint' if validator is None else 'ge_checkpoint_in_memory') as stage:
+                result = programmatic_checkpoint.run(validator=validator)
+                if batch_data is not None:
+                    stage.rows = len(batch_data)
 
             if result.success:
                 logger.info("✅ Toutes les validations du checkpoint programmé ont réussi!")
@@ -103,7 +213,7 @@ class GreatExpectationsRunner:
         except Exception as e:
             logger.error(f"Erreur lors de l'exécution du checkpoint programmé: {e}")
             return False
-    
+
     def _log_validation_details(self, result):
         """Log les détails des validations à partir d'un objet CheckpointResult."""
         # Itérer sur les objets ValidationResult (ou leurs représentations dict)
@@ -134,19 +244,84 @@ class GreatExpectationsRunner:
                         if unexpected_values:
                             logger.error(f"    ⚠️ Valeurs inattendues (extrait): {unexpected_values[:5]}")
     
-    def create_data_docs(self):
-        """Génère la documentation des données."""
+    def create_data_docs(self, full: bool = False):
+        """
+        Génère la documentation des données de façon incrémentale : applique la rétention
+        du validations store, puis ne rend que les nouveaux résultats (`full=True` : tout le site).
+        """
         try:
-            self.context.build_data_docs()
-            logger.info("📊 Documentation des données générée avec succès")
+            maintainer = DataDocsMaintainer(self.context, retention_days=settings.validation.retention_days,
+                                            retention_runs=settings.validation.retention_runs)
+            # Les résultats de la suite réduite (validation en mémoire) suivent la même rétention
+            in_memory = DataDocsMaintainer(self.context, suite_name=f"target_results_suite{IN_MEMORY_SUFFIX}",
+                                           retention_days=settings.validation.retention_days,
+                                           retention_runs=settings.validation.retention_runs)
+            with track('data_docs') as stage:
+                compacted = maintainer.compact() + in_memory.compact()
+                stage.rows = maintainer.build(full=full, rebuild_index=compacted > 0)
+            logger.info(f"📊 Documentation des données générée avec succès ({stage.rows} page(s) rendue(s))")
             return True
         except Exception as e:
             logger.error(f"Erreur lors de la génération de la documentation: {e}")
             return False
     
-    def validate_latest_data(self):
-        """Valide les données les plus récentes en utilisant le checkpoint YAML."""
-        return self.run_checkpoint("target_results_checkpoint")
+    def run_batched_validation(self, snapshot_date: Optional[str] = None, data: Optional[pd.DataFrame] = None,
+                               suite_name: str = "target_results_suite",
+                               sample_percent: Optional[float] = None, table: Optional[str] = None) -> dict:
+        """
+        Évalue la suite à partir de métriques calculées en une seule requête d'agrégat sur
+        `table` (défaut: target_results_for_ge, restreinte à snapshot_date si fournie), ou en une passe sur
+        `data` si le DataFrame est fourni. Retourne un résultat au format Great Expectations.
+
+        Sur la table, `sample_percent` < 100 (défaut: VALIDATION_SAMPLE_PERCENT) évalue les
+        contrôles statistiques sur un échantillon déterministe, avec intervalle de confiance.
+        """
+        validator = self.compiled_suite(suite_name)
+        sample_percent = settings.validation.sample_percent if sample_percent is None else sample_percent
+        sampling = None
+        if data is None and sample_percent < 100:
+            sampling = Sampling(sample_percent, settings.validation.sample_method,
+                                settings.validation.sample_seed, settings.validation.confidence)
+        start = time.perf_counter()
+        with track('ge_batched_validation') as stage:
+            if data is not None:
+                metrics = validator.compute_frame(data)
+            else:
+                where = "snapshot_date = :snapshot_date" if snapshot_date else None
+                with DatabaseConnection() as conn:
+                    metrics = validator.compute_table(conn, table or settings.etl.target_results_for_ge, where,
+                                                      {'snapshot_date': snapshot_date} if snapshot_date else None,
+                                                      sampling=sampling)
+            result = validator.evaluate(metrics, sampling=sampling)
+            stage.rows = metrics.get(('sample_row_count',), metrics[('row_count',)])
+
+        statistics = result['statistics']
+        logger.info(f"⚡ Validation groupée de {suite_name}: {statistics['successful_expectations']}/"
+                    f"{statistics['evaluated_expectations']} expectations réussies en {time.perf_counter() - start:.3f}s")
+        if sampling is not None:
+            logger.info(f"🎲 Échantillon {sampling.method} de {sample_percent}%: "
+                        f"{result['sampling']['sample_row_count']}/{result['sampling']['row_count']} lignes")
+        for item in result['results']:
+            if not item['success']:
+                logger.error(f"❌ Échec: {item['expectation_config']['expectation_type']} {item['result']}")
+        return result
+
+    def latest_snapshot_date(self) -> Optional[str]:
+        """Dernier snapshot chargé (MAX sur la colonne de tête de la clé primaire : lecture d'index)"""
+        with DatabaseConnection() as conn:
+            latest = conn.execute(text(f"SELECT MAX(snapshot_date) FROM {settings.etl.target_results_for_ge}")).scalar()
+        return str(latest) if latest is not None else None
+
+    def validate_latest_data(self, snapshot_date: Optional[str] = None):
+        """
+        Valide un seul snapshot (celui du run, ou le dernier chargé si non fourni) avec le
+        checkpoint programmé : la durée ne dépend pas de l'historique de la table.
+        """
+        snapshot_date = snapshot_date or self.latest_snapshot_date()
+        if snapshot_date is None:
+            logger.warning(f"⚠️ Aucun snapshot dans {settings.etl.target_results_for_ge}")
+            return False
+        return self.run_programmatic_checkpoint(snapshot_date)
 
 def main():
     """Fonction principale pour exécuter les validations"""
@@ -0,0 +1,229 @@
+"""
+Service de validation résident : le DataContext, les suites compilées et le pool de
+connexions sont chargés une fois, puis chaque validation ne coûte plus que sa requête
+et son évaluation. Les suites sont relues quand leur JSON change sur disque.
+
+Protocole : une requête JSON par ligne, une réponse JSON par ligne, sur
+VALIDATION_WORKER_HOST:VALIDATION_WORKER_PORT (127.0.0.1:8765 par défaut).
+    {"action": "validate", "snapshot_date": "2025-01-01"}
+    {"action": "validate", "table": "target_results_for_ge", "mode": "checkpoint", "snapshot_date": "2025-01-01"}
+    {"action": "validate", "file": "/chemin/lignes.parquet"}
+    {"action": "ping"}
+    {"action": "shutdown"}
+
+    python ge_runner/worker.py serve
+    python ge_runner/worker.py validate --snapshot-date 2025-01-01
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from datetime import date
+from typing import Optional
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODES = ('batched', 'checkpoint')
+# Colonnes lues comme dates dans un fichier CSV de lignes
+DATE_COLUMNS = ('snapshot_date', 'datenaissance')
+
+
+def read_rows(path: str):
+    """Lignes à valider depuis un fichier Parquet ou CSV (pandas importé côté service seulement)"""
+    import pandas as pd
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(path, parse_dates=[column for column in DATE_COLUMNS if column in header])
+
+
+def parse_snapshot_date(value) -> Optional[str]:
+    """La date vient du client : seule une date ISO (YYYY-MM-DD) atteint le SQL"""
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"Date de snapshot invalide: {value!r} (attendu: YYYY-MM-DD)") from None
+
+
+class ValidationWorker:
+    """Traite les requêtes du service ; Great Expectations n'est importé qu'ici"""
+
+    def __init__(self, runner=None):
+        from ge_runner.run_validation import GreatExpectationsRunner
+        self.runner = runner or GreatExpectationsRunner()
+        self.started = time.time()
+        self.jobs = 0
+
+    def warm_up(self, suite_name: str = "target_results_suite"):
+        """Charge le contexte, compile la suite et ouvre une connexion du pool"""
+        from etl.utils import DatabaseConnection
+        start = time.perf_counter()
+        self.runner.compiled_suite(suite_name)
+        with DatabaseConnection() as conn:
+            conn.exec_driver_sql("SELECT 1")
+        logger.info(f"🔥 Service de validation prêt en {time.perf_counter() - start:.3f}s")
+
+    def handle(self, request: dict) -> dict:
+        action = request.get('action', 'validate')
+        if action == 'ping':
+            return {'ok': True, 'pid': os.getpid(), 'uptime': time.time() - self.started, 'jobs': self.jobs}
+        if action == 'validate':
+            return dict(self.validate(request), ok=True)
+        if action == 'shutdown':
+            return {'ok': True}
+        raise ValueError(f"Action inconnue: {action}")
+
+    def validate(self, job: dict) -> dict:
+        mode = job.get('mode', 'batched')
+        if mode not in MODES:
+            raise ValueError(f"Mode de validation inconnu: {mode} (attendu: {', '.join(MODES)})")
+        suite_name = job.get('suite', 'target_results_suite')
+        snapshot_date = parse_snapshot_date(job.get('snapshot_date'))
+        start = time.perf_counter()
+
+        if job.get('file'):
+            rows = read_rows(job['file'])
+            if mode == 'batched':
+                result = self.runner.run_batched_validation(data=rows, suite_name=suite_name)
+            else:
+                result = {'success': self.runner.run_programmatic_checkpoint(
+                    snapshot_date or time.strftime('%Y-%m-%d'), batch_data=rows, update_docs=job.get('update_docs', False))}
+        else:
+            table = job.get('table') or settings.etl.target_results_for_ge
+            self._check_table(table)
+            if snapshot_date is None and table == settings.etl.target_results_for_ge:
+                snapshot_date = self.runner.latest_snapshot_date()
+            if mode == 'batched':
+                result = self.runner.run_batched_validation(snapshot_date=snapshot_date, suite_name=suite_name,
+                                                            sample_percent=job.get('sample_percent'), table=table)
+            elif table != settings.etl.target_results_for_ge:
+                raise ValueError(f"Le checkpoint ne valide que {settings.etl.target_results_for_ge}")
+            else:
+                result = {'success': self.runner.run_programmatic_checkpoint(
+                    snapshot_date, update_docs=job.get('update_docs', False))}
+
+        self.jobs += 1
+        seconds = time.perf_counter() - start
+        logger.info(f"✅ Validation #{self.jobs} ({mode}) en {seconds:.3f}s: succès={result['success']}")
+        return {'success': result['success'], 'seconds': seconds, 'snapshot_date': snapshot_date, 'result': result}
+
+    @staticmethod
+    def _check_table(table: str):
+        """La table vient du client : elle doit exister avant d'être interpolée dans le SQL"""
+        from sqlalchemy import inspect
+        from etl.utils import DatabaseConnection
+        with DatabaseConnection() as conn:
+            if not table.isidentifier() or not inspect(conn).has_table(table):
+                raise ValueError(f"Table inconnue: {table}")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = self.server.worker.handle(request)
+            except Exception as e:
+                logger.error(f"❌ Requête en échec: {e}")
+                request, response = {}, {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+            if request.get('action') == 'shutdown':
+                # shutdown() attend la fin de serve_forever : appelé hors du thread de la requête
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class ValidationServer(socketserver.TCPServer):
+    """Une requête à la fois : le DataContext n'est pas partagé entre threads"""
+    allow_reuse_address = True
+
+    def __init__(self, worker: ValidationWorker, host: Optional[str] = None, port: Optional[int] = None):
+        self.worker = worker
+        super().__init__((host or settings.validation.worker_host,
+                          settings.validation.worker_port if port is None else port), _RequestHandler)
+
+
+class ValidationClient:
+    """Client du service (n'importe pas Great Expectations)"""
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, timeout: float = 300):
+        self.address = (host or settings.validation.worker_host,
+                        settings.validation.worker_port if port is None else port)
+        self.timeout = timeout
+
+    def request(self, payload: dict) -> dict:
+        with socket.create_connection(self.address, timeout=self.timeout) as sock:
+            sock.sendall(json.dumps(payload, default=str).encode() + b"\n")
+            with sock.makefile('rb') as reader:
+                response = json.loads(reader.readline())
+        if not response.get('ok'):
+            raise RuntimeError(f"Service de validation: {response.get('error')}")
+        return response
+
+    def validate(self, **job) -> dict:
+        return self.request(dict(job, action='validate'))
+
+    def ping(self) -> dict:
+        return self.request({'action': 'ping'})
+
+    def shutdown(self) -> dict:
+        return self.request({'action': 'shutdown'})
+
+
+def serve(host: Optional[str] = None, port: Optional[int] = None):
+    worker = ValidationWorker()
+    worker.warm_up()
+    with ValidationServer(worker, host, port) as server:
+        logger.info(f"🛰️ Service de validation à l'écoute sur {server.server_address[0]}:{server.server_address[1]}")
+        server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Service de validation Great Expectations résident')
+    parser.add_argument('command', choices=['serve', 'validate', 'ping', 'stop'])
+    parser.add_argument('--host', type=str, help=f'Adresse (défaut: {settings.validation.worker_host})')
+    parser.add_argument('--port', type=int, help=f'Port (défaut: {settings.validation.worker_port})')
+    parser.add_argument('--snapshot-date', type=str, help='Snapshot à valider (défaut: le dernier chargé)')
+    parser.add_argument('--table', type=str, help=f'Table à valider (défaut: {settings.etl.target_results_for_ge})')
+    parser.add_argument('--file', type=str, help='Fichier de lignes à valider (Parquet ou CSV)')
+    parser.add_argument('--mode', choices=MODES, default='batched')
+    parser.add_argument('--sample-percent', type=float)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.host, args.port)
+        return 0
+
+    client = ValidationClient(args.host, args.port)
+    if args.command == 'ping':
+        print(json.dumps(client.ping()))
+        return 0
+    if args.command == 'stop':
+        client.shutdown()
+        return 0
+
+    job = {'mode': args.mode, 'snapshot_date': args.snapshot_date, 'table': args.table,
+           'file': os.path.abspath(args.file) if args.file else None, 'sample_percent': args.sample_percent}
+    response = client.validate(**{k: v for k, v in job.items() if v is not None})
+    print(json.dumps({k: response[k] for k in ('success', 'seconds', 'snapshot_date')}))
+    return 0 if response['success'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,10 +3,17 @@
 Pipeline ETL principal avec validation pytest et Great Expectations
 """
 
+import asyncio
+import time
+
+# Instant de démarrage du processus, pour mesurer le coût du démarrage à froid
+_START_TIME = time.perf_counter()
+
 import sys
 import os
 import logging
 from datetime import datetime, date
+from functools import cached_property
 import argparse
 
 # Ajouter le répertoire courant au path
@@ -15,8 +22,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from etl.extract import DataExtractor
 from etl.transform import DataTransformer
 from etl.load import DataLoader
-from ge_runner.run_validation import GreatExpectationsRunner
 from config.settings import settings
+from etl.metrics import metrics
 
 logging.basicConfig(
 	level=logging.INFO,
@@ -25,12 +32,72 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class ETLPipeline:
-	def __init__(self, snapshot_date: date = None):
-		self.extractor = DataExtractor()
-		self.transformer = DataTransformer()
-		self.loader = DataLoader()
-		self.ge_runner = GreatExpectationsRunner()
+	def __init__(self, snapshot_date: date = None, streaming: bool = False, batch_size: int = None,
+			mode: str = "pandas", upsert: bool = False, workers: int = 1, incremental: bool = False,
+			refresh_from: date = None, snapshot_range: tuple = None, out_of_core: bool = False,
+			memory_budget_mb: int = None, overlap: bool = False, queue_size: int = 2, use_async: bool = False,
+			validation: str = "checkpoint", validate_chunks: bool = False, sample_percent: float = None,
+			use_worker: bool = False):
 		self.snapshot_date = snapshot_date or datetime.now().date()
+		# Sans date demandée, la validation porte sur les snapshots effectivement chargés par le run
+		self.snapshot_date_given = snapshot_date is not None or refresh_from is not None
+		self.loaded_snapshot = None
+		# Mode streaming : extract -> transform -> load par lots de batch_size lignes
+		self.streaming = streaming
+		self.batch_size = batch_size or settings.etl.batch_size
+		# Mode d'exécution : "pandas" (calcul en Python) ou "sql" (push-down dans PostgreSQL)
+		self.mode = mode
+		# Mode incrémental : seul le delta depuis la dernière marque haute (created_at) est traité
+		self.incremental = incremental
+		# Chargement idempotent (staging + ON CONFLICT) : un run peut être relancé sans nettoyage.
+		# Obligatoire en incrémental, le delta recalcule des lignes déjà chargées
+		self.upsert = upsert or incremental
+		# Rafraîchissement : le snapshot est dérivé des résultats de refresh_from (anniversaires seuls recalculés)
+		self.refresh_from = refresh_from
+		# Backfill : (début, fin) des dates de snapshot à calculer, source extraite une seule fois
+		self.snapshot_range = snapshot_range
+		self.completed_dates = []
+		# Mode hors mémoire : partitions par hachage sur disque, chacune tenant dans le budget
+		self.out_of_core = out_of_core
+		self.memory_budget_mb = memory_budget_mb or settings.etl.memory_budget_mb
+		# Mode recouvrant : lecture, transformation et chargement dans des threads reliés par des files bornées
+		self.overlap = overlap
+		self.queue_size = queue_size
+		# Mode asynchrone (asyncpg) : source et target lues en parallèle, partitions chargées en parallèle
+		self.use_async = use_async
+		# Validation GE : "checkpoint" (moteur Great Expectations), "batched" (métriques en une requête)
+		# ou "memory" (checkpoint sur le DataFrame transformé, sans relire la table)
+		self.validation = validation
+		# Modes par lots : chaque lot passe le checkpoint GE en mémoire avant d'être chargé
+		self.validate_chunks = validate_chunks
+		# Validation groupée sur la table : pourcentage de lignes des contrôles statistiques (None = réglage)
+		self.sample_percent = sample_percent
+		# Validation confiée au service résident (ge_runner/worker.py) : GE n'est pas chargé dans ce processus
+		self.use_worker = use_worker
+		self.ge_chunk_results = []
+		# workers > 1 : la table est découpée en plages d'id traitées par un pool de processus
+		self.workers = workers
+		self.failed_partitions = []
+		# Résultats des étapes du run en cours (chaque étape n'est calculée qu'une fois)
+		self.stage_results = {}
+	
+	# Composants construits à la demande : un run --etl-only ne charge jamais Great Expectations
+	@cached_property
+	def extractor(self) -> DataExtractor:
+		return DataExtractor()
+	
+	@cached_property
+	def transformer(self) -> DataTransformer:
+		return DataTransformer(self.extractor)
+	
+	@cached_property
+	def loader(self) -> DataLoader:
+		return DataLoader(upsert=self.upsert)
+	
+	@cached_property
+	def ge_runner(self):
+		from ge_runner.run_validation import GreatExpectationsRunner
+		return GreatExpectationsRunner()
 		
 	def setup_database(self):
 		"""Initialise la base de données avec les tables et données d'exemple"""
@@ -47,28 +114,92 @@ class ETLPipeline:
 	def run_etl(self):
 		"""Exécute le pipeline ETL complet"""
 		logger.info(f"🚀 Démarrage du pipeline ETL pour la date: {self.snapshot_date}")
+		metrics.reset()
+		
+		if self.snapshot_range:
+			return self.run_backfill()
+		if self.refresh_from:
+			return self.run_etl_refresh()
+		if self.mode == "sql":
+			return self.run_etl_pushdown()
+		if self.incremental:
+			return self.run_etl_incremental()
+		if self.out_of_core:
+			return self.run_etl_out_of_core()
+		if self.overlap:
+			return self.run_etl_overlapped()
+		if self.use_async:
+			return asyncio.run(self.run_etl_async())
+		if self.streaming:
+			return self.run_etl_streaming()
+		if self.workers > 1:
+			return self.run_etl_parallel()
+		
+		self.stage_results = {}
 		
 		try:
 			# 1. Extract
 			logger.info("📥 Phase d'extraction...")
-			source_data = self.extractor.extract_source_data()
+			source_data = self._run_stage('extract_source', self.extractor.extract_source_data)
 			if source_data.empty:
 				logger.warning("⚠️ Aucune donnée à traiter")
 				return False
+			target_data = self._run_stage('extract_target', self.extractor.extract_target_structure)
 			
 			# 2. Transform
 			logger.info("🔄 Phase de transformation...")
-			transformed_data = self.transformer.transform_data()
+			transformed_data = self._run_stage('transform', self.transformer.transform_data, source_data, target_data)
 			
 			# 3. Validate transformation
 			logger.info("✅ Validation des données transformées...")
-			if not self.transformer.validate_transformed_data(transformed_data):
+			if not self._run_stage('validate', self.transformer.validate_transformed_data, transformed_data):
 				logger.error("❌ Validation des données transformées échouée")
 				return False
 			
 			# 4. Load
 			logger.info("📤 Phase de chargement...")
-			if not self.loader.load_data():
+			if not self._run_stage('load', self.loader.load_data, transformed_data):
+				logger.error("❌ Chargement des données échoué")
+				return False
+			
+			logger.info("✅ Pipeline ETL terminé avec succès")
+			return True
+			
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
+			return False
+	
+	def _run_stage(self, name: str, func, *args):
+		"""Exécute une étape une seule fois par run et met son résultat en cache"""
+		if name not in self.stage_results:
+			self.stage_results[name] = func(*args)
+		return self.stage_results[name]
+	
+	def run_etl_incremental(self):
+		"""Exécute l'ETL sur les seules lignes ajoutées depuis le dernier run réussi"""
+		from etl.watermark import WatermarkStore
+		
+		tables = (settings.etl.source_table, settings.etl.target_table)
+		store = WatermarkStore()
+		try:
+			store.ensure_table()
+			since = {table: store.get(table) for table in tables}
+			logger.info(f"📈 Mode incrémental, marques hautes: {since}")
+			
+			source_data, target_data, marks = self.extractor.extract_incremental(since)
+			if target_data.empty:
+				# Rien à recalculer : on avance tout de même les marques
+				self.loader.load_data(target_data, watermarks=marks)
+				logger.info("✅ Aucune nouvelle donnée depuis le dernier run")
+				return True
+			
+			transformed_data = self.transformer.transform_data(source_data, target_data)
+			if not self.transformer.validate_transformed_data(transformed_data):
+				logger.error("❌ Validation des données transformées échouée")
+				return False
+			
+			# Les marques avancent dans la transaction du chargement
+			if not self.loader.load_data(transformed_data, watermarks=marks):
 				logger.error("❌ Chargement des données échoué")
 				return False
 			
@@ -79,13 +210,303 @@ class ETLPipeline:
 			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
 			return False
 	
-	def run_great_expectations_validation(self):
-		"""Exécute les validations Great Expectations"""
+	def run_etl_streaming(self):
+		"""Exécute le pipeline ETL comme un pipeline de générateurs, lot par lot"""
+		logger.info(f"🌊 Mode streaming activé (lots de {self.batch_size} lignes)")
+		
+		try:
+			chunks = self.transformer.transform_chunks(self.batch_size)
+			if not self.loader.load_chunks(self._validated_chunks(chunks)):
+				logger.error("❌ Chargement des données échoué")
+				return False
+			
+			logger.info("✅ Pipeline ETL terminé avec succès")
+			return True
+			
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
+			return False
+	
+	def run_etl_overlapped(self):
+		"""
+		Exécute extraction, transformation et chargement en parallèle sur des lots :
+		un thread lit, un thread transforme et valide, le thread courant charge.
+		Une erreur dans une étape annule les autres et le chargement n'est pas commité.
+		"""
+		from etl.overlap import OverlappedExecutor
+		logger.info(f"🔀 Mode recouvrant activé (lots de {self.batch_size} lignes, files de {self.queue_size} lots)")
+		
+		try:
+			with OverlappedExecutor(self.queue_size) as executor:
+				chunks = executor.background(self.extractor.iter_chunks(self.batch_size), 'extract')
+				transformed = executor.background(
+					self._validated_chunks(self.transformer.transform_frames(source, target) for source, target in chunks),
+					'transform'
+				)
+				if not self.loader.load_chunks(transformed):
+					logger.error("❌ Chargement des données échoué")
+					return False
+			
+			logger.info("✅ Pipeline ETL terminé avec succès")
+			return True
+			
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
+			return False
+	
+	async def run_etl_async(self):
+		"""
+		Exécute l'ETL depuis une boucle d'événements : les deux extractions partagent un pool
+		asyncpg et s'exécutent en parallèle, la transformation tourne dans un thread, puis les
+		partitions d'id sont chargées en parallèle (une transaction par partition).
+		"""
+		from etl.async_etl import AsyncDataExtractor, AsyncDataLoader, create_pool
+		partitions = max(1, self.workers)
+		logger.info(f"⚡ Mode asynchrone activé ({partitions} partition(s) de chargement)")
+		
+		try:
+			pool = await create_pool(max_size=max(2, partitions))
+			try:
+				source_data, target_data = await AsyncDataExtractor(pool).extract_all()
+				if source_data.empty:
+					logger.warning("⚠️ Aucune donnée à traiter")
+					return False
+				
+				loop = asyncio.get_running_loop()
+				transformed_data = await loop.run_in_executor(None, self.transformer.transform_frames, source_data, target_data)
+				if not self.transformer.validate_transformed_data(transformed_data):
+					logger.error("❌ Validation des données transformées échouée")
+					return False
+				
+				chunks = [chunk for _, chunk in transformed_data.groupby(transformed_data['id'].to_numpy() % partitions, sort=False)]
+				await AsyncDataLoader(pool, upsert=self.upsert).load_partitions(chunks)
+			finally:
+				await pool.close()
+			
+			logger.info("✅ Pipeline ETL terminé avec succès")
+			return True
+			
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
+			return False
+	
+	def run_etl_out_of_core(self):
+		"""Exécute l'ETL partition par partition depuis des fichiers temporaires (données > RAM)"""
+		logger.info(f"💾 Mode hors mémoire activé (budget {self.memory_budget_mb} Mo)")
+		
+		try:
+			partitions = self.transformer.transform_out_of_core(self.memory_budget_mb, settings.etl.spill_dir)
+			if not self.loader.load_chunks(self._validated_chunks(partitions)):
+				logger.error("❌ Chargement des données échoué")
+				return False
+			
+			logger.info("✅ Pipeline ETL terminé avec succès")
+			return True
+			
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
+			return False
+	
+	def run_etl_parallel(self, id_ranges=None):
+		"""Exécute l'ETL par partitions d'id réparties sur un pool de processus"""
+		from etl.parallel import run_partitions
+		
+		try:
+			id_ranges = id_ranges or self.extractor.get_id_partitions(self.workers)
+			logger.info(f"⚙️ Mode parallèle: {len(id_ranges)} partitions sur {self.workers} processus")
+			results = run_partitions(id_ranges, self.workers, self.upsert)
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
+			return False
+		
+		self.failed_partitions = [result.id_range for result in results if not result.success]
+		loaded = sum(result.rows for result in results)
+		logger.info(f"📦 {len(results) - len(self.failed_partitions)}/{len(results)} partitions chargées ({loaded} lignes)")
+		
+		if self.failed_partitions:
+			for result in results:
+				if not result.success:
+					logger.error(f"❌ Partition d'id {result.id_range} en échec: {result.error}")
+			logger.error("❌ Pipeline ETL incomplet, relancez retry_failed_partitions()")
+			return False
+		
+		logger.info("✅ Pipeline ETL terminé avec succès")
+		return True
+	
+	def retry_failed_partitions(self):
+		"""Relance uniquement les partitions en échec lors du dernier run parallèle"""
+		if not self.failed_partitions:
+			return True
+		logger.info(f"🔁 Relance de {len(self.failed_partitions)} partition(s) en échec")
+		return self.run_etl_parallel(list(self.failed_partitions))
+	
+	def run_etl_pushdown(self):
+		"""Exécute la jointure et le calcul d'âge directement dans PostgreSQL"""
+		logger.info("🗄️ Mode push-down SQL: transformation et chargement côté serveur")
+		
+		try:
+			inserted = self.transformer.transform_in_database(upsert=self.upsert)
+			if inserted == 0:
+				logger.warning("⚠️ Aucune donnée à traiter")
+				return False
+			
+			# Les données sont déjà chargées : une seule requête d'agrégat sur les snapshots écrits, sans les relire
+			snapshots = self.transformer.loaded_snapshots
+			self.loaded_snapshot = snapshots[-1]
+			if not self.transformer.validate_loaded_data(snapshot_dates=snapshots):
+				logger.error("❌ Validation des données chargées échouée")
+				return False
+			
+			logger.info("✅ Pipeline ETL terminé avec succès")
+			return True
+			
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
+			return False
+	
+	def run_backfill(self):
+		"""
+		Calcule une plage de snapshots pour les id de target_table : source extraite une
+		fois, âges vectorisés date par date, une transaction par date. Avec workers > 1,
+		les dates sont réparties sur le pool de processus de l'ETL parallèle. Les dates déjà
+		chargées sont sautées, un backfill interrompu reprend donc là où il s'est arrêté.
+		"""
+		start, end = self.snapshot_range
+		logger.info(f"🗓️ Backfill des snapshots du {start} au {end}")
+		dates = []
+		
+		try:
+			dates = self.extractor.get_snapshot_dates(start, end)
+			self.completed_dates = self.loader.completed_snapshot_dates(start, end)
+			if self.completed_dates:
+				logger.info(f"⏭️ {len(self.completed_dates)} date(s) déjà chargée(s), ignorée(s)")
+			completed = set(self.completed_dates)
+			pending = [d for d in dates if d not in completed]
+			if not pending:
+				logger.info("✅ Backfill déjà complet")
+				return True
+			
+			if self.workers > 1:
+				return self._run_backfill_parallel(pending, len(dates))
+			
+			target_ids = self.extractor.extract_target_ids()
+			if target_ids.empty:
+				logger.warning("⚠️ Aucune donnée à traiter")
+				return False
+			source_data = self.extractor.extract_source_data()
+			
+			for snapshot_date, snapshot_data in self.transformer.transform_snapshots(source_data, target_ids, pending):
+				if not self.transformer.validate_transformed_data(snapshot_data):
+					logger.error(f"❌ Validation du snapshot {snapshot_date} échouée")
+					return False
+				self.loader.load_data(snapshot_data)
+				self.completed_dates.append(snapshot_date)
+				logger.info(f"📅 Snapshot {snapshot_date} chargé ({len(self.completed_dates)}/{len(dates)})")
+			
+			logger.info("✅ Backfill terminé avec succès")
+			return True
+			
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le backfill: {e}")
+			logger.error(f"❌ Dates terminées: {len(self.completed_dates)}/{len(dates)}, relancez la même commande pour reprendre")
+			return False
+	
+	def _run_backfill_parallel(self, pending, total):
+		"""Backfill des dates `pending` réparties sur `workers` processus"""
+		from etl.parallel import run_snapshot_dates
+		logger.info(f"⚙️ Backfill parallèle: {len(pending)} date(s) sur {self.workers} processus")
+		
+		results = run_snapshot_dates(pending, self.workers, self.upsert)
+		self.completed_dates = sorted(self.completed_dates + [result.snapshot_date for result in results if result.success])
+		failed = [result for result in results if not result.success]
+		for result in failed:
+			logger.error(f"❌ Snapshot {result.snapshot_date} en échec: {result.error}")
+		if failed:
+			logger.error(f"❌ Dates terminées: {len(self.completed_dates)}/{total}, relancez la même commande pour reprendre")
+			return False
+		
+		logger.info("✅ Backfill terminé avec succès")
+		return True
+	
+	def run_etl_refresh(self):
+		"""Dérive le snapshot du jour des résultats du snapshot précédent"""
+		logger.info(f"🎂 Rafraîchissement du snapshot {self.refresh_from} vers {self.snapshot_date}")
+		
+		try:
+			written = self.transformer.refresh_snapshot(self.refresh_from, self.snapshot_date, upsert=self.upsert)
+			if written == 0:
+				logger.warning("⚠️ Aucune donnée à traiter")
+				return False
+			
+			if not self.transformer.validate_loaded_data(self.snapshot_date):
+				logger.error("❌ Validation des données chargées échouée")
+				return False
+			
+			logger.info("✅ Pipeline ETL terminé avec succès")
+			return True
+			
+		except Exception as e:
+			logger.error(f"❌ Erreur dans le pipeline ETL: {e}")
+			return False
+	
+	def _validated_chunks(self, chunks):
+		"""Valide chaque lot transformé avant de le transmettre au chargement"""
+		self.ge_chunk_results = []
+		for index, chunk in enumerate(chunks):
+			if not self.transformer.validate_transformed_data(chunk):
+				raise ValueError("Validation des données transformées échouée")
+			chunk_snapshot = _max_snapshot(chunk)
+			if chunk_snapshot is not None:
+				self.loaded_snapshot = max(self.loaded_snapshot or chunk_snapshot, chunk_snapshot)
+			if self.validate_chunks:
+				# Un lot refusé interrompt le chargement (transaction annulée), rien n'est relu en base
+				chunk_snapshot = chunk_snapshot or self.snapshot_date
+				batch_name = f"{settings.etl.target_results_for_ge}_{chunk_snapshot:%Y%m%d}_lot{index}"
+				success = self.ge_runner.run_programmatic_checkpoint(str(chunk_snapshot), batch_data=chunk,
+					batch_name=batch_name, update_docs=False)
+				self.ge_chunk_results.append(success)
+				if not success:
+					raise ValueError(f"Validation Great Expectations du lot {index} échouée")
+			yield chunk
+	
+	def run_great_expectations_validation(self, latest: bool = False):
+		"""
+		Exécute les validations Great Expectations sur le snapshot du run
+		(ou sur le dernier snapshot chargé avec latest=True), jamais sur tout l'historique
+		"""
 		logger.info("🔍 Démarrage des validations Great Expectations...")
 		
 		try:
-			validation_success = self.ge_runner.validate_latest_data()
-			docs_success = self.ge_runner.create_data_docs()
+			# DataFrame transformé du run en cours, s'il est encore en mémoire
+			frame = self.stage_results.get('transform')
+			snapshot_date = None if latest else self._validation_snapshot(frame)
+			response = self._validate_with_worker(snapshot_date) if self.use_worker and not self.ge_chunk_results else None
+			if response is not None:
+				validation_success = response['success']
+				docs_success = True
+			elif self.ge_chunk_results:
+				# Lots déjà validés pendant le chargement : il ne reste qu'à regénérer les data docs
+				validation_success = all(self.ge_chunk_results)
+				docs_success = self.ge_runner.create_data_docs()
+			elif self.validation == "batched":
+				# Une seule requête d'agrégat (ou une passe sur le DataFrame) ; rien n'est stocké,
+				# les data docs restent inchangées
+				validation_success = self.ge_runner.run_batched_validation(
+					snapshot_date=snapshot_date or self.ge_runner.latest_snapshot_date(), data=frame,
+					sample_percent=self.sample_percent)['success']
+				docs_success = True
+			elif self.validation == "memory" and frame is not None:
+				# Checkpoint sur les lignes du snapshot validé dans le DataFrame qui vient d'être chargé
+				# (les data docs sont mises à jour par le checkpoint)
+				snapshot_date = snapshot_date or str(self.snapshot_date)
+				validation_success = self.ge_runner.run_programmatic_checkpoint(
+					snapshot_date, batch_data=_snapshot_rows(frame, snapshot_date))
+				docs_success = True
+			else:
+				if self.validation == "memory":
+					logger.warning("⚠️ Aucun DataFrame transformé en mémoire, validation sur la table")
+				validation_success = self.ge_runner.validate_latest_data(snapshot_date)
+				docs_success = self.ge_runner.create_data_docs()
 			
 			if validation_success and docs_success:
 				logger.info("✅ Validations Great Expectations réussies")
@@ -98,6 +519,37 @@ class ETLPipeline:
 			logger.error(f"❌ Erreur lors des validations Great Expectations: {e}")
 			return False
 	
+	def _validation_snapshot(self, frame=None):
+		"""
+		Snapshot validé après le run : la date demandée, sinon la plus récente chargée par
+		le run. None quand le run ne la connaît pas (le dernier snapshot en base est validé).
+		"""
+		if self.completed_dates:
+			return str(max(self.completed_dates))
+		if self.snapshot_date_given:
+			return str(self.snapshot_date)
+		loaded = _max_snapshot(frame) if frame is not None else None
+		loaded = loaded or self.loaded_snapshot
+		return str(loaded) if loaded else None
+	
+	def _validate_with_worker(self, snapshot_date):
+		"""Envoie la validation du snapshot au service résident ; None s'il ne répond pas"""
+		from ge_runner.worker import ValidationClient
+		if self.validation == "memory":
+			logger.warning("⚠️ Validation en mémoire non transmise au service, le snapshot chargé est validé sur la table")
+		job = {'mode': 'batched' if self.validation == "batched" else 'checkpoint', 'update_docs': True}
+		if snapshot_date:
+			job['snapshot_date'] = snapshot_date
+		if self.sample_percent is not None:
+			job['sample_percent'] = self.sample_percent
+		try:
+			response = ValidationClient().validate(**job)
+		except OSError as e:
+			logger.warning(f"⚠️ Service de validation injoignable ({e}), validation locale")
+			return None
+		logger.info(f"🛰️ Validation par le service résident en {response['seconds']:.3f}s (snapshot {response['snapshot_date']})")
+		return response
+	
 	def run_complete_pipeline(self):
 		"""Exécute le pipeline complet avec validations"""
 		logger.info("🎯 Démarrage du pipeline ETL complet")
@@ -117,6 +569,23 @@ class ETLPipeline:
 		logger.info("🎉 Pipeline complet terminé!")
 		return True
 
+def _max_snapshot(frame):
+	"""Date de snapshot la plus récente d'un DataFrame transformé (None s'il est vide)"""
+	if frame.empty or 'snapshot_date' not in frame:
+		return None
+	latest = frame['snapshot_date'].max()
+	if latest is None or latest != latest:  # NaT : colonne entièrement nulle
+		return None
+	return latest.date() if isinstance(latest, datetime) else latest
+
+def _snapshot_rows(frame, snapshot_date):
+	"""Lignes d'un DataFrame transformé qui appartiennent au snapshot donné (YYYY-MM-DD)"""
+	if frame.empty or 'snapshot_date' not in frame:
+		return frame
+	day = date.fromisoformat(str(snapshot_date))
+	dates = frame['snapshot_date'].map(lambda value: value.date() if isinstance(value, datetime) else value)
+	return frame[dates == day]
+
 def main():
 	"""Fonction principale"""
 	parser = argparse.ArgumentParser(description='Pipeline ETL avec validations')
@@ -124,20 +593,90 @@ def main():
 	parser.add_argument('--setup-only', action='store_true', help='Configurer seulement la base de données')
 	parser.add_argument('--etl-only', action='store_true', help='Exécuter seulement l\'ETL')
 	parser.add_argument('--validate-only', action='store_true', help='Exécuter seulement les validations')
+	parser.add_argument('--mode', choices=['pandas', 'sql'], default='pandas',
+		help='Mode d\'exécution: pandas (calcul en Python) ou sql (push-down dans PostgreSQL)')
+	parser.add_argument('--upsert', action='store_true',
+		help='Chargement idempotent: fusion sur (snapshot_date, id) au lieu d\'un simple INSERT')
+	parser.add_argument('--workers', type=int, default=1,
+		help='Nombre de processus pour l\'ETL parallèle par plages d\'id, ou pour répartir les dates d\'un backfill (défaut: 1)')
+	parser.add_argument('--incremental', action='store_true',
+		help='Ne traiter que les lignes ajoutées (created_at) depuis le dernier run réussi')
+	parser.add_argument('--snapshot-date-range', nargs=2, metavar=('DEBUT', 'FIN'),
+		help='Backfill de tous les snapshots entre deux dates incluses (YYYY-MM-DD YYYY-MM-DD)')
+	parser.add_argument('--refresh-from', type=str,
+		help='Dériver le snapshot des résultats de cette date (YYYY-MM-DD) : seuls les anniversaires sont recalculés')
+	parser.add_argument('--streaming', action='store_true', help='Extraire, transformer et charger par lots (mémoire bornée)')
+	parser.add_argument('--overlap', action='store_true',
+		help='Recouvrir lecture, transformation et chargement (threads et files bornées, par lots)')
+	parser.add_argument('--async', dest='use_async', action='store_true',
+		help='Extraction et chargement asynchrones (asyncpg) : lectures parallèles, partitions chargées en parallèle (--workers)')
+	parser.add_argument('--out-of-core', action='store_true',
+		help='Partitionner target et source sur disque et les traiter partition par partition')
+	parser.add_argument('--memory-budget-mb', type=int,
+		help=f'Budget mémoire par partition en mode hors mémoire (défaut: {settings.etl.memory_budget_mb})')
+	parser.add_argument('--validation', choices=['checkpoint', 'batched', 'memory'], default='checkpoint',
+		help='Validation GE: checkpoint (moteur Great Expectations), batched (toutes les métriques en une requête) '
+			'ou memory (checkpoint sur le DataFrame transformé, sans relire la table)')
+	parser.add_argument('--validate-chunks', action='store_true',
+		help='Modes par lots: valider chaque lot avec Great Expectations avant de le charger')
+	parser.add_argument('--sample-percent', type=float,
+		help=f'Validation batched sur la table: pourcentage de lignes des contrôles statistiques, '
+			f'échantillon déterministe (défaut: {settings.validation.sample_percent})')
+	parser.add_argument('--validation-worker', action='store_true',
+		help='Confier la validation au service résident (python ge_runner/worker.py serve), validation locale s\'il ne répond pas')
+	parser.add_argument('--batch-size', type=int, help=f'Taille des lots en mode --streaming ou --overlap (défaut: {settings.etl.batch_size})')
 	
 	args = parser.parse_args()
-	
-	# Parse snapshot date
-	snapshot_date = None
-	if args.snapshot_date:
-		try:
+
+	# run_etl n'exécute qu'un mode : une combinaison d'options serait sinon ignorée en silence
+	actions = [flag for flag, enabled in (('--setup-only', args.setup_only), ('--etl-only', args.etl_only),
+		('--validate-only', args.validate_only)) if enabled]
+	modes = [flag for flag, enabled in (('--snapshot-date-range', args.snapshot_date_range),
+		('--refresh-from', args.refresh_from), ('--mode sql', args.mode == 'sql'), ('--incremental', args.incremental),
+		('--out-of-core', args.out_of_core), ('--overlap', args.overlap), ('--async', args.use_async),
+		('--streaming', args.streaming)) if enabled]
+	if len(actions) > 1:
+		parser.error(f"options incompatibles: {' et '.join(actions)}")
+	if len(modes) > 1:
+		parser.error(f"options incompatibles: {' et '.join(modes)} (un seul mode d'exécution à la fois)")
+	mode = modes[0] if modes else None
+	if args.workers < 1:
+		parser.error("--workers doit être supérieur ou égal à 1")
+	if args.workers > 1 and mode not in (None, '--async', '--snapshot-date-range'):
+		parser.error(f"--workers ne s'applique qu'à l'ETL par défaut, à --async ou à --snapshot-date-range, pas à {mode}")
+	if args.batch_size is not None and mode not in ('--streaming', '--overlap'):
+		parser.error("--batch-size ne s'applique qu'à --streaming ou --overlap")
+	if args.validate_chunks and mode not in ('--streaming', '--overlap', '--out-of-core'):
+		parser.error("--validate-chunks ne s'applique qu'à --streaming, --overlap ou --out-of-core")
+	if args.memory_budget_mb is not None and mode != '--out-of-core':
+		parser.error("--memory-budget-mb ne s'applique qu'à --out-of-core")
+	if args.snapshot_date and mode == '--snapshot-date-range':
+		parser.error("options incompatibles: --snapshot-date et --snapshot-date-range")
+	if args.sample_percent is not None and args.validation != 'batched':
+		parser.error("--sample-percent ne s'applique qu'à --validation batched")
+
+	# Parse snapshot dates
+	snapshot_date = refresh_from = snapshot_range = None
+	try:
+		if args.snapshot_date:
 			snapshot_date = datetime.strptime(args.snapshot_date, '%Y-%m-%d').date()
-		except ValueError:
-			logger.error("❌ Format de date invalide. Utilisez YYYY-MM-DD")
-			return 1
+		if args.refresh_from:
+			refresh_from = datetime.strptime(args.refresh_from, '%Y-%m-%d').date()
+		if args.snapshot_date_range:
+			snapshot_range = tuple(datetime.strptime(d, '%Y-%m-%d').date() for d in args.snapshot_date_range)
+	except ValueError:
+		logger.error("❌ Format de date invalide. Utilisez YYYY-MM-DD")
+		return 1
+	
+	logger.info(f"⏱️ Démarrage à froid: {time.perf_counter() - _START_TIME:.3f}s")
 	
 	# Initialize pipeline
-	pipeline = ETLPipeline(snapshot_date)
+	pipeline = ETLPipeline(snapshot_date, streaming=args.streaming, batch_size=args.batch_size,
+		mode=args.mode, upsert=args.upsert, workers=args.workers, incremental=args.incremental,
+		refresh_from=refresh_from, snapshot_range=snapshot_range, out_of_core=args.out_of_core,
+		memory_budget_mb=args.memory_budget_mb, overlap=args.overlap, use_async=args.use_async,
+		validation=args.validation, validate_chunks=args.validate_chunks, sample_percent=args.sample_percent,
+		use_worker=args.validation_worker)
 	
 	# Execute based on arguments
 	if args.setup_only:
@@ -145,10 +684,12 @@ def main():
 	elif args.etl_only:
 		success = pipeline.run_etl()
 	elif args.validate_only:
-		success = pipeline.run_great_expectations_validation()
+		# Sans --snapshot-date, le dernier snapshot chargé est validé
+		success = pipeline.run_great_expectations_validation(latest=args.snapshot_date is None)
 	else:
 		success = pipeline.run_complete_pipeline()
 	
+	metrics.export(settings.etl.metrics_dir, success)
 	return 0 if success else 1
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@
 -- Supprimer les tables si elles existent
 DROP TABLE IF EXISTS target_table;
 DROP TABLE IF EXISTS source_table;
+DROP TABLE IF EXISTS etl_watermarks;
 
 -- Créer la table source
 CREATE TABLE source_table (
@@ -32,6 +33,18 @@ CREATE TABLE target_results_for_ge (
 CREATE INDEX idx_source_table_datenaissance ON source_table(datenaissance);
 CREATE INDEX idx_target_table_snapshot_date ON target_table(snapshot_date);
 CREATE INDEX idx_target_table_age ON target_table(age);
+-- Extraction incrémentale (--incremental) : lecture du delta par created_at
+CREATE INDEX idx_source_table_created_at ON source_table(created_at);
+CREATE INDEX idx_target_table_created_at ON target_table(created_at);
+
+-- Marques hautes de l'extraction incrémentale, par table alimentée et table lue
+CREATE TABLE etl_watermarks (
+    consumer TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    high_water TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (consumer, table_name)
+);
 
 -- Ajouter des commentaires
 COMMENT ON TABLE source_table IS 'Table source contenant les dates de naissance';
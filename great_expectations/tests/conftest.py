@@ -0,0 +1,22 @@
+import shutil
+
+import pytest
+
+from ge_runner.run_validation import GreatExpectationsRunner
+
+
+@pytest.fixture
+def ge_project(tmp_path):
+    """Copie du projet GE (suite + résultats versionnés) : le store du dépôt n'est pas modifié"""
+    source = GreatExpectationsRunner().context_root_dir
+    root = tmp_path / "great_expectations"
+    shutil.copytree(source, root, ignore=shutil.ignore_patterns("uncommitted", "checkpoints"))
+    return str(root)
+
+
+@pytest.fixture
+def isolated_runner(ge_project):
+    """Runner dont les checkpoints stockent leurs résultats dans la copie du projet"""
+    runner = GreatExpectationsRunner()
+    runner.context_root_dir = ge_project
+    return runner
@@ -0,0 +1,67 @@
+import json
+import os
+from datetime import date, datetime, timezone
+
+import great_expectations as gx
+import pytest
+from great_expectations.core.run_identifier import RunIdentifier
+from great_expectations.data_context.types.resource_identifiers import ValidationResultIdentifier
+
+from ge_runner.data_docs import STATE_FILE, DataDocsMaintainer
+
+
+@pytest.fixture
+def context(ge_project):
+    return gx.get_context(context_root_dir=ge_project)
+
+
+def site_pages(maintainer):
+    pages = []
+    for directory, _, files in os.walk(os.path.join(maintainer.site_directory, "validations")):
+        pages += [name for name in files if name.endswith(".html")]
+    return pages
+
+
+def add_run(context, key, run_name):
+    """Nouveau résultat dans le store, copié d'un résultat existant"""
+    run_id = RunIdentifier(run_name=run_name, run_time=datetime.now(timezone.utc))
+    new_key = ValidationResultIdentifier(key.expectation_suite_identifier, run_id, key.batch_identifier)
+    context.validations_store.set(new_key, context.validations_store.get(key))
+    return new_key
+
+
+def test_incremental_build_renders_only_new_results(context):
+    maintainer = DataDocsMaintainer(context)
+    stored = maintainer._validation_keys()
+
+    assert maintainer.build() == len(stored) + 1
+    assert os.path.exists(os.path.join(maintainer.site_directory, STATE_FILE))
+    assert maintainer.build() == 0
+
+    add_run(context, stored[0], "incremental-run")
+    assert maintainer.build() == 1
+    assert len(site_pages(maintainer)) == len(stored) + 1
+    assert maintainer.build(full=True) == len(stored) + 2
+
+
+def test_retention_folds_old_results_into_daily_summary(context):
+    maintainer = DataDocsMaintainer(context, retention_days=30, retention_runs=3)
+    stored = maintainer._validation_keys()
+    maintainer.build()
+    recent = add_run(context, stored[0], "retention-run")
+
+    # Les résultats versionnés (2025-07-16) sont hors de la fenêtre de 30 jours, au plus 3 runs gardés
+    compacted = maintainer.compact()
+    kept = maintainer._validation_keys()
+    assert recent in kept and len(kept) <= 3
+    assert compacted == len(stored) + 1 - len(kept)
+
+    with open(maintainer.summary_path) as f:
+        summary = json.load(f)
+    day = summary["days"]["2025-07-16"]
+    assert day["runs"] == sum(key.run_id.run_time.date() == date(2025, 7, 16) for key in stored)
+    assert day["evaluated_expectations"] >= day["successful_expectations"]
+
+    maintainer.build(rebuild_index=True)
+    assert len(site_pages(maintainer)) == len(kept)
+    assert maintainer.compact() == 0
@@ -0,0 +1,148 @@
+import json
+from datetime import date
+
+import pandas as pd
+import pytest
+from great_expectations.core.batch import RuntimeBatchRequest
+from sqlalchemy import event, text
+from config.settings import settings
+from etl.load import DataLoader
+from etl.utils import DatabaseConnection, get_engine
+from ge_runner.add_expectation import add_new_expectation
+from ge_runner.batched_validation import BatchedSuiteValidator
+from ge_runner.run_validation import GreatExpectationsRunner
+
+SNAPSHOT = date(1900, 1, 2)
+
+
+@pytest.fixture(scope="module")
+def runner():
+    return GreatExpectationsRunner()
+
+
+@pytest.fixture
+def snapshot_rows():
+    """Snapshot isolé avec des fautes : âge hors bornes, valeurs nulles"""
+    rows = pd.DataFrame({
+        'snapshot_date': pd.to_datetime([SNAPSHOT] * 4),
+        'id': pd.array([1, 2, 3, 4], dtype='int32'),
+        'datenaissance': pd.to_datetime(['1850-01-01', '1880-01-01', None, '1890-01-01']),
+        'age': pd.array([50, 160, pd.NA, 10], dtype='Int16'),
+    })
+
+    def clear():
+        with DatabaseConnection() as conn:
+            conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = :s"), {'s': SNAPSHOT})
+            conn.commit()
+
+    clear()
+    DataLoader().load_data(rows)
+    yield rows
+    clear()
+
+
+def summarize(results):
+    """{(type, kwargs): (success, observed_value, unexpected_count)} pour comparer deux exécutions"""
+    summary = {}
+    for item in results:
+        config, result = item['expectation_config'], item['result']
+        kwargs = {k: v for k, v in dict(config['kwargs']).items() if k != 'batch_id'}
+        key = (config['expectation_type'], json.dumps(kwargs, sort_keys=True))
+        summary[key] = (item['success'], result.get('observed_value'), result.get('unexpected_count'))
+    return summary
+
+
+def test_batched_validation_matches_great_expectations(runner, snapshot_rows):
+    batch_request = RuntimeBatchRequest(
+        datasource_name="postgres_datasource",
+        data_connector_name="default_runtime_data_connector",
+        data_asset_name=settings.etl.target_results_for_ge,
+        runtime_parameters={"query": f"SELECT * FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = '{SNAPSHOT}'"},
+        batch_identifiers={"default_identifier_name": "batched_parity"},
+    )
+    validator = runner.context.get_validator(batch_request=batch_request, expectation_suite_name="target_results_suite")
+    expected = summarize(validator.validate().to_json_dict()['results'])
+
+    batched = runner.run_batched_validation(snapshot_date=str(SNAPSHOT))
+    actual = summarize(batched['results'])
+
+    # Le moteur SQL de GE 0.18 n'a pas de métrique dateutil_parseable (l'expectation lève une exception)
+    dateutil = [key for key in expected if key[0] == 'expect_column_values_to_be_dateutil_parseable']
+    for key in dateutil:
+        assert actual.pop(key)[0] is True
+        expected.pop(key)
+    assert actual == expected
+    assert not batched['success']
+
+
+def test_unsupported_expectation_is_rejected_with_its_type():
+    suite = {'expectations': [{'expectation_type': 'expect_column_mean_to_be_between', 'kwargs': {'column': 'age'}}]}
+    with pytest.raises(ValueError, match='expect_column_mean_to_be_between'):
+        BatchedSuiteValidator(suite)
+
+def test_frame_metrics_match_table_metrics(runner, snapshot_rows):
+    from_table = runner.run_batched_validation(snapshot_date=str(SNAPSHOT))
+    from_frame = runner.run_batched_validation(data=snapshot_rows)
+
+    strip_types = lambda results: {k: v for k, v in summarize(results).items() if 'of_type' not in k[0]}
+    assert strip_types(from_frame['results']) == strip_types(from_table['results'])
+    assert from_frame['statistics'] == from_table['statistics']
+
+
+def test_in_memory_checkpoint_does_not_query_the_table(isolated_runner, snapshot_rows):
+    good = snapshot_rows.assign(datenaissance=pd.to_datetime(['1850-01-01'] * 4),
+                                age=pd.Series([50, 60, 70, 10], dtype='int16'))
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    engine = get_engine()
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert isolated_runner.run_programmatic_checkpoint(str(SNAPSHOT), batch_data=good, update_docs=False)
+        assert not isolated_runner.run_programmatic_checkpoint(str(SNAPSHOT), batch_data=snapshot_rows, update_docs=False)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert not [s for s in statements if settings.etl.target_results_for_ge in s]
+
+
+def test_sampled_validation_keeps_exact_checks_and_reports_confidence(runner):
+    rows = 2000
+    frame = pd.DataFrame({
+        'snapshot_date': pd.to_datetime([SNAPSHOT] * rows),
+        'id': pd.array(range(1, rows + 1), dtype='int32'),
+        'datenaissance': pd.to_datetime(['1900-01-01'] * rows),
+        'age': pd.Series([200 if i % 50 == 0 else 30 for i in range(rows)], dtype='int16'),
+    })
+    with DatabaseConnection() as conn:
+        conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = :s"), {'s': SNAPSHOT})
+        conn.commit()
+    DataLoader().load_data(frame)
+    try:
+        first = runner.run_batched_validation(snapshot_date=str(SNAPSHOT), sample_percent=50)
+        second = runner.run_batched_validation(snapshot_date=str(SNAPSHOT), sample_percent=50)
+    finally:
+        with DatabaseConnection() as conn:
+            conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = :s"), {'s': SNAPSHOT})
+            conn.commit()
+
+    # Même graine, même échantillon
+    assert summarize(first['results']) == summarize(second['results'])
+    assert first['sampling']['row_count'] == rows
+    assert 0 < first['sampling']['sample_row_count'] < rows
+
+    by_type = {item['expectation_config']['expectation_type']: item for item in first['results']}
+    assert by_type['expect_table_row_count_to_be_between']['result']['observed_value'] == rows
+    assert by_type['expect_compound_columns_to_be_unique']['result']['element_count'] == rows
+    assert 'sampling' not in by_type['expect_compound_columns_to_be_unique']['result']
+
+    between = by_type['expect_column_values_to_be_between']
+    low, high = between['result']['sampling']['unexpected_percent_interval']
+    assert not between['success']
+    assert low <= 2.0 <= high
+
+
+def test_add_expectation_rejects_a_non_iso_snapshot_date(capsys):
+    # Refusée avant tout accès au contexte ou à la base
+    with pytest.raises(SystemExit):
+        add_new_expectation("2025-01-01' OR '1'='1")
+    assert "Date de snapshot invalide" in capsys.readouterr().out
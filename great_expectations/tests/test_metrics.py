@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from config.settings import PoolConfig, settings
+from etl.metrics import MetricsRecorder
+from etl.utils import DatabaseConnection, create_pooled_engine
+
+
+def test_recorder_sums_batches_and_exports(tmp_path):
+    """Les lots d'une même étape s'additionnent ; l'export écrit le .prom et le JSON du run"""
+    recorder = MetricsRecorder(pipeline="test")
+    for _ in range(3):
+        with recorder.track('load') as stage:
+            stage.rows += 10
+
+    [load] = recorder.summary(success=True)['stages']
+    assert (load['calls'], load['rows']) == (3, 30)
+
+    recorder.export(str(tmp_path), success=False)
+    prom = (tmp_path / "etl_test.prom").read_text()
+    assert 'etl_stage_rows{pipeline="test",stage="load"} 30' in prom
+    assert 'etl_run_success{pipeline="test"} 0' in prom
+    assert len(list(tmp_path.glob("run_test_*.json"))) == 1
+
+
+def test_shared_pool_applies_settings_and_exports_counters():
+    recorder = MetricsRecorder(pipeline="test")
+    with DatabaseConnection() as conn:
+        assert conn.execute(text("SHOW application_name")).scalar() == settings.db.pool.application_name
+
+    prom = recorder.to_prometheus(success=True)
+    assert 'etl_db_pool_checkouts{pipeline="test"} 1' in prom
+    assert recorder.summary(success=True)['pool']['checked_out'] == 0
+
+
+def test_pool_statement_timeout_cancels_long_queries():
+    engine = create_pooled_engine(pool=PoolConfig(statement_timeout_ms=50))
+    try:
+        with engine.connect() as conn, pytest.raises(OperationalError, match="statement timeout"):
+            conn.execute(text("SELECT pg_sleep(1)"))
+    finally:
+        engine.dispose()
+
+
+def test_only_read_connections_use_server_side_cursors():
+    # Un curseur serveur au niveau de l'engine enroberait la DDL dans DECLARE ... CURSOR
+    with DatabaseConnection() as conn:
+        assert not conn.get_execution_options().get('stream_results')
+        conn.execute(text("CREATE TEMP TABLE pool_cursor_check (id int)"))
+    with DatabaseConnection(stream_results=True) as conn:
+        assert conn.execute(text("SELECT generate_series(1, 3)")).scalars().all() == [1, 2, 3]
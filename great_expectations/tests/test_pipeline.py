@@ -0,0 +1,322 @@
+import sys
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import event, text
+from config.settings import settings
+from etl.utils import DatabaseConnection, calculate_age, get_engine
+from etl.transform import DataTransformer
+import main
+from main import ETLPipeline
+
+
+@pytest.fixture
+def executed_queries():
+    """Enregistre toutes les requêtes SQL envoyées par le moteur pendant le test"""
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    event.listen(get_engine(), "before_cursor_execute", record)
+    yield queries
+    event.remove(get_engine(), "before_cursor_execute", record)
+
+
+def count_rows(table):
+    with DatabaseConnection() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+@pytest.fixture
+def empty_results_table():
+    with DatabaseConnection() as conn:
+        conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge}"))
+        conn.commit()
+
+
+def test_run_etl_extracts_each_table_once(empty_results_table, executed_queries):
+    pipeline = ETLPipeline()
+
+    assert pipeline.run_etl()
+
+    source_queries = [q for q in executed_queries if f"FROM {settings.etl.source_table}" in q]
+    target_queries = [q for q in executed_queries if f"FROM {settings.etl.target_table}" in q]
+    assert len(source_queries) == 1
+    assert len(target_queries) == 1
+    assert set(pipeline.stage_results) == {'extract_source', 'extract_target', 'transform', 'validate', 'load'}
+
+
+def test_upsert_load_is_idempotent(empty_results_table):
+    for _ in range(2):
+        assert ETLPipeline(upsert=True).run_etl()
+        assert ETLPipeline(mode="sql", upsert=True).run_etl()
+
+    with DatabaseConnection() as conn:
+        total, distinct = conn.execute(text(
+            f"SELECT COUNT(*), COUNT(DISTINCT (snapshot_date, id)) FROM {settings.etl.target_results_for_ge}"
+        )).one()
+    assert total == distinct > 0
+
+
+def test_upsert_keeps_the_last_row_of_a_duplicated_key(empty_results_table):
+    from etl.load import DataLoader
+    rows = pd.DataFrame({
+        'snapshot_date': pd.to_datetime([date(1900, 1, 3)] * 2),
+        'id': pd.array([1, 1], dtype='int32'),
+        'datenaissance': pd.to_datetime(['1850-01-01'] * 2),
+        'age': pd.array([49, 50], dtype='int16'),
+    })
+    assert DataLoader(upsert=True).load_data(rows)
+
+    with DatabaseConnection() as conn:
+        ages = conn.execute(text(f"SELECT age FROM {settings.etl.target_results_for_ge}")).scalars().all()
+    assert ages == [50]
+
+def test_parallel_run_reports_and_retries_failed_partitions(empty_results_table):
+    assert ETLPipeline(workers=2).run_etl()
+
+    # Second run sans upsert : chaque partition heurte la clé primaire
+    pipeline = ETLPipeline(workers=2)
+    assert not pipeline.run_etl()
+    assert len(pipeline.failed_partitions) == 2
+
+    pipeline.upsert = True
+    assert pipeline.retry_failed_partitions()
+    assert pipeline.failed_partitions == []
+
+
+def test_pushdown_validates_only_the_snapshots_it_loaded(empty_results_table):
+    # Résultat fautif d'un autre snapshot, déjà en base : il ne concerne pas ce run
+    with DatabaseConnection() as conn:
+        conn.execute(text(f"INSERT INTO {settings.etl.target_results_for_ge} (snapshot_date, id, age) "
+                          "VALUES ('1900-01-01', 1, -1)"))
+        conn.commit()
+
+    pipeline = ETLPipeline(mode="sql", upsert=True)
+    assert pipeline.run_etl()
+
+    snapshots = pipeline.transformer.loaded_snapshots
+    assert date(1900, 1, 1) not in snapshots and pipeline.loaded_snapshot == max(snapshots)
+    assert pipeline.transformer.validation_report.rows == count_rows(settings.etl.target_results_for_ge) - 1
+
+@pytest.fixture
+def new_person():
+    """Ajoute une personne (source + target) après coup, supprimée en fin de test"""
+    def insert():
+        with DatabaseConnection() as conn:
+            conn.execute(text(f"INSERT INTO {settings.etl.source_table} (id, datenaissance) VALUES (99999, '2000-01-01')"))
+            conn.execute(text(f"INSERT INTO {settings.etl.target_table} (snapshot_date, id) VALUES ('2025-01-01', 99999)"))
+            conn.commit()
+    yield insert
+    with DatabaseConnection() as conn:
+        for table in (settings.etl.target_table, settings.etl.source_table, settings.etl.target_results_for_ge):
+            conn.execute(text(f"DELETE FROM {table} WHERE id = 99999"))
+        conn.commit()
+
+
+def test_incremental_run_processes_only_the_delta(empty_results_table, new_person, monkeypatch):
+    from etl.watermark import WatermarkStore
+    # Lignes insérées à l'instant : sans délai, elles sont dans le delta
+    monkeypatch.setattr(settings.etl, 'incremental_lag_seconds', 0)
+    store = WatermarkStore()
+    store.ensure_table()
+    store.reset()
+
+    def marks():
+        return {table: store.get(table) for table in (settings.etl.source_table, settings.etl.target_table)}
+
+    # Sans marque : tout est traité, puis le run suivant n'a rien à recalculer
+    assert ETLPipeline(incremental=True).run_etl()
+    pipeline = ETLPipeline(incremental=True)
+    source, target, _ = pipeline.extractor.extract_incremental(marks())
+    assert source.empty and target.empty
+
+    new_person()
+    source, target, _ = pipeline.extractor.extract_incremental(marks())
+    assert target['id'].tolist() == [99999]
+    assert pipeline.run_etl()
+
+    with DatabaseConnection() as conn:
+        age = conn.execute(text(
+            f"SELECT age FROM {settings.etl.target_results_for_ge} WHERE id = 99999"
+        )).scalar()
+    assert age == 25
+
+
+def test_incremental_upper_bound_leaves_recent_rows_for_the_next_run(new_person):
+    extractor = ETLPipeline().extractor
+    _, _, marks = extractor.extract_incremental({}, lag_seconds=0)
+    new_person()
+
+    # Ligne plus récente que le délai : elle pourrait suivre une transaction encore ouverte
+    _, target, lagged = extractor.extract_incremental(marks, lag_seconds=3600)
+    assert 99999 not in target['id'].tolist()
+    assert all(lagged[table] <= marks[table] for table in marks)
+
+    _, target, _ = extractor.extract_incremental(lagged, lag_seconds=0)
+    assert 99999 in target['id'].tolist()
+
+
+def test_backfill_resumes_after_completed_dates(empty_results_table):
+    pipeline = ETLPipeline(snapshot_range=(date(2024, 2, 27), date(2024, 3, 1)))
+    # Simule un backfill interrompu après le premier jour
+    pipeline.loader.load_data(next(pipeline.transformer.transform_snapshots(
+        pipeline.extractor.extract_source_data(), pipeline.extractor.extract_target_ids(), [date(2024, 2, 27)]))[1])
+
+    assert pipeline.run_etl()
+    assert pipeline.completed_dates == [date(2024, 2, 27), date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1)]
+
+    with DatabaseConnection() as conn:
+        backfilled = pd.read_sql_query(text(f"SELECT * FROM {settings.etl.target_results_for_ge}"), conn)
+    expected = [calculate_age(birth, snapshot) for birth, snapshot in
+                zip(backfilled['datenaissance'], backfilled['snapshot_date'])]
+    assert backfilled['age'].tolist() == expected
+    assert len(backfilled) == 4 * len(pipeline.extractor.extract_target_ids())
+
+
+@pytest.fixture
+def unmatched_people():
+    """Un id target sans ligne source et un id source absent de la target"""
+    with DatabaseConnection() as conn:
+        conn.execute(text(f"INSERT INTO {settings.etl.source_table} (id, datenaissance) VALUES (99997, '2000-01-01')"))
+        conn.execute(text(f"INSERT INTO {settings.etl.target_table} (snapshot_date, id) VALUES ('2025-07-16', 99998)"))
+        conn.commit()
+    yield
+    with DatabaseConnection() as conn:
+        for table in (settings.etl.target_table, settings.etl.source_table, settings.etl.target_results_for_ge):
+            conn.execute(text(f"DELETE FROM {table} WHERE id IN (99997, 99998)"))
+        conn.commit()
+
+
+def read_results(snapshot_date):
+    with DatabaseConnection() as conn:
+        return pd.read_sql_query(text(
+            f"SELECT * FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = :d ORDER BY id"
+        ), conn, params={'d': snapshot_date})
+
+
+def test_backfilled_snapshot_matches_a_normal_run(empty_results_table, unmatched_people):
+    snapshot = date(2025, 7, 16)
+    assert ETLPipeline().run_etl()
+    expected = read_results(snapshot)
+    assert 99998 in expected['id'].tolist() and 99997 not in expected['id'].tolist()
+
+    for workers in (1, 2):
+        with DatabaseConnection() as conn:
+            conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge}"))
+            conn.commit()
+        # Sur deux processus, les dates sont réparties sur le pool de l'ETL parallèle
+        pipeline = ETLPipeline(snapshot_range=(snapshot - timedelta(days=2), snapshot), workers=workers)
+        assert pipeline.run_etl()
+        assert pipeline.completed_dates == [snapshot - timedelta(days=2), snapshot - timedelta(days=1), snapshot]
+        pd.testing.assert_frame_equal(read_results(snapshot), expected)
+
+
+def test_overlapped_run_matches_sequential_run(empty_results_table):
+    assert ETLPipeline(overlap=True, batch_size=4).run_etl()
+
+    assert count_rows(settings.etl.target_results_for_ge) == count_rows(settings.etl.target_table)
+
+
+def test_overlapped_run_rolls_back_when_a_stage_fails(empty_results_table, monkeypatch):
+    pipeline = ETLPipeline(overlap=True, batch_size=4)
+    calls = []
+
+    def failing_transform(source, target):
+        calls.append(len(target))
+        if len(calls) == 3:
+            raise RuntimeError("échec simulé")
+        return DataTransformer.transform_frames(pipeline.transformer, source, target)
+
+    monkeypatch.setattr(pipeline.transformer, 'transform_frames', failing_transform)
+    assert not pipeline.run_etl()
+
+    # Les lots déjà chargés sont annulés avec la transaction
+    assert count_rows(settings.etl.target_results_for_ge) == 0
+    assert not [t for t in threading.enumerate() if t.name.startswith('etl-')]
+
+def test_async_run_matches_sequential_run(empty_results_table):
+    pytest.importorskip("asyncpg")
+    with DatabaseConnection() as conn:
+        assert ETLPipeline().run_etl()
+        expected = pd.read_sql_query(text(f"SELECT * FROM {settings.etl.target_results_for_ge} ORDER BY snapshot_date, id"), conn)
+        conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge}"))
+        conn.commit()
+
+    assert ETLPipeline(use_async=True, workers=3).run_etl()
+    # Relance idempotente : les partitions fusionnent sur (snapshot_date, id)
+    assert ETLPipeline(use_async=True, workers=3, upsert=True).run_etl()
+
+    with DatabaseConnection() as conn:
+        loaded = pd.read_sql_query(text(f"SELECT * FROM {settings.etl.target_results_for_ge} ORDER BY snapshot_date, id"), conn)
+    pd.testing.assert_frame_equal(loaded, expected)
+
+
+def test_default_run_validates_the_snapshot_it_loaded(empty_results_table, isolated_runner):
+    pipeline = ETLPipeline(upsert=True)
+    pipeline.ge_runner = isolated_runner
+    assert pipeline.run_etl()
+    snapshots = pipeline.stage_results['transform']['snapshot_date']
+    loaded = snapshots.max().date()
+    assert loaded != date.today()
+
+    store = isolated_runner.context.validations_store
+    existing = set(store.list_keys())
+    # Sans --snapshot-date : le snapshot chargé par le run, pas celui du jour (vide)
+    pipeline.run_great_expectations_validation()
+
+    keys = [key for key in set(store.list_keys()) - existing]
+    assert len(keys) == 1 and keys[0].run_id.run_name.endswith(f"{loaded:%Y%m%d}")
+    row_count = next(item for item in store.get(keys[0]).results
+                     if item.expectation_config.expectation_type == 'expect_table_row_count_to_be_between')
+    assert row_count.result['observed_value'] == (snapshots == snapshots.max()).sum() > 0
+
+
+
+def test_memory_validation_checks_only_the_snapshot_with_the_reduced_suite(isolated_runner):
+    day, previous = date(1900, 1, 2), date(1900, 1, 1)
+    frame = pd.DataFrame({
+        'snapshot_date': pd.to_datetime([day, day, previous]),
+        'id': pd.array([1, 2, 3], dtype='int32'),
+        'datenaissance': pd.to_datetime(['1850-01-01'] * 3),
+        # Ligne hors bornes dans un autre snapshot : elle ne doit pas être validée
+        'age': pd.array([50, 50, 500], dtype='int16'),
+    })
+    pipeline = ETLPipeline(snapshot_date=day, validation="memory")
+    pipeline.ge_runner = isolated_runner
+    pipeline.stage_results['transform'] = frame
+
+    store = isolated_runner.context.validations_store
+    existing = set(store.list_keys())
+    assert pipeline.run_great_expectations_validation()
+
+    keys = [key for key in set(store.list_keys()) - existing]
+    assert len(keys) == 1
+    assert keys[0].expectation_suite_identifier.expectation_suite_name == "target_results_suite.in_memory"
+    row_count = next(item for item in store.get(keys[0]).results
+                     if item.expectation_config.expectation_type == 'expect_table_row_count_to_be_between')
+    assert row_count.result['observed_value'] == 2
+
+@pytest.mark.parametrize("options", [
+    ["--streaming", "--overlap"],
+    ["--mode", "sql", "--incremental"],
+    ["--streaming", "--workers", "4"],
+    ["--overlap", "--workers", "2"],
+    ["--batch-size", "100"],
+    ["--validate-chunks"],
+    ["--memory-budget-mb", "64", "--streaming"],
+    ["--snapshot-date", "2025-01-01", "--snapshot-date-range", "2024-01-01", "2024-01-31"],
+    ["--sample-percent", "10"],
+    ["--etl-only", "--validate-only"],
+])
+def test_incompatible_options_are_rejected(options, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["main.py", *options])
+
+    with pytest.raises(SystemExit) as exc_info:
+        main.main()
+
+    assert exc_info.value.code == 2
+    assert "--" in capsys.readouterr().err
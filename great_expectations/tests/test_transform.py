@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from config.settings import settings
+from etl.transform import DataTransformer
+from etl.utils import DatabaseConnection, birthday_window_sql, calculate_age, sorted_left_join
+
+
+@pytest.fixture
+def transformer():
+    return DataTransformer()
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[['snapshot_date', 'id', 'datenaissance', 'age']].copy()
+    df['snapshot_date'] = pd.to_datetime(df['snapshot_date'])
+    df['datenaissance'] = pd.to_datetime(df['datenaissance'])
+    df['id'] = df['id'].astype('int64')
+    df['age'] = df['age'].astype('int64')
+    return df.sort_values(['snapshot_date', 'id']).reset_index(drop=True)
+
+
+def test_pushdown_matches_pandas_transform(transformer):
+    """Le mode push-down SQL doit produire exactement le résultat du chemin pandas"""
+    pandas_df = transformer.transform_data()
+    with DatabaseConnection() as conn:
+        sql_df = pd.read_sql_query(transformer.build_pushdown_query(), conn)
+
+    assert not pandas_df.empty
+    pd.testing.assert_frame_equal(_normalize(sql_df), _normalize(pandas_df))
+
+
+@pytest.mark.parametrize("previous, new", [
+    ("2025-01-01", "2025-07-16"),
+    ("2024-02-28", "2024-02-29"),
+    ("2024-02-29", "2024-03-01"),
+    ("2025-02-28", "2025-03-01"),
+    ("2024-12-20", "2025-01-10"),
+    ("2024-03-01", "2025-02-28"),
+    ("2024-02-29", "2025-02-28"),
+])
+def test_birthday_window_matches_age_changes(previous, new):
+    """Le prédicat de fenêtre sélectionne exactement les naissances dont l'âge change"""
+    previous, new = date.fromisoformat(previous), date.fromisoformat(new)
+    births = [date(1999, 12, 1) + timedelta(days=i) for i in range(500)]
+    expected = {b for b in births if calculate_age(b, previous) != calculate_age(b, new)}
+
+    with DatabaseConnection() as conn:
+        selected = conn.execute(text(f"""
+            SELECT b::date FROM generate_series(DATE '1999-12-01', DATE '1999-12-01' + 499, '1 day') AS b
+            WHERE {birthday_window_sql('b', previous, new)}
+        """)).scalars().all()
+    assert set(selected) == expected
+
+
+def test_refresh_snapshot_matches_full_recompute(transformer):
+    """Le snapshot dérivé du précédent est identique à un recalcul complet"""
+    results_table = settings.etl.target_results_for_ge
+    with DatabaseConnection() as conn:
+        conn.execute(text(f"DELETE FROM {results_table}"))
+        conn.execute(text(f"""
+            INSERT INTO {results_table} (snapshot_date, id, datenaissance, age)
+            {transformer.build_pushdown_query()} WHERE t.snapshot_date = '2025-01-01'
+        """))
+        conn.commit()
+
+    assert transformer.refresh_snapshot(date(2025, 1, 1), date(2025, 7, 16)) > 0
+
+    with DatabaseConnection() as conn:
+        refreshed = pd.read_sql_query(
+            text(f"SELECT * FROM {results_table} WHERE snapshot_date = '2025-07-16'"), conn)
+        expected = pd.read_sql_query(
+            text(f"{transformer.build_pushdown_query()} WHERE t.snapshot_date = '2025-07-16'"), conn)
+        conn.execute(text(f"DELETE FROM {results_table}"))
+        conn.commit()
+    pd.testing.assert_frame_equal(_normalize(refreshed), _normalize(expected))
+
+
+def test_sorted_left_join_matches_merge():
+    """Même résultat que merge(how='left'), y compris pour les id absents de la source"""
+    rng = np.random.default_rng(0)
+    source = pd.DataFrame({
+        'id': np.arange(0, 2000, 2, dtype='int32'),
+        'datenaissance': pd.to_datetime('1990-01-01') + pd.to_timedelta(rng.integers(0, 9000, 1000), unit='D'),
+    })
+    target = pd.DataFrame({
+        'snapshot_date': pd.Timestamp('2025-01-01'),
+        'id': rng.integers(-5, 2100, 5000).astype('int32'),
+        'age': pd.array([pd.NA] * 5000, dtype='Int16'),
+    }, index=np.arange(5000) * 3)
+
+    for right in (source, source.iloc[:0], source.assign(rank=np.arange(len(source)))):
+        pd.testing.assert_frame_equal(sorted_left_join(target, right, 'id'), target.merge(right, on='id', how='left'))
+
+    # Source non triée : l'appelant doit se rabattre sur merge
+    assert sorted_left_join(target, source.iloc[::-1], 'id') is None
+
+
+def test_out_of_core_matches_in_memory_transform(transformer, monkeypatch, tmp_path):
+    """Plusieurs partitions sur disque : même résultat qu'en mémoire, fichiers supprimés"""
+    monkeypatch.setattr('etl.transform.plan_partitions', lambda *args: 3)
+    partitions = list(transformer.transform_out_of_core(memory_budget_mb=1, spill_dir=str(tmp_path)))
+
+    assert len(partitions) == 3
+    pd.testing.assert_frame_equal(_normalize(pd.concat(partitions)), _normalize(transformer.transform_data()))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_out_of_core_cleans_spill_files_on_failure(transformer, monkeypatch, tmp_path):
+    monkeypatch.setattr('etl.transform.plan_partitions', lambda *args: 3)
+    monkeypatch.setattr(transformer, 'transform_frames', lambda *args: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        list(transformer.transform_out_of_core(memory_budget_mb=1, spill_dir=str(tmp_path)))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,68 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from config.settings import settings
+from etl.load import DataLoader
+from etl.utils import DatabaseConnection
+from etl.validation import validate_frame, validate_table
+
+SNAPSHOT = date(1900, 1, 1)
+
+
+@pytest.fixture
+def results():
+    """Résultats d'un snapshot isolé : un âge négatif, un âge > 150, une date de naissance nulle"""
+    return pd.DataFrame({
+        'snapshot_date': pd.to_datetime([SNAPSHOT] * 4),
+        'id': pd.array([1, 2, 3, 4], dtype='int32'),
+        'datenaissance': pd.to_datetime(['1850-01-01', '1950-01-01', None, '1990-01-01']),
+        'age': pd.array([-3, 160, pd.NA, 30], dtype='Int16'),
+    })
+
+
+def counts(report):
+    return {result.rule: result.failed for result in report.results}
+
+
+def test_frame_report_counts_and_samples_offenders(results):
+    duplicated = pd.concat([results, results.iloc[[3]]], ignore_index=True)
+    snapshot = duplicated.copy()
+
+    report = validate_frame(duplicated)
+
+    assert counts(report) == {'age_below_min': 1, 'age_above_max': 1, 'duplicate_keys': 1}
+    assert report.null_counts == {'snapshot_date': 0, 'id': 0, 'datenaissance': 1, 'age': 1}
+    assert [r.rule for r in report.errors] == ['age_below_min', 'duplicate_keys']
+    assert report.results[0].samples[0]['id'] == 1
+    assert not report.success
+    pd.testing.assert_frame_equal(duplicated, snapshot)
+
+
+def test_frame_report_flags_missing_columns(results):
+    report = validate_frame(results.drop(columns='age'))
+
+    assert report.missing_columns == ['age']
+    assert not report.success
+
+
+def test_table_report_matches_frame_report(results):
+    with DatabaseConnection() as conn:
+        conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = :s"), {'s': SNAPSHOT})
+        conn.commit()
+    DataLoader().load_data(results)
+    try:
+        with DatabaseConnection() as conn:
+            report = validate_table(conn, settings.etl.target_results_for_ge,
+                                    where="snapshot_date = :snapshot_date", params={'snapshot_date': SNAPSHOT})
+    finally:
+        with DatabaseConnection() as conn:
+            conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = :s"), {'s': SNAPSHOT})
+            conn.commit()
+
+    expected = validate_frame(results)
+    assert report.rows == 4
+    assert counts(report) == counts(expected)
+    assert report.null_counts == expected.null_counts
+    assert report.results[1].samples[0]['id'] == 2
@@ -0,0 +1,95 @@
+import os
+import threading
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from config.settings import settings
+from etl.load import DataLoader
+from etl.utils import DatabaseConnection
+from ge_runner.worker import ValidationClient, ValidationServer, ValidationWorker
+
+SNAPSHOT = date(1900, 1, 3)
+
+
+@pytest.fixture(scope="module")
+def worker():
+    return ValidationWorker()
+
+
+@pytest.fixture
+def client(worker):
+    """Service démarré sur un port libre, arrêté par la requête shutdown"""
+    server = ValidationServer(worker, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = ValidationClient(*server.server_address, timeout=60)
+    yield client
+    client.shutdown()
+    thread.join(timeout=10)
+    server.server_close()
+    assert not thread.is_alive()
+
+
+@pytest.fixture
+def rows():
+    frame = pd.DataFrame({
+        'snapshot_date': pd.to_datetime([SNAPSHOT] * 3),
+        'id': pd.array([1, 2, 3], dtype='int32'),
+        'datenaissance': pd.to_datetime(['1850-01-01', '1860-01-01', '1870-01-01']),
+        'age': pd.array([50, 40, -1], dtype='Int16'),
+    })
+
+    def clear():
+        with DatabaseConnection() as conn:
+            conn.execute(text(f"DELETE FROM {settings.etl.target_results_for_ge} WHERE snapshot_date = :s"), {'s': SNAPSHOT})
+            conn.commit()
+
+    clear()
+    DataLoader().load_data(frame)
+    yield frame
+    clear()
+
+
+def test_worker_validates_table_snapshots_and_files(client, rows, tmp_path):
+    jobs = client.ping()['jobs']
+
+    from_table = client.validate(snapshot_date=str(SNAPSHOT))
+    path = str(tmp_path / "rows.csv")
+    rows.to_csv(path, index=False)
+    from_file = client.validate(file=path)
+
+    assert not from_table['success'] and not from_file['success']
+    failed = lambda response: {item['expectation_config']['expectation_type']
+                               for item in response['result']['results'] if not item['success']}
+    assert failed(from_table) == failed(from_file) == {'expect_column_values_to_be_between'}
+    assert from_table['result']['statistics']['evaluated_expectations'] == 10
+    assert client.ping()['jobs'] == jobs + 2
+
+
+def test_worker_rejects_unknown_tables(client):
+    with pytest.raises(RuntimeError, match="Table inconnue"):
+        client.validate(table="target_results_for_ge; DROP TABLE source_table")
+    assert client.ping()['ok']
+
+
+def test_worker_rejects_invalid_snapshot_dates(client):
+    for snapshot_date in ("2025-01-01' OR '1'='1", "01/01/2025", 20250101):
+        with pytest.raises(RuntimeError, match="Date de snapshot invalide"):
+            client.validate(mode="checkpoint", snapshot_date=snapshot_date)
+    assert client.ping()['ok']
+
+
+def test_suite_is_compiled_once_and_reloaded_when_changed(worker):
+    runner = worker.runner
+    compiled = runner.compiled_suite()
+    assert runner.compiled_suite() is compiled
+
+    path = os.path.join(runner.context_root_dir, "expectations", "target_results_suite.json")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    try:
+        assert runner.compiled_suite() is not compiled
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
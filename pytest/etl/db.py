@@ -0,0 +1,98 @@
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from config.settings import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE,
+    DB_STATEMENT_TIMEOUT_MS, DB_APPLICATION_NAME, DB_MAX_ROW_BUFFER,
+)
+
+# Engine partagé par le pipeline et les tests, créé au premier usage
+_engine = None
+
+
+# Même classe que great_expectations/etl/utils.py : les deux projets restent installables et exécutables
+# séparément (chacun son paquet `etl` et ses requirements), une correction se reporte dans les deux.
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool qui mesure l'attente au checkout et compte les connexions physiques ouvertes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.checkouts = 0
+        self.connections_opened = 0
+        self.checkout_wait_seconds = 0.0
+        self.max_checkout_wait_seconds = 0.0
+
+    def connect(self):
+        # Inclut l'attente d'une connexion libre et, si besoin, l'ouverture d'une nouvelle connexion
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.checkout_wait_seconds += waited
+                self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, waited)
+
+    def _create_connection(self):
+        with self._stats_lock:
+            self.connections_opened += 1
+        return super()._create_connection()
+
+    def stats(self):
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": max(0, self.overflow()),
+            "checkouts": self.checkouts,
+            "connections_opened": self.connections_opened,
+            "checkout_wait_seconds": self.checkout_wait_seconds,
+            "max_checkout_wait_seconds": self.max_checkout_wait_seconds,
+        }
+
+
+def create_pooled_engine(database_url=DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                         statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS):
+    """Engine SQLAlchemy configuré par les paramètres DB_* de config/settings.py."""
+    connect_args = {"application_name": DB_APPLICATION_NAME}
+    if statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    return create_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args=connect_args,
+        # Pas de stream_results au niveau de l'engine : psycopg2 enroberait aussi les écritures et la DDL
+        # dans DECLARE ... CURSOR. Les lectures par lots l'activent sur leur connexion (extract_data_chunks)
+        execution_options={"max_row_buffer": DB_MAX_ROW_BUFFER},
+    )
+
+
+def get_engine():
+    """Retourne l'engine partagé, en le créant au premier appel."""
+    global _engine
+    if _engine is None:
+        _engine = create_pooled_engine()
+    return _engine
+
+
+def pool_stats():
+    """Compteurs du pool partagé (None tant qu'aucun engine n'a été créé)."""
+    if _engine is None:
+        return None
+    return _engine.pool.stats()
+
+
+def reset_pool_stats():
+    if _engine is not None:
+        _engine.pool.reset_stats()
@@ -1,17 +1,112 @@
 import logging
+from datetime import datetime
 import pandas as pd
+from sqlalchemy import text
+from config.settings import INCREMENTAL_LAG_SECONDS
+from etl.metrics import frame_bytes, track
 
 logger = logging.getLogger(__name__)
 
-def extract_data(engine):
+# Schéma explicite des tables extraites : dates typées dès la lecture, entiers compacts
+SCHEMAS = {
+    "source_table": {"parse_dates": ["datenaissance", "created_at"], "dtype": {"id": "int32"}},
+    "target_table": {"parse_dates": ["snapshot_date", "datenaissance", "created_at"],
+                     "dtype": {"id": "int32", "age": "Int16"}},
+}
+
+
+def read_table(sql, con, table, params=None, **kwargs):
+    """`pd.read_sql` avec le schéma de `table` (voir SCHEMAS)."""
+    return pd.read_sql(sql, con=con, params=params, **SCHEMAS[table], **kwargs)
+
+def extract_data(engine, id_range=None):
     try:
         logger.info("Lancement de l'extraction des données...")
-        # Extraction des données de la table source
-        bd_source = pd.read_sql("SELECT * FROM source_table", con=engine)
-        bd_target = pd.read_sql("SELECT * FROM target_table", con=engine)
+        # Extraction des données de la table source (éventuellement limitée à une plage d'id)
+        where, params = "", None
+        if id_range:
+            where = " WHERE id BETWEEN :id_min AND :id_max"
+            params = {"id_min": int(id_range[0]), "id_max": int(id_range[1])}
+        with track("extract_source") as stage:
+            bd_source = read_table(text("SELECT * FROM source_table" + where + " ORDER BY id"), engine, "source_table", params)
+            stage.update(rows=len(bd_source), bytes=frame_bytes(bd_source))
+        with track("extract_target") as stage:
+            bd_target = read_table(text("SELECT * FROM target_table" + where), engine, "target_table", params)
+            stage.update(rows=len(bd_target), bytes=frame_bytes(bd_target))
         logger.info(f"{len(bd_source)} lignes extraites pour bd_source.")
         logger.info(f"{len(bd_target)} lignes extraites pour bd_target.")
         return bd_source, bd_target
     except Exception as e:
         logger.error(f"Erreur lors de l'extraction : {e}")
         return pd.DataFrame()  # retourne un DataFrame vide si erreur
+
+
+def extract_incremental(engine, since, lag_seconds=INCREMENTAL_LAG_SECONDS):
+    """
+    Extrait le delta depuis les marques `since` ({table: created_at}) : lignes target
+    ajoutées depuis la marque ou dont l'id source est nouveau, et lignes source
+    nécessaires à leur calcul. Retourne (bd_source, bd_target, nouvelles marques) ;
+    les bornes hautes sont figées avant la lecture, à `lag_seconds` derrière l'horloge
+    du serveur : created_at est le début de la transaction d'insertion, une ligne encore
+    non validée peut apparaître plus tard sous MAX(created_at).
+    """
+    logger.info("Lancement de l'extraction incrémentale...")
+    with engine.connect() as conn:
+        upper = {
+            table: conn.execute(text(
+                f"SELECT LEAST(MAX(created_at), LOCALTIMESTAMP - make_interval(secs => :lag)) FROM {table}"
+            ), {"lag": lag_seconds}).scalar()
+            for table in ("source_table", "target_table")
+        }
+    params = {
+        "source_since": since.get("source_table") or datetime.min,
+        "source_upper": upper["source_table"] or datetime.min,
+        "target_since": since.get("target_table") or datetime.min,
+        "target_upper": upper["target_table"] or datetime.min,
+    }
+    new_source_ids = ("SELECT id FROM source_table "
+                      "WHERE created_at > :source_since AND created_at <= :source_upper")
+    new_target_ids = ("SELECT id FROM target_table "
+                      "WHERE created_at > :target_since AND created_at <= :target_upper")
+
+    with track("extract_source") as stage:
+        bd_source = read_table(
+            text(f"SELECT * FROM source_table WHERE id IN ({new_source_ids}) OR id IN ({new_target_ids}) ORDER BY id"),
+            engine, "source_table", params,
+        )
+        stage.update(rows=len(bd_source), bytes=frame_bytes(bd_source))
+    with track("extract_target") as stage:
+        bd_target = read_table(
+            text("SELECT * FROM target_table "
+                 f"WHERE (created_at > :target_since AND created_at <= :target_upper) OR id IN ({new_source_ids})"),
+            engine, "target_table", params,
+        )
+        stage.update(rows=len(bd_target), bytes=frame_bytes(bd_target))
+    logger.info(f"{len(bd_source)} lignes source et {len(bd_target)} lignes target à recalculer.")
+    return bd_source, bd_target, upper
+
+
+def extract_data_chunks(engine, chunksize):
+    """
+    Extrait target_table par lots via un curseur côté serveur (triée par id) et
+    associe à chaque lot les lignes de source_table de la même plage d'id.
+    """
+    try:
+        logger.info(f"Lancement de l'extraction par lots de {chunksize} lignes...")
+        with engine.connect().execution_options(stream_results=True) as conn:
+            total = 0
+            for bd_target in read_table(
+                text("SELECT * FROM target_table ORDER BY id, snapshot_date"), conn, "target_table", chunksize=chunksize
+            ):
+                bd_source = read_table(
+                    text("SELECT * FROM source_table WHERE id BETWEEN :id_min AND :id_max ORDER BY id"),
+                    engine,
+                    "source_table",
+                    params={"id_min": int(bd_target["id"].min()), "id_max": int(bd_target["id"].max())},
+                )
+                total += len(bd_target)
+                yield bd_source, bd_target
+        logger.info(f"{total} lignes extraites par lots pour bd_target.")
+    except Exception as e:
+        logger.error(f"Erreur lors de l'extraction par lots : {e}")
+        raise
@@ -1,32 +1,154 @@
+import io
 import logging
+import time
 import pandas as pd
+from sqlalchemy import text
+from etl.metrics import track
+from etl.watermark import save_watermarks
 
 logger = logging.getLogger(__name__)
 
-import logging
-import pandas as pd
+TABLE_NAME = "target_results"
+KEY_COLUMNS = ("snapshot_date", "id")
 
-logger = logging.getLogger(__name__)
 
-def load_data(engine, transformed_df: pd.DataFrame):
+def load_data(engine, transformed_df: pd.DataFrame, use_copy: bool = True, upsert: bool = False, watermarks=None,
+              ensure_table: bool = True):
     """
     Insère les données transformées dans la table `target_results`
     même si certaines valeurs sont nulles ou anormales.
+
+    Sur PostgreSQL, les lignes sont chargées en masse via `COPY FROM STDIN` ;
+    `DataFrame.to_sql` reste utilisé pour les autres moteurs ou si `use_copy=False`.
+    Avec `upsert=True` (PostgreSQL), le chargement est idempotent : les lignes passent
+    par une table de staging puis sont fusionnées sur (snapshot_date, id).
+    Les marques hautes `watermarks` (extraction incrémentale, implique `upsert`) sont
+    enregistrées dans la transaction de la fusion.
+    Avec `ensure_table=False`, la table et son index doivent déjà exister (aucune DDL,
+    par ex. depuis les processus de l'ETL parallèle).
     """
-    logger.info("Début de l'insertion des données dans target_results...")
+    logger.info(f"Début de l'insertion des données dans {TABLE_NAME}...")
 
     if transformed_df.empty:
         logger.warning("Aucune donnée à insérer.")
+        if watermarks:
+            with engine.begin() as conn:
+                save_watermarks(conn, watermarks)
         return
 
     try:
-        transformed_df.to_sql(
-            name="target_results",
-            con=engine,
-            if_exists="append",
-            index=False
-        )
-        logger.info(f"{len(transformed_df)} lignes insérées dans target_results.")
+        start = time.perf_counter()
+        with track("load") as stage:
+            stage["rows"] = len(transformed_df)
+            if upsert or watermarks:
+                method = "UPSERT"
+                upsert_data(engine, transformed_df, TABLE_NAME, watermarks=watermarks, ensure_table=ensure_table)
+            elif use_copy and engine.dialect.name == "postgresql":
+                method = "COPY"
+                copy_data(engine, transformed_df, TABLE_NAME, ensure_table=ensure_table)
+            else:
+                method = "INSERT"
+                transformed_df.to_sql(
+                    name=TABLE_NAME,
+                    con=engine,
+                    if_exists="append",
+                    index=False
+                )
+        elapsed = time.perf_counter() - start
+        rate = len(transformed_df) / elapsed if elapsed > 0 else float("inf")
+        logger.info(f"{len(transformed_df)} lignes insérées dans {TABLE_NAME}.")
+        logger.info(f"Débit de chargement ({method}) : {rate:,.0f} lignes/s")
     except Exception as e:
         logger.error(f"Erreur lors de l'insertion : {e}")
         raise
+
+
+def copy_data(engine, df: pd.DataFrame, table_name: str, ensure_table: bool = True):
+    """
+    Charge un DataFrame dans `table_name` avec `COPY ... FROM STDIN` (CSV)
+    à partir d'un buffer mémoire, sans passer par des dictionnaires ligne à ligne.
+    """
+    if ensure_table:
+        create_table(engine, df, table_name)
+
+    with engine.begin() as conn:
+        _copy_into(conn, df, table_name)
+
+
+def create_table(engine, df: pd.DataFrame, table_name: str, key_columns=KEY_COLUMNS):
+    """
+    Crée la table avec le schéma de `to_sql` si elle n'existe pas encore, et un index
+    unique sur `key_columns` : contrôles par snapshot et fusion (`ON CONFLICT`) lisent
+    l'index plutôt que toute la table, et un second chargement d'une même clé échoue
+    au lieu de la dupliquer.
+
+    L'ancien index non unique (`<table>_key_idx`) est remplacé ; si la table contient
+    déjà des doublons, la création de l'index échoue et ils doivent être supprimés avant.
+    """
+    df.head(0).to_sql(name=table_name, con=engine, if_exists="append", index=False)
+    columns = ", ".join(f'"{col}"' for col in key_columns)
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_key_uidx ON {table_name} ({columns})"))
+        conn.execute(text(f"DROP INDEX IF EXISTS {table_name}_key_idx"))
+
+
+def upsert_data(engine, df: pd.DataFrame, table_name: str, key_columns=KEY_COLUMNS, watermarks=None,
+                ensure_table: bool = True):
+    """
+    Charge `df` dans une table de staging temporaire (non journalisée) via COPY, puis
+    la fusionne dans `table_name` par `INSERT ... ON CONFLICT` sur l'index unique de
+    `key_columns`, le tout dans une seule transaction : relancer le chargement remplace
+    les lignes au lieu de les dupliquer.
+
+    Une clé présente plusieurs fois dans `df` n'est chargée qu'une fois (dernière
+    occurrence) : `ON CONFLICT` refuse de modifier deux fois la même ligne.
+    """
+    if ensure_table:
+        create_table(engine, df, table_name)
+
+    df = _drop_duplicate_keys(df, key_columns)
+    staging_table = f"{table_name}_staging"
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+    keys = ", ".join(f'"{col}"' for col in key_columns)
+    updates = ", ".join(f'"{col}" = EXCLUDED."{col}"' for col in df.columns if col not in key_columns)
+    on_conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TEMP TABLE {staging_table} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+        ))
+        _copy_into(conn, df, staging_table)
+        conn.execute(text(
+            f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging_table} "
+            f"ON CONFLICT ({keys}) {on_conflict}"
+        ))
+        if watermarks:
+            save_watermarks(conn, watermarks)
+
+
+def _drop_duplicate_keys(df: pd.DataFrame, key_columns) -> pd.DataFrame:
+    """Garde la dernière ligne de chaque clé (l'ordre du lot fait foi)"""
+    duplicated = df.duplicated(list(key_columns), keep="last")
+    if duplicated.any():
+        logger.warning(f"{int(duplicated.sum())} doublons sur {tuple(key_columns)} ignorés dans le lot.")
+        return df[~duplicated]
+    return df
+
+
+def _copy_into(conn, df: pd.DataFrame, table_name: str):
+    """Envoie `df` en CSV vers `table_name` via COPY FROM STDIN sur la connexion donnée"""
+    buffer = io.StringIO()
+    # Les colonnes flottantes à valeurs entières (ex. âges avec NaN) repassent en Int64
+    integer_columns = {
+        col: "Int64" for col in df.select_dtypes("float").columns
+        if (df[col].dropna() % 1 == 0).all()
+    }
+    df.astype(integer_columns).to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from etl.db import pool_stats, reset_pool_stats
+
+try:
+    import resource
+except ImportError:  # Windows : pas de getrusage, le pic de RSS n'est pas mesuré
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PIPELINE = "pytest"
+
+# Mesures agrégées par étape pour le run en cours : {stage: {...}}
+_stages = {}
+_started_at = datetime.now()
+
+
+def reset():
+    """Démarre un nouveau run : efface les mesures précédentes."""
+    global _started_at
+    _stages.clear()
+    _started_at = datetime.now()
+    reset_pool_stats()
+
+
+@contextmanager
+def track(stage):
+    """
+    Mesure une étape du pipeline. Le dictionnaire renvoyé permet à l'étape de
+    déclarer ses lignes (`rows`) et octets extraits (`bytes`) ; les appels
+    successifs d'une même étape (lots, partitions) s'additionnent.
+    """
+    record = {"rows": 0, "bytes": 0}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        metrics = _stages.setdefault(stage, {"calls": 0, "seconds": 0.0, "rows": 0, "bytes": 0})
+        metrics["calls"] += 1
+        metrics["seconds"] += time.perf_counter() - start
+        metrics["rows"] += record["rows"]
+        metrics["bytes"] += record["bytes"]
+        if resource is not None:
+            # ru_maxrss est en kilo-octets sous Linux
+            metrics["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def frame_bytes(df):
+    """Taille mémoire d'un DataFrame extrait, utilisée comme volume de données lu."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def summary(success):
+    stages = []
+    for stage, metrics in _stages.items():
+        rate = metrics["rows"] / metrics["seconds"] if metrics["seconds"] > 0 else None
+        stages.append({"stage": stage, **metrics, "rows_per_second": rate})
+    return {
+        "pipeline": PIPELINE,
+        "started_at": _started_at.isoformat(timespec="seconds"),
+        "success": success,
+        "stages": stages,
+        "pool": pool_stats(),
+    }
+
+
+def to_prometheus(success):
+    """Format texte Prometheus (textfile collector de node_exporter)."""
+    labels = f'pipeline="{PIPELINE}"'
+    lines = []
+    for name, key, help_text in [
+        ("etl_stage_duration_seconds", "seconds", "Durée cumulée de l'étape"),
+        ("etl_stage_rows", "rows", "Lignes traitées par l'étape"),
+        ("etl_stage_rows_per_second", "rows_per_second", "Débit de l'étape en lignes par seconde"),
+        ("etl_stage_bytes", "bytes", "Octets extraits (taille mémoire des DataFrames)"),
+        ("etl_stage_peak_rss_bytes", "peak_rss_bytes", "Pic de mémoire résidente à la fin de l'étape"),
+    ]:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for stage in summary(success)["stages"]:
+            if stage[key] is not None:
+                lines.append(f'{name}{{{labels},stage="{stage["stage"]}"}} {stage[key]}')
+    pool = pool_stats()
+    if pool is not None:
+        for key, help_text in [
+            ("size", "Connexions conservées par le pool"),
+            ("checked_out", "Connexions empruntées à l'export"),
+            ("overflow", "Connexions ouvertes au-delà de la taille du pool"),
+            ("checkouts", "Emprunts de connexion pendant le run"),
+            ("connections_opened", "Connexions physiques ouvertes pendant le run"),
+            ("checkout_wait_seconds", "Attente cumulée pour obtenir une connexion"),
+            ("max_checkout_wait_seconds", "Plus longue attente pour obtenir une connexion"),
+        ]:
+            name = f"etl_db_pool_{key}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{{{labels}}} {pool[key]}"]
+    lines += [
+        "# HELP etl_run_success 1 si le dernier run a réussi",
+        "# TYPE etl_run_success gauge",
+        f"etl_run_success{{{labels}}} {int(success)}",
+        "# HELP etl_run_timestamp_seconds Début du dernier run (epoch)",
+        "# TYPE etl_run_timestamp_seconds gauge",
+        f"etl_run_timestamp_seconds{{{labels}}} {_started_at.timestamp():.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def export(directory, success):
+    """Écrit le fichier .prom (remplacé atomiquement) et le résumé JSON du run."""
+    os.makedirs(directory, exist_ok=True)
+    prom_path = os.path.join(directory, f"etl_{PIPELINE}.prom")
+    json_path = os.path.join(directory, f"run_{PIPELINE}_{_started_at:%Y%m%d-%H%M%S}.json")
+    for path, content in [(prom_path, to_prometheus(success)), (json_path, json.dumps(summary(success), indent=2))]:
+        with open(f"{path}.tmp", "w") as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
+    logger.info(f"📈 Métriques exportées : {prom_path}, {json_path}")
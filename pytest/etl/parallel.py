@@ -0,0 +1,77 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from etl.db import create_pooled_engine
+from etl.extract import extract_data
+from etl.transform import transform_data
+from etl.load import TABLE_NAME, create_table, load_data
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PartitionResult:
+    id_range: Tuple[int, int]
+    rows: int = 0
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def plan_partitions(engine, partitions: int) -> List[Tuple[int, int]]:
+    """Découpe la plage d'id de target_table en `partitions` intervalles contigus."""
+    with engine.connect() as conn:
+        id_min, id_max = conn.execute(text("SELECT MIN(id), MAX(id) FROM target_table")).one()
+    if id_min is None:
+        return []
+    step = -(-(id_max - id_min + 1) // partitions)  # division entière arrondie au supérieur
+    return [(low, min(low + step - 1, id_max)) for low in range(id_min, id_max + 1, step)]
+
+
+def run_partition(database_url: str, id_range: Tuple[int, int], upsert: bool = False) -> PartitionResult:
+    """Extrait, transforme et charge une plage d'id avec sa propre connexion."""
+    # Processus fils : un pool dédié d'une connexion, mêmes réglages que le pool partagé
+    engine = create_pooled_engine(database_url, pool_size=1, max_overflow=0)
+    try:
+        source_df, target_df = extract_data(engine, id_range=id_range)
+        transformed_df = transform_data(source_df, target_df)
+        if transformed_df.empty and not target_df.empty:
+            # transform_data journalise l'erreur et renvoie un DataFrame vide : la partition est à relancer
+            return PartitionResult(id_range, error=f"Transformation en échec : 0 ligne produite pour {len(target_df)} lues")
+        # Table créée par run_partitions avant le pool : pas de DDL concurrente entre processus
+        load_data(engine, transformed_df, upsert=upsert, ensure_table=False)
+        return PartitionResult(id_range, rows=len(transformed_df))
+    except Exception as e:
+        logger.error(f"Erreur sur la partition d'id {id_range} : {e}")
+        return PartitionResult(id_range, error=str(e))
+    finally:
+        engine.dispose()
+
+
+def prepare_table(database_url: str):
+    """
+    Crée `target_results` et son index une seule fois : des processus qui la créent en
+    même temps se heurtent (table ou type pg_type déjà existant).
+    """
+    engine = create_pooled_engine(database_url, pool_size=1, max_overflow=0)
+    try:
+        # Plage d'id vide : frames typés sans ligne, le schéma est celui du chargement
+        source_df, target_df = extract_data(engine, id_range=(0, -1))
+        create_table(engine, transform_data(source_df, target_df), TABLE_NAME)
+    finally:
+        engine.dispose()
+
+
+def run_partitions(database_url: str, id_ranges: List[Tuple[int, int]], workers: int,
+                   upsert: bool = False) -> List[PartitionResult]:
+    """Exécute les partitions sur un pool de `workers` processus."""
+    prepare_table(database_url)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_partition, database_url, id_range, upsert) for id_range in id_ranges]
+        return [future.result() for future in futures]
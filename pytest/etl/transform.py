@@ -1,6 +1,7 @@
-from etl.utils import calculate_age
+from etl.utils import calculate_ages, sorted_left_join
 import pandas as pd
 import logging
+from etl.metrics import track
 
 logger = logging.getLogger(__name__)
 
@@ -12,30 +13,26 @@ def transform_data(source_df: pd.DataFrame, target_df: pd.DataFrame) -> pd.DataF
     logger.info("Début de la transformation des données...")
 
     try:
-        # Conversion des dates
-        source_df['datenaissance'] = pd.to_datetime(source_df['datenaissance'],
-            errors='coerce')
-        # print("source_df['datenaissance']:", source_df['datenaissance'])
-        target_df['snapshot_date'] = pd.to_datetime(target_df['snapshot_date'],
-            errors='coerce')
-        # print("target_df['snapshot_date']:", target_df['snapshot_date'])
-
+        # Les dates arrivent déjà typées (datetime64) depuis l'extraction : pas de conversion ici
         # Fusion
-        merged_df = target_df[['snapshot_date', 'id', 'age']].merge(
-            source_df[['id', 'datenaissance']],
-            on='id',
-            how='left',
-            suffixes=('', '_source')
-        )
+        with track("merge") as stage:
+            # Source lue ORDER BY id : jointure triée, `merge` en repli
+            merged_df = sorted_left_join(target_df[['snapshot_date', 'id', 'age']], source_df[['id', 'datenaissance']], 'id')
+            if merged_df is None:
+                merged_df = target_df[['snapshot_date', 'id', 'age']].merge(
+                    source_df[['id', 'datenaissance']],
+                    on='id',
+                    how='left',
+                    suffixes=('', '_source')
+                )
+            stage["rows"] = len(merged_df)
 
         logger.info(f"Fusion réalisée : {len(merged_df)} lignes traitées.")
 
         # Calcul des âges
-        merged_df['age'] = merged_df.apply(
-            lambda row: calculate_age(row['datenaissance'], row['snapshot_date']),
-            axis=1
-        )  # Utilisation de Int64 pour gérer les NaN
-        print("head of merged_df:", merged_df.head())
+        with track("age_computation") as stage:
+            merged_df['age'] = calculate_ages(merged_df['datenaissance'], merged_df['snapshot_date']).astype("int16")
+            stage["rows"] = len(merged_df)
 
         logger.info("Calcul des âges terminé avec succès.")
         return merged_df[['snapshot_date', 'id', 'datenaissance', 'age']]
@@ -1,10 +1,68 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+DAYS_PER_YEAR = 365.2425
+NS_PER_DAY = 86_400 * 10**9
+
 
 def calculate_age(birth_date, reference_date):
-    age = (reference_date - birth_date).days / 365.2425
+    age = (reference_date - birth_date).days / DAYS_PER_YEAR
     # print("Calculated age:", age)
     if pd.isnull(age) or age < 0:
         return 0
     return int(age)
+
+
+def to_datetime64(values) -> np.ndarray:
+    """Convertit une colonne de dates (Series, array, liste) en datetime64[ns]."""
+    if getattr(values, "dtype", None) is not None and values.dtype.kind == "M":
+        # Dates déjà typées à l'extraction : pas de re-parsing
+        return np.asarray(values, dtype="datetime64[ns]")
+    return np.asarray(pd.to_datetime(values, errors="coerce"), dtype="datetime64[ns]")
+
+
+def calculate_ages(birth_dates, reference_dates) -> np.ndarray:
+    """
+    Version vectorisée de `calculate_age` : calcule tous les âges en une seule passe.
+    Mêmes règles : âge nul ou négatif (date manquante, naissance future) -> 0.
+    """
+    birth = to_datetime64(birth_dates)
+    reference = to_datetime64(reference_dates)
+
+    delta = reference - birth
+    valid = ~np.isnat(delta)
+
+    # `.days` d'un Timedelta arrondit vers le bas, on reproduit ce comportement
+    days = np.zeros(len(delta), dtype=np.int64)
+    days[valid] = np.floor_divide(delta[valid].astype(np.int64), NS_PER_DAY)
+
+    ages = np.zeros(len(delta), dtype=np.int64)
+    positive = valid & (days > 0)
+    ages[positive] = (days[positive] / DAYS_PER_YEAR).astype(np.int64)
+    return ages
+
+
+def sorted_left_join(left: pd.DataFrame, right: pd.DataFrame, on: str):
+    """
+    Jointure gauche sur `on` quand les clés de `right` sont uniques et triées (source lue
+    ORDER BY id) : recherche dichotomique (searchsorted) au lieu de la table de hachage de
+    `merge`. Mêmes lignes, même ordre et mêmes valeurs nulles que `merge(how="left")`.
+    Retourne None si `right` n'est pas triée ou si des colonnes sont en conflit.
+    """
+    keys = right[on].to_numpy()
+    if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+        return None
+    if set(left.columns) & (set(right.columns) - {on}):
+        return None
+
+    left_keys = left[on].to_numpy()
+    positions = np.minimum(np.searchsorted(keys, left_keys), max(len(keys) - 1, 0))
+    found = keys[positions] == left_keys if len(keys) else np.zeros(len(left_keys), dtype=bool)
+    # -1 : pas de correspondance, `take` remplit avec la valeur nulle du type (comme merge)
+    indexer = np.where(found, positions, -1)
+
+    result = left.reset_index(drop=True)
+    for col in right.columns.drop(on):
+        result[col] = pd.api.extensions.take(right[col].values, indexer, allow_fill=True)
+    return result
@@ -0,0 +1,146 @@
+import logging
+import math
+from statistics import NormalDist
+
+import numpy as np
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ("snapshot_date", "id", "datenaissance", "age")
+KEY_COLUMNS = ("id", "snapshot_date")
+
+
+def validate_frame(df, min_age=0, max_age=120, sample_size=5):
+    """
+    Contrôle un DataFrame de résultats en une passe vectorisée par règle, sans copie
+    filtrée : colonnes requises, valeurs nulles, bornes d'âge et unicité de (id, snapshot_date).
+    Retourne un rapport {rows, missing_columns, nulls, violations: {règle: {count, samples}}}.
+    """
+    report = {"rows": len(df), "missing_columns": [c for c in REQUIRED_COLUMNS if c not in df.columns],
+              "nulls": {}, "violations": {}}
+    if report["missing_columns"]:
+        return report
+
+    report["nulls"] = {col: int(df[col].isna().sum()) for col in REQUIRED_COLUMNS}
+    masks = {
+        "age_below_min": (df["age"] < min_age).to_numpy(dtype=bool, na_value=False),
+        "age_above_max": (df["age"] > max_age).to_numpy(dtype=bool, na_value=False),
+        "duplicate_keys": df.duplicated(list(KEY_COLUMNS)).to_numpy(),
+    }
+    for rule, mask in masks.items():
+        offenders = np.flatnonzero(mask)
+        report["violations"][rule] = {
+            "count": len(offenders),
+            "samples": df.iloc[offenders[:sample_size]].to_dict("records"),
+        }
+    return report
+
+
+def resolve_snapshot(engine, table, scope="latest"):
+    """
+    Snapshot contrôlé : "latest" -> dernier snapshot chargé (MAX lu dans l'index de clé),
+    "all" -> None (toute la table), sinon la date fournie.
+    """
+    if scope == "all":
+        return None
+    if scope != "latest":
+        return scope
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT MAX(snapshot_date) FROM {table}")).scalar()
+
+
+def sample_clause(table, where, percent, method="hash", seed=42):
+    """
+    Source et filtre d'un échantillon déterministe (même graine, mêmes lignes) :
+    "hash" garde les id dont le hachage tombe sous le pourcentage, "tablesample" lit
+    des blocs entiers (TABLESAMPLE SYSTEM ... REPEATABLE).
+    """
+    if method == "tablesample":
+        return f"{table} TABLESAMPLE SYSTEM ({float(percent)}) REPEATABLE ({int(seed)})", where
+    if method != "hash":
+        raise ValueError(f"Méthode d'échantillonnage inconnue : {method}")
+    # hashtext renvoie un int4 signé : décalé dans [0, 2^32) puis réduit à 10 000 seaux
+    predicate = f"mod(hashtext(id::text || '/{int(seed)}')::bigint + 2147483648, 10000) < {round(percent * 100)}"
+    return table, f"({where}) AND {predicate}" if where else predicate
+
+
+def wilson_interval(failed, size, confidence=0.95):
+    """Intervalle de Wilson d'une proportion (informatif même avec 0 faute dans l'échantillon)"""
+    if not size:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    p = failed / size
+    denominator = 1 + z * z / size
+    center = (p + z * z / (2 * size)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / size + z * z / (4 * size * size)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def validate_table(engine, table, min_age=0, max_age=120, sample_size=5, snapshot_date=None,
+                   sample_percent=100, sample_method="hash", seed=42, confidence=0.95):
+    """
+    Même rapport que `validate_frame` pour une table déjà chargée, calculé en une seule
+    requête d'agrégat ; les exemples de lignes fautives ne sont lus qu'en cas d'échec.
+
+    `snapshot_date` restreint les contrôles à un snapshot (lu par l'index de clé).
+    Avec `sample_percent` < 100, les valeurs nulles et les bornes d'âge sont comptées sur
+    un échantillon déterministe et le rapport porte une entrée "sampling" (intervalles de
+    confiance des taux de fautes) ; le nombre de lignes et l'unicité restent exacts.
+    """
+    keys = ", ".join(KEY_COLUMNS)
+    predicates = {"age_below_min": f"age < {int(min_age)}", "age_above_max": f"age > {int(max_age)}"}
+    where = "snapshot_date = :snapshot_date" if snapshot_date is not None else None
+    params = {"snapshot_date": snapshot_date} if snapshot_date is not None else {}
+    sampled = sample_percent < 100
+    source, sample_where = sample_clause(table, where, sample_percent, sample_method, seed) if sampled else (table, where)
+
+    with engine.connect() as conn:
+        columns = {row[0] for row in conn.execute(
+            text("SELECT column_name FROM information_schema.columns WHERE table_name = :table"), {"table": table}
+        )}
+        report = {"rows": 0, "missing_columns": [c for c in REQUIRED_COLUMNS if c not in columns],
+                  "nulls": {}, "violations": {}, "snapshot_date": snapshot_date}
+        if report["missing_columns"]:
+            return report
+
+        exact = ["COUNT(*) AS rows", f"COUNT(*) - COUNT(DISTINCT ({keys})) AS duplicate_keys"]
+        statistical = [f"COUNT(*) - COUNT({col}) AS null_{col}" for col in REQUIRED_COLUMNS]
+        statistical += [f"COUNT(*) FILTER (WHERE {predicate}) AS {rule}" for rule, predicate in predicates.items()]
+        if sampled:
+            counts = _aggregate(conn, exact, table, where, params)
+            counts.update(_aggregate(conn, ["COUNT(*) AS sample_rows"] + statistical, source, sample_where, params))
+        else:
+            counts = _aggregate(conn, exact + statistical, table, where, params)
+
+        report["rows"] = counts["rows"]
+        report["nulls"] = {col: counts[f"null_{col}"] for col in REQUIRED_COLUMNS}
+        samples_queries = {
+            rule: f"SELECT {', '.join(REQUIRED_COLUMNS)} FROM {source} WHERE {predicate}"
+                  f"{f' AND {sample_where}' if sample_where else ''} LIMIT {sample_size}"
+            for rule, predicate in predicates.items()
+        }
+        samples_queries["duplicate_keys"] = (
+            f"SELECT {keys}, COUNT(*) AS occurrences FROM {table} {f'WHERE {where}' if where else ''} "
+            f"GROUP BY {keys} HAVING COUNT(*) > 1 LIMIT {sample_size}"
+        )
+        for rule, query in samples_queries.items():
+            count = counts[rule]
+            samples = [dict(row) for row in conn.execute(text(query), params).mappings()] if count else []
+            report["violations"][rule] = {"count": count, "samples": samples}
+
+    if sampled:
+        size = counts["sample_rows"]
+        report["sampling"] = {
+            "method": sample_method, "percent": sample_percent, "seed": seed, "confidence": confidence,
+            "sample_rows": size,
+            # Pourcentage de lignes fautives estimé sur toute la portée, bornes de l'intervalle de confiance
+            "intervals": {rule: [100 * bound for bound in wilson_interval(counts[rule], size, confidence)]
+                          for rule in predicates},
+        }
+    return report
+
+
+def _aggregate(conn, aggregates, source, where, params):
+    query = f"SELECT {', '.join(aggregates)} FROM {source} {f'WHERE {where}' if where else ''}"
+    return dict(conn.execute(text(query), params).mappings().one())
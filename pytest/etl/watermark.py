@@ -0,0 +1,51 @@
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_TABLE = "etl_watermarks"
+# Les marques sont propres à la table alimentée : d'autres pipelines partagent la table d'état
+CONSUMER = "target_results"
+TRACKED_TABLES = ("source_table", "target_table")
+
+
+def ensure_watermark_table(engine):
+    """Crée la table d'état des marques hautes (une ligne par table alimentée et table lue) si besoin."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+                consumer TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                high_water TIMESTAMP NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (consumer, table_name)
+            )
+        """))
+
+
+def get_watermarks(engine):
+    """Retourne {table: plus grand created_at déjà traité}, None pour une table jamais lue."""
+    with engine.connect() as conn:
+        rows = dict(conn.execute(
+            text(f"SELECT table_name, high_water FROM {WATERMARK_TABLE} WHERE consumer = :consumer"),
+            {"consumer": CONSUMER},
+        ).all())
+    return {table: rows.get(table) for table in TRACKED_TABLES}
+
+
+def save_watermarks(conn, watermarks):
+    """
+    Enregistre les nouvelles marques dans la transaction de l'appelant : elles
+    n'avancent que si le chargement associé est commité.
+    """
+    for table, high_water in watermarks.items():
+        if high_water is None:
+            continue
+        conn.execute(text(f"""
+            INSERT INTO {WATERMARK_TABLE} (consumer, table_name, high_water, updated_at)
+            VALUES (:consumer, :table_name, :high_water, CURRENT_TIMESTAMP)
+            ON CONFLICT (consumer, table_name) DO UPDATE
+            SET high_water = GREATEST({WATERMARK_TABLE}.high_water, EXCLUDED.high_water),
+                updated_at = EXCLUDED.updated_at
+        """), {"consumer": CONSUMER, "table_name": table, "high_water": high_water})
+        logger.info(f"Marque haute de {table} : {high_water}")
@@ -3,15 +3,18 @@ import logging
 import sys
 import subprocess
 from datetime import date
-from sqlalchemy import create_engine
 from etl.alert import send_email_alert
 import os
 
 
-from config.settings import DATABASE_URL, ALERT_EMAIL, ALERT_PASSWORD
-from etl.extract import extract_data
+from config.settings import DATABASE_URL, ALERT_EMAIL, ALERT_PASSWORD, BATCH_SIZE, METRICS_DIR
+from etl import metrics
+from etl.db import get_engine
+from etl.extract import extract_data, extract_data_chunks, extract_incremental
 from etl.transform import transform_data
 from etl.load import load_data
+from etl.parallel import plan_partitions, run_partitions
+from etl.watermark import ensure_watermark_table, get_watermarks
 
 # Logger global
 logging.basicConfig(
@@ -20,30 +23,70 @@ logging.basicConfig(
 )
 logger = logging.getLogger("main")
 
-def run_pipeline():
+def run_pipeline(chunksize=BATCH_SIZE, upsert=False, workers=1, incremental=False):
 	logger.info("🚀 Lancement du pipeline ETL...")
+	metrics.reset()
 
-	engine = create_engine(DATABASE_URL)
+	engine = get_engine()
+	succeeded = False
 
 	try:
-		# Étape 1 : Extraction
-		source_df, target_df = extract_data(engine)
-
-		# Étape 2 : Transformation
-		transformed_df = transform_data(source_df, target_df)
-
-		# Étape 3 : Chargement
-		load_data(engine, transformed_df)
+		if incremental:
+			# Mode incrémental : seul le delta depuis la dernière marque haute (created_at)
+			ensure_watermark_table(engine)
+			source_df, target_df, watermarks = extract_incremental(engine, get_watermarks(engine))
+			transformed_df = transform_data(source_df, target_df) if not target_df.empty else target_df
+			load_data(engine, transformed_df, watermarks=watermarks)
+
+		elif workers > 1:
+			# Mode parallèle : une plage d'id par partition, réparties sur un pool de processus
+			failed = run_pipeline_partitions(plan_partitions(engine, workers), workers, upsert)
+			if failed:
+				logger.error(f"❌ Partitions en échec (à relancer avec run_pipeline_partitions) : {failed}")
+				sys.exit(1)
+
+		elif chunksize:
+			# Mode streaming : extraction, transformation et chargement lot par lot
+			for source_df, target_df in extract_data_chunks(engine, chunksize):
+				load_data(engine, transform_data(source_df, target_df), upsert=upsert)
+
+		else:
+			# Étape 1 : Extraction
+			source_df, target_df = extract_data(engine)
+
+			# Étape 2 : Transformation
+			transformed_df = transform_data(source_df, target_df)
+
+			# Étape 3 : Chargement
+			load_data(engine, transformed_df, upsert=upsert)
 
 		logger.info("✅ Pipeline exécuté avec succès.")
+		succeeded = True
 	except Exception as e:
 		logger.error(f"❌ Erreur dans le pipeline : {e}")
 		sys.exit(1)
+	finally:
+		# Un run interrompu (exception ou sys.exit) exporte ses métriques ; un run réussi
+		# les exporte après les tests, avec l'étape de validation
+		if not succeeded:
+			metrics.export(METRICS_DIR, success=False)
+
+
+def run_pipeline_partitions(id_ranges, workers, upsert=False):
+	"""Exécute les partitions données et retourne la liste des plages d'id en échec."""
+	results = run_partitions(DATABASE_URL, id_ranges, workers, upsert)
+	for result in results:
+		if result.success:
+			logger.info(f"📦 Partition {result.id_range} : {result.rows} lignes chargées.")
+		else:
+			logger.error(f"❌ Partition {result.id_range} en échec : {result.error}")
+	return [result.id_range for result in results if not result.success]
 
 
 def run_tests():
 	logger.info("🧪 Lancement des tests automatiques avec Pytest...")
-	result = subprocess.run([
+	with metrics.track("validation"):
+		result = subprocess.run([
     "pytest",
     "-n", "8",  # 8 workers (ajustez selon votre CPU)
     "--dist=loadfile",  # Meilleure parallélisation
@@ -55,6 +98,7 @@ def run_tests():
     "--no-summary",  # Supprime le summary inutile
 ], capture_output=True, text=True)
 	print(result.stdout)
+	metrics.export(METRICS_DIR, success=result.returncode == 0)
 
 	if result.returncode != 0:
 		logger.error("❌ Des tests ont échoué !")
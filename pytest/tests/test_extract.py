@@ -1,13 +1,12 @@
 # tests/test_extract.py
 import pandas as pd
 import pytest
-from sqlalchemy import create_engine
-from config.settings import DATABASE_URL
-from etl.extract import extract_data
+from etl.db import get_engine
+from etl.extract import extract_data, extract_data_chunks, extract_incremental
 
 @pytest.fixture
 def test_engine():
-    return create_engine(DATABASE_URL)
+    return get_engine()
 
 def test_extract_data_returns_dataframe(test_engine, caplog):
     caplog.set_level("INFO")
@@ -26,3 +25,35 @@ def test_extract_data_returns_dataframe(test_engine, caplog):
     if not bd_source.empty:
         assert "id" in bd_source.columns
         assert "datenaissance" in bd_source.columns
+
+
+def test_extract_data_chunks_covers_target_table(test_engine):
+    _, bd_target = extract_data(test_engine)
+
+    chunks = list(extract_data_chunks(test_engine, chunksize=4))
+
+    assert all(len(target_chunk) <= 4 for _, target_chunk in chunks)
+    assert sum(len(target_chunk) for _, target_chunk in chunks) == len(bd_target)
+    for bd_source, target_chunk in chunks:
+        # Chaque lot embarque les lignes source de sa plage d'id
+        assert set(bd_source["id"]) <= set(range(target_chunk["id"].min(), target_chunk["id"].max() + 1))
+
+
+def test_extract_incremental_returns_only_new_rows(test_engine):
+    # Sans marque : tout est relu ; avec les marques retournées : plus rien à relire
+    bd_source, bd_target, watermarks = extract_incremental(test_engine, {}, lag_seconds=0)
+    assert len(bd_target) == len(extract_data(test_engine)[1])
+
+    bd_source, bd_target, _ = extract_incremental(test_engine, watermarks, lag_seconds=0)
+    assert bd_source.empty and bd_target.empty
+
+
+def test_extract_incremental_keeps_recent_rows_for_the_next_run(test_engine):
+    # Borne haute derrière l'horloge : les lignes récentes (transactions peut-être encore
+    # ouvertes) ne sont pas lues, et la marque ne les dépasse pas
+    _, lagged, watermarks = extract_incremental(test_engine, {}, lag_seconds=3600)
+    assert (lagged["created_at"] <= watermarks["target_table"]).all()
+
+    _, recent, _ = extract_incremental(test_engine, watermarks, lag_seconds=0)
+    keys = lambda df: set(zip(df["snapshot_date"], df["id"]))
+    assert keys(lagged) | keys(recent) == keys(extract_data(test_engine)[1])
@@ -1,12 +1,15 @@
 import pytest
 import pandas as pd
-from sqlalchemy import create_engine, text, bindparam
+from sqlalchemy import text, bindparam
 from etl.load import load_data
-from config.settings import DATABASE_URL
+from config.settings import (VALIDATION_SCOPE, VALIDATION_SAMPLE_PERCENT, VALIDATION_SAMPLE_METHOD,
+                             VALIDATION_SAMPLE_SEED, VALIDATION_CONFIDENCE)
+from etl.validation import resolve_snapshot, validate_table
+from etl.db import get_engine
 
 @pytest.fixture
 def engine():
-    return create_engine(DATABASE_URL)
+    return get_engine()
 
 def test_load_data(engine, caplog):
     caplog.set_level("INFO")
@@ -56,7 +59,7 @@ def test_load_data_multiple_rows(engine, caplog):
     with engine.begin() as conn:
         conn.execute(
     text("""
-        SELECT COUNT(*) FROM target_results
+        DELETE FROM target_results
         WHERE id IN :ids
     """).bindparams(
         bindparam("ids", expanding=True)
@@ -103,6 +106,71 @@ def test_load_data_multiple_rows(engine, caplog):
     assert "Début de l'insertion des données dans target_results" in caplog.text
     assert "3 lignes insérées dans target_results." in caplog.text
 
+def test_load_data_insert_fallback(engine, caplog):
+    caplog.set_level("INFO")
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM target_results WHERE id = 7777"))
+
+    test_df = pd.DataFrame([{
+        "id": 7777,
+        "snapshot_date": pd.to_datetime("2025-01-01"),
+        "datenaissance": pd.to_datetime("1990-01-01"),
+        "age": 35
+    }])
+
+    # Chemin INSERT (to_sql) conservé pour les moteurs autres que PostgreSQL
+    load_data(engine, test_df, use_copy=False)
+
+    with engine.connect() as conn:
+        count = conn.execute(text("SELECT COUNT(*) FROM target_results WHERE id = 7777")).scalar()
+
+    assert count == 1
+    assert "Débit de chargement (INSERT)" in caplog.text
+
+
+def test_load_data_upsert_is_idempotent(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM target_results WHERE id = 6666"))
+
+    test_df = pd.DataFrame([{
+        "id": 6666,
+        "snapshot_date": pd.to_datetime("2025-01-01"),
+        "datenaissance": pd.to_datetime("1990-01-01"),
+        "age": 34
+    }])
+
+    # Deux chargements successifs : la seconde valeur remplace la première
+    load_data(engine, test_df, upsert=True)
+    load_data(engine, test_df.assign(age=35), upsert=True)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT age FROM target_results WHERE id = 6666")).fetchall()
+
+    assert [row[0] for row in rows] == [35]
+
+
+def test_load_data_upsert_keeps_the_last_duplicate_and_key_is_unique(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM target_results WHERE id = 5555"))
+
+    row = {"id": 5555, "snapshot_date": pd.to_datetime("2025-01-01"),
+           "datenaissance": pd.to_datetime("1990-01-01"), "age": 34}
+    # Même clé deux fois dans le lot : seule la dernière occurrence est fusionnée
+    load_data(engine, pd.DataFrame([row, dict(row, age=35)]), upsert=True)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT age FROM target_results WHERE id = 5555")).fetchall()
+        assert [r[0] for r in rows] == [35]
+
+        # Sans fusion, un second chargement de la clé est refusé par l'index unique
+        with pytest.raises(Exception, match="target_results_key_uidx"):
+            load_data(engine, pd.DataFrame([row]))
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM target_results WHERE id = 5555"))
+
+
 def test_target_results_not_empty(engine):
     with engine.connect() as conn:
         count = conn.execute(text("SELECT COUNT(*) FROM target_results")).scalar()
@@ -119,18 +187,27 @@ def test_target_results_columns_are_valid(engine):
     assert pd.api.types.is_datetime64_any_dtype(df["snapshot_date"])
     assert pd.api.types.is_datetime64_any_dtype(df["datenaissance"]) or df["datenaissance"].isnull().all()
     assert pd.api.types.is_integer_dtype(df["age"]) or df["age"].isnull().all()
-def test_target_results_age_validity(engine):
-    df = pd.read_sql("SELECT age FROM target_results", engine)
-
-    # Ne tester que les valeurs non nulles
-    non_null_ages = df["age"].dropna()
-
-    assert all(non_null_ages >= 0), "⛔ Certains âges sont négatifs"
-    assert all(non_null_ages <= 120), "⛔ Certains âges sont irréalistes"
-
-
-def test_target_results_id_unique_per_snapshot(engine):
-    df = pd.read_sql("SELECT id, snapshot_date FROM target_results", engine)
-
-    duplicates = df.duplicated(subset=["id", "snapshot_date"]).sum()
-    assert duplicates == 0, f"⛔ {duplicates} doublons trouvés sur (id, snapshot_date)"
+@pytest.fixture(scope="module")
+def target_results_report():
+    """
+    Un seul scan d'agrégat pour tous les contrôles de la table, limité au snapshot
+    contrôlé (VALIDATION_SCOPE) : la durée ne croît pas avec l'historique
+    """
+    engine = get_engine()
+    return validate_table(engine, "target_results", max_age=120,
+                          snapshot_date=resolve_snapshot(engine, "target_results", VALIDATION_SCOPE),
+                          sample_percent=VALIDATION_SAMPLE_PERCENT, sample_method=VALIDATION_SAMPLE_METHOD,
+                          seed=VALIDATION_SAMPLE_SEED, confidence=VALIDATION_CONFIDENCE)
+
+
+def test_target_results_age_validity(target_results_report):
+    # Les âges nuls ne sont pas comptés comme fautifs
+    violations = target_results_report["violations"]
+
+    assert violations["age_below_min"]["count"] == 0, f"⛔ Certains âges sont négatifs : {violations['age_below_min']['samples']}"
+    assert violations["age_above_max"]["count"] == 0, f"⛔ Certains âges sont irréalistes : {violations['age_above_max']['samples']}"
+
+
+def test_target_results_id_unique_per_snapshot(target_results_report):
+    duplicates = target_results_report["violations"]["duplicate_keys"]
+    assert duplicates["count"] == 0, f"⛔ {duplicates['count']} doublons trouvés sur (id, snapshot_date) : {duplicates['samples']}"
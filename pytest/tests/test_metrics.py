@@ -0,0 +1,54 @@
+import json
+import os
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from config.settings import DB_APPLICATION_NAME
+from etl import metrics
+from etl.db import get_engine
+from etl.transform import transform_data
+
+
+def test_metrics_aggregate_stages_and_export(tmp_path):
+    """Les étapes instrumentées sont agrégées puis exportées en .prom et en JSON"""
+    metrics.reset()
+    source = pd.DataFrame({"id": [1, 2], "datenaissance": pd.to_datetime(["1990-01-01", "2000-06-15"])})
+    target = pd.DataFrame({"snapshot_date": pd.to_datetime(["2025-01-01", "2025-01-01"]), "id": [1, 2], "age": [None, None]})
+    transform_data(source, target)
+    transform_data(source, target)
+
+    stages = {stage["stage"]: stage for stage in metrics.summary(True)["stages"]}
+    assert stages["merge"]["calls"] == 2
+    assert stages["age_computation"]["rows"] == 4
+
+    metrics.export(str(tmp_path), success=True)
+    prom = (tmp_path / "etl_pytest.prom").read_text()
+    assert 'etl_stage_rows{pipeline="pytest",stage="merge"} 4' in prom
+    assert 'etl_run_success{pipeline="pytest"} 1' in prom
+    [json_file] = [f for f in os.listdir(tmp_path) if f.endswith(".json")]
+    assert json.loads((tmp_path / json_file).read_text())["success"] is True
+
+
+def test_failed_partitions_still_export_failure_metrics(tmp_path, monkeypatch):
+    """Le mode parallèle sort en erreur (sys.exit) après avoir exporté les métriques du run"""
+    import main
+    monkeypatch.setattr(main, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "plan_partitions", lambda engine, workers: [(1, 10), (11, 20)])
+    monkeypatch.setattr(main, "run_pipeline_partitions", lambda id_ranges, workers, upsert: [(11, 20)])
+
+    with pytest.raises(SystemExit):
+        main.run_pipeline(workers=2)
+
+    assert 'etl_run_success{pipeline="pytest"} 0' in (tmp_path / "etl_pytest.prom").read_text()
+
+
+def test_shared_engine_applies_pool_settings_and_exports_counters():
+    """Le pool partagé porte application_name ; ses compteurs sont exportés avec les métriques du run"""
+    engine = get_engine()
+    assert get_engine() is engine
+    metrics.reset()
+    with engine.connect() as conn:
+        assert conn.execute(text("SHOW application_name")).scalar() == DB_APPLICATION_NAME
+
+    assert metrics.summary(True)["pool"]["checkouts"] == 1
+    assert 'etl_db_pool_checked_out{pipeline="pytest"} 0' in metrics.to_prometheus(True)
@@ -2,12 +2,11 @@ from etl.transform import transform_data
 from etl.extract import extract_data
 import pandas as pd
 import pytest
-from sqlalchemy import create_engine
-from config.settings import DATABASE_URL
+from etl.db import get_engine
 
 @pytest.fixture
 def test_engine():
-    return create_engine(DATABASE_URL)
+    return get_engine()
 
 @pytest.fixture
 def test_data(test_engine):
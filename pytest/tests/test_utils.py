@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from etl.utils import calculate_age, calculate_ages, sorted_left_join
+
+
+def test_calculate_ages_matches_calculate_age():
+    """Le calcul vectorisé doit donner exactement les mêmes âges que calculate_age"""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "datenaissance": pd.to_datetime("1900-01-01") + pd.to_timedelta(rng.integers(0, 45000, 5000), unit="D"),
+        "snapshot_date": pd.to_datetime("1950-01-01") + pd.to_timedelta(rng.integers(0, 30000, 5000), unit="D"),
+    })
+    df.loc[::50, "datenaissance"] = pd.NaT
+
+    expected = df.apply(lambda row: calculate_age(row["datenaissance"], row["snapshot_date"]), axis=1)
+    ages = calculate_ages(df["datenaissance"], df["snapshot_date"])
+
+    assert ages.dtype == np.int64
+    assert (ages == expected.to_numpy()).all()
+
+
+def test_calculate_ages_null_and_future_births_are_zero():
+    births = pd.Series(pd.to_datetime([None, "2030-01-01", "2000-02-29"]))
+    snapshots = pd.Series(pd.to_datetime(["2025-01-01", "2025-01-01", "2025-01-01"]))
+
+    assert list(calculate_ages(births, snapshots)) == [0, 0, 24]
+
+
+def test_sorted_left_join_matches_merge():
+    """La jointure triée donne exactement le résultat de merge(how='left'), id manquants compris"""
+    rng = np.random.default_rng(1)
+    source = pd.DataFrame({
+        "id": np.arange(0, 1000, 3, dtype="int32"),
+        "datenaissance": pd.to_datetime("1980-01-01") + pd.to_timedelta(rng.integers(0, 10000, 334), unit="D"),
+    })
+    target = pd.DataFrame({
+        "snapshot_date": pd.Timestamp("2025-01-01"),
+        "id": rng.integers(0, 1100, 3000).astype("int32"),
+        "age": pd.array([pd.NA] * 3000, dtype="Int16"),
+    })
+
+    expected = target.merge(source, on="id", how="left")
+    pd.testing.assert_frame_equal(sorted_left_join(target, source, "id"), expected)
+    assert sorted_left_join(target, source.sample(frac=1, random_state=0), "id") is None
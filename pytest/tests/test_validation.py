@@ -0,0 +1,58 @@
+import pandas as pd
+from sqlalchemy import text
+from etl.db import get_engine
+from etl.load import load_data
+from etl.validation import resolve_snapshot, validate_frame, validate_table
+
+
+def test_validate_frame_counts_and_samples_offenders():
+    """Une passe par règle : comptes et exemples des lignes fautives, DataFrame inchangé"""
+    df = pd.DataFrame({
+        "snapshot_date": pd.to_datetime(["2025-01-01"] * 4),
+        "id": [1, 2, 3, 3],
+        "datenaissance": pd.to_datetime(["1990-01-01", None, "1800-01-01", "1800-01-01"]),
+        "age": pd.array([-1, pd.NA, 225, 225], dtype="Int64"),
+    })
+    original = df.copy()
+
+    report = validate_frame(df)
+
+    assert report["nulls"] == {"snapshot_date": 0, "id": 0, "datenaissance": 1, "age": 1}
+    assert {rule: v["count"] for rule, v in report["violations"].items()} == {
+        "age_below_min": 1, "age_above_max": 2, "duplicate_keys": 1,
+    }
+    assert report["violations"]["age_below_min"]["samples"][0]["id"] == 1
+    pd.testing.assert_frame_equal(df, original)
+    assert validate_frame(df.drop(columns="age"))["missing_columns"] == ["age"]
+
+
+def test_validate_table_scopes_to_snapshot_and_samples_deterministically():
+    """Snapshot isolé : lignes et doublons exacts, âges comptés sur un échantillon reproductible"""
+    engine = get_engine()
+    rows = 2000
+    df = pd.DataFrame({
+        "id": range(1, rows + 1),
+        "snapshot_date": pd.to_datetime(["1900-01-01"] * rows),
+        "datenaissance": pd.to_datetime(["1850-01-01"] * rows),
+        "age": [200 if i % 50 == 0 else 50 for i in range(rows)],
+    })
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM target_results WHERE snapshot_date = '1900-01-01'"))
+    load_data(engine, df)
+    try:
+        reports = [validate_table(engine, "target_results", snapshot_date="1900-01-01", sample_percent=50)
+                   for _ in range(2)]
+        latest = resolve_snapshot(engine, "target_results")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM target_results WHERE snapshot_date = '1900-01-01'"))
+
+    report = reports[0]
+    assert reports[0] == reports[1]
+    assert report["rows"] == rows
+    assert report["violations"]["duplicate_keys"]["count"] == 0
+    assert 0 < report["sampling"]["sample_rows"] < rows
+    assert 0 < report["violations"]["age_above_max"]["count"] < rows // 50
+    low, high = report["sampling"]["intervals"]["age_above_max"]
+    assert low <= 2.0 <= high
+    assert str(latest) != "1900-01-01"